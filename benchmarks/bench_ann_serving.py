@@ -0,0 +1,169 @@
+"""Cold start and latency of the ANN bundles (Keras, TFLite) next to the RandomForest path.
+
+The ANN bundle is built from data/model_ann.keras (the network trained in
+modeling_ann.ipynb) with data/model_ann_preprocessing.pkl, the preprocessing
+the notebook saves with it; without that file a stand-in is fitted like in
+the notebook on data/data_cleaned.csv. The bundle is converted to TFLite
+when TensorFlow is available. A RandomForest bundle
+like the DAG's is trained on the same data and also exported in compact
+form. Every artifact is then served in a fresh process the way
+`ModelRegistry` serves it: import, load and warm-up prediction (the cold
+start), then single-row latency (p50/p99) and one batch predict.
+
+    python benchmarks/bench_ann_serving.py --trees 500 --batch-rows 10000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+from time import perf_counter
+
+START = perf_counter()
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+NUM_COLS = ['land_size_m2', 'building_size_m2', 'road_width', 'maid_bedroom', 'maid_bathroom', 'kitchen',
+            'floor_level', 'bedroom', 'bathroom', 'garage', 'carport', 'voltage_watt']
+CAT_COLS = ['city', 'property_type', 'certificate', 'furniture', 'house_facing', 'water_source',
+            'property_condition']
+KERAS_FILE = os.path.join(BENCH_DIR, '..', 'data', 'model_ann.keras')
+PREPROCESSING_FILE = os.path.join(BENCH_DIR, '..', 'data', 'model_ann_preprocessing.pkl')
+
+
+def notebook_preprocessing(data, path):
+    """Stand-in for modeling_ann.ipynb's preprocessing file: its seeded split, scaler and encoder."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+    from utilization.imputation import KNNFeatureImputer
+
+    data = data[data['price_mio'] < 5800]
+    X, y = data.drop('price_mio', axis=1), data['price_mio']
+    X_train_val, _, y_train_val, _ = train_test_split(X, y, test_size=0.15, random_state=365)
+    X_train, _, y_train, _ = train_test_split(X_train_val, y_train_val, test_size=0.20, random_state=365)
+    transformer = ColumnTransformer([('pipe_num', make_pipeline(MinMaxScaler()), NUM_COLS),
+                                     ('pipe_cat', make_pipeline(OneHotEncoder()), CAT_COLS)])
+    transformer.fit(KNNFeatureImputer(NUM_COLS, CAT_COLS).fit(X_train).transform(X_train))
+    pd.to_pickle({'transformer': transformer, 'X_train': X_train, 'y_train': y_train}, path)
+    return path
+
+
+def build_artifacts(args, workdir):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+    from utilization.ann_model import build_ann_bundle, tflite_bundle
+    from utilization.compact_forest import export_compact_bundle
+    from utilization.feature_engineering import SELECTED_COLUMNS, split_features_and_target
+    from utilization.imputation import KNNFeatureImputer
+    from utilization.model_bundle import ModelBundle, save_bundle
+
+    data = pd.read_csv(os.path.join(BENCH_DIR, '..', 'data', 'data_cleaned.csv'), usecols=SELECTED_COLUMNS)
+    data = data[SELECTED_COLUMNS]
+    X_train, X_test, y_train, y_test = split_features_and_target(data)
+
+    pipeline = Pipeline([
+        ('imputer', KNNFeatureImputer(NUM_COLS, CAT_COLS)),
+        ('transformer', ColumnTransformer([('scaler', MinMaxScaler(), NUM_COLS),
+                                           ('encoder_ohe', OneHotEncoder(handle_unknown='ignore'), CAT_COLS)])),
+        ('model', RandomForestRegressor(n_estimators=args.trees, random_state=999, n_jobs=-1)),
+    ])
+    pipeline.fit(X_train, y_train)
+    forest = ModelBundle.from_training(pipeline, X_train, y_train, CAT_COLS)
+
+    paths = {'rf pickle': os.path.join(workdir, 'rf.pkl'), 'rf compact': os.path.join(workdir, 'rf.compact')}
+    save_bundle(forest, paths['rf pickle'])
+    export_compact_bundle(forest, paths['rf compact'])
+
+    if not os.path.exists(KERAS_FILE):
+        print(f"{KERAS_FILE} not found, ANN skipped.")
+    else:
+        try:
+            preprocessing_file = PREPROCESSING_FILE
+            if not os.path.exists(preprocessing_file):
+                preprocessing_file = notebook_preprocessing(data, os.path.join(workdir, 'ann_preprocessing.pkl'))
+            ann = build_ann_bundle(NUM_COLS, CAT_COLS, KERAS_FILE, preprocessing_file)
+            paths['ann keras'] = os.path.join(workdir, 'ann.pkl')
+            save_bundle(ann, paths['ann keras'])
+            paths['ann tflite'] = os.path.join(workdir, 'ann_lite.pkl')
+            save_bundle(tflite_bundle(ann), paths['ann tflite'])
+        except ImportError as e:
+            print(f"TensorFlow not available, ANN skipped: {e}")
+
+    eval_file = os.path.join(workdir, 'eval.pkl')
+    pd.to_pickle((X_test, y_test), eval_file)
+    return paths, eval_file
+
+
+def measure(path, eval_file, batch_rows, single_calls):
+    """Runs in a fresh process; prints one JSON line."""
+    start = perf_counter()
+    from utilization.model_bundle import load_bundle
+    bundle = load_bundle(path)
+    load_seconds = perf_counter() - start
+    # The warm-up is the first prediction; the cold start also counts interpreter start-up and imports
+    warmup_seconds = bundle.warm_up()
+    cold_start = perf_counter() - START
+
+    X_eval, y_eval = pd.read_pickle(eval_file)
+    record = X_eval.head(1)
+    from sklearn.metrics import mean_absolute_error
+    mae = mean_absolute_error(y_eval, bundle.predict(X_eval))
+    latencies = []
+    for _ in range(single_calls):
+        start = perf_counter()
+        bundle.predict(record)
+        latencies.append(perf_counter() - start)
+    batch = X_eval.sample(batch_rows, replace=True, random_state=0)
+    start = perf_counter()
+    bundle.predict(batch)
+    batch_seconds = perf_counter() - start
+
+    print(json.dumps({"load_seconds": load_seconds, "warmup_seconds": warmup_seconds, "cold_start": cold_start,
+                      "p50_ms": np.percentile(latencies, 50) * 1e3, "p99_ms": np.percentile(latencies, 99) * 1e3,
+                      "batch_seconds": batch_seconds, "mae": mae}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trees', type=int, default=500)
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    parser.add_argument('--single-calls', type=int, default=200)
+    parser.add_argument('--measure', nargs=2, metavar=('MODEL', 'EVAL_FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.measure:
+        measure(*args.measure, args.batch_rows, args.single_calls)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, eval_file = build_artifacts(args, workdir)
+        print(f"{'artifact':>11s} {'cold s':>7s} {'load s':>7s} {'warm s':>7s} {'p50 ms':>7s} {'p99 ms':>7s} "
+              f"{'batch s':>8s} {'MAE':>9s}")
+        for name, path in paths.items():
+            result = subprocess.run(
+                [sys.executable, __file__, '--measure', path, eval_file, '--batch-rows', str(args.batch_rows),
+                 '--single-calls', str(args.single_calls)],
+                capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{name:>11s} failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{name:>11s} {r['cold_start']:7.2f} {r['load_seconds']:7.3f} {r['warmup_seconds']:7.3f} "
+                  f"{r['p50_ms']:7.2f} {r['p99_ms']:7.2f} {r['batch_seconds']:8.3f} {r['mae']:9.2f}")
+        print("cold s: process start to the end of the warm-up prediction (imports, load, warm-up).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compare the vectorized cleaners in utilization.cleaning_data with the old row-wise ones.
+
+The ~2k rows of data/Property_Scraping.csv are replicated to `--rows` listings
+(with unique URLs), both implementations are run on the same frame, and the
+cleaned CSV output must be identical.
+
+    python benchmarks/bench_cleaning.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import warnings
+from time import perf_counter
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+sys.path.insert(0, BENCH_DIR)
+
+import legacy_cleaning  # noqa: E402
+from utilization import cleaning_data  # noqa: E402
+
+STAGES = ['rename_and_adjust_price', 'classify_city', 'classify_property_type', 'categorize_certificate',
+          'categorize_property_condition', 'categorize_water_source', 'convert_road_width_to_meter']
+
+
+def run_stages(module, data):
+    timings = {}
+    data = data.drop_duplicates(subset='url')
+    for stage in STAGES:
+        start = perf_counter()
+        data = getattr(module, stage)(data)
+        timings[stage] = perf_counter() - start
+    return data, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--input', default=os.path.join(BENCH_DIR, '..', 'data', 'Property_Scraping.csv'))
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    raw = pd.read_csv(args.input)
+    data = raw.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+    data['url'] = data['url'].astype(str) + '?copy=' + data.index.astype(str)
+
+    legacy_out, legacy_times = run_stages(legacy_cleaning, data.copy())
+    vector_out, vector_times = run_stages(cleaning_data, data.copy())
+
+    identical = legacy_out.to_csv(index=False) == vector_out.to_csv(index=False)
+    print(f"{args.rows:,} rows -> {len(vector_out):,} cleaned rows, identical output: {identical}\n")
+    print(f"{'stage':32s} {'row-wise':>10s} {'vectorized':>11s} {'speedup':>8s}")
+    for stage in STAGES:
+        print(f"{stage:32s} {legacy_times[stage]:9.2f}s {vector_times[stage]:10.2f}s "
+              f"{legacy_times[stage] / max(vector_times[stage], 1e-9):7.1f}x")
+    legacy_total, vector_total = sum(legacy_times.values()), sum(vector_times.values())
+    print(f"{'total':32s} {legacy_total:9.2f}s {vector_total:10.2f}s {legacy_total / vector_total:7.1f}x")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Peak RSS of CleaningData, whole-file vs chunked, as the input grows.
+
+For every size, data/Property_Scraping.csv is replicated (unique URLs) into a
+temporary CSV and CleaningData runs in a fresh subprocess so that ru_maxrss
+reflects that run only.
+
+    python benchmarks/bench_cleaning_memory.py --sizes 50000 200000 800000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import warnings
+from time import perf_counter
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+
+
+def run_worker(input_file, output_file, chunksize):
+    from utilization.cleaning_data import CleaningData
+
+    warnings.simplefilter('ignore')
+    start = perf_counter()
+    CleaningData(input_file, output_file, chunksize=chunksize)
+    elapsed = perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50_000, 200_000, 800_000])
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--worker', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        input_file, output_file, chunksize = args.worker
+        run_worker(input_file, output_file, None if chunksize == 'None' else int(chunksize))
+        return
+
+    raw = pd.read_csv(os.path.join(BENCH_DIR, '..', 'data', 'Property_Scraping.csv'))
+    print(f"{'rows':>10s} {'mode':>12s} {'seconds':>9s} {'peak RSS':>10s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, 'Property_Scraping.csv')
+        output_file = os.path.join(tmp, 'data_cleaned.csv')
+        for size in args.sizes:
+            data = raw.sample(size, replace=True, random_state=0).reset_index(drop=True)
+            data['url'] = data['url'].astype(str) + '?copy=' + data.index.astype(str)
+            data.to_csv(input_file, index=False)
+            del data
+
+            for chunksize in [None, args.chunksize]:
+                result = subprocess.run([sys.executable, __file__, '--worker', input_file, output_file, str(chunksize)],
+                                        capture_output=True, text=True, check=True)
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                mode = 'whole file' if chunksize is None else f'chunk {chunksize:,}'
+                print(f"{size:>10,} {mode:>12s} {stats['seconds']:8.1f}s {stats['peak_rss_mb']:8.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Compare the pickled RandomForest bundle with its compact (array-backed, memory-mapped) export.
+
+A pipeline like the DAG's (imputer, scaler/one-hot, RandomForestRegressor)
+is trained on data/data_cleaned.csv resampled to `--rows` (numeric columns
+jittered), saved as a pickled bundle and exported twice: with all trees and
+with the tree subset chosen within `--max-mae-increase`. Every artifact is
+then measured in a fresh process: load time, RSS growth, single-row latency
+(p50/p99) and the wall time of one batch predict, plus the test MAE.
+
+    python benchmarks/bench_compact_forest.py --rows 20000 --trees 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+NUM_COLS = ['land_size_m2', 'building_size_m2', 'road_width', 'maid_bedroom', 'maid_bathroom', 'kitchen',
+            'floor_level', 'bedroom', 'bathroom', 'garage', 'carport', 'voltage_watt']
+CAT_COLS = ['city', 'property_type', 'certificate', 'furniture', 'house_facing', 'water_source',
+            'property_condition']
+
+
+def build_artifacts(args, workdir):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+    from utilization.compact_forest import export_compact_bundle
+    from utilization.feature_engineering import SELECTED_COLUMNS, split_features_and_target, split_selection_rows
+    from utilization.imputation import KNNFeatureImputer
+    from utilization.model_bundle import ModelBundle, save_bundle
+
+    rng = np.random.default_rng(0)
+    base = pd.read_csv(os.path.join(BENCH_DIR, '..', 'data', 'data_cleaned.csv'), usecols=SELECTED_COLUMNS)
+    data = base.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+    for col in NUM_COLS:
+        data[col] = data[col] * rng.normal(1, 0.05, args.rows)
+    X_train, X_test, y_train, y_test = split_features_and_target(data)
+    # Trees are selected on training rows held out from fitting, like in the DAG
+    X_train, X_select, y_train, y_select = split_selection_rows(X_train, y_train)
+
+    pipeline = Pipeline([
+        ('imputer', KNNFeatureImputer(NUM_COLS, CAT_COLS)),
+        ('transformer', ColumnTransformer([('scaler', MinMaxScaler(), NUM_COLS),
+                                           ('encoder_ohe', OneHotEncoder(handle_unknown='ignore'), CAT_COLS)])),
+        ('model', RandomForestRegressor(n_estimators=args.trees, random_state=999, n_jobs=-1)),
+    ])
+    start = perf_counter()
+    pipeline.fit(X_train, y_train)
+    print(f"Trained {args.trees} trees on {len(X_train):,} rows in {perf_counter() - start:.1f}s.")
+    bundle = ModelBundle.from_training(pipeline, X_train, y_train, CAT_COLS)
+
+    paths = {'pickle': os.path.join(workdir, 'model.pkl'),
+             'compact': os.path.join(workdir, 'model.compact'),
+             'compact+select': os.path.join(workdir, 'model_selected.compact')}
+    save_bundle(bundle, paths['pickle'])
+    export_compact_bundle(bundle, paths['compact'])
+    export_compact_bundle(bundle, paths['compact+select'], X_select, y_select, max_mae_increase=args.max_mae_increase)
+
+    eval_file = os.path.join(workdir, 'eval.pkl')
+    pd.to_pickle((X_test, y_test), eval_file)
+    return paths, eval_file
+
+
+def measure(path, eval_file, batch_rows, single_calls):
+    """Runs in a fresh process; prints one JSON line."""
+    from model_registry import current_rss_mb
+    from sklearn.metrics import mean_absolute_error
+    from utilization.model_bundle import load_bundle
+
+    X_eval, y_eval = pd.read_pickle(eval_file)
+    rss_before = current_rss_mb()
+    start = perf_counter()
+    bundle = load_bundle(path)
+    load_seconds = perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    mae = mean_absolute_error(y_eval, bundle.predict(X_eval))
+    record = X_eval.head(1)
+    latencies = []
+    for _ in range(single_calls):
+        start = perf_counter()
+        bundle.predict(record)
+        latencies.append(perf_counter() - start)
+    batch = X_eval.sample(batch_rows, replace=True, random_state=0)
+    start = perf_counter()
+    bundle.predict(batch)
+    batch_seconds = perf_counter() - start
+
+    size_mb = (sum(entry.stat().st_size for entry in os.scandir(path)) if os.path.isdir(path)
+               else os.path.getsize(path)) / (1024 * 1024)
+    print(json.dumps({"size_mb": size_mb, "load_seconds": load_seconds, "rss_load_mb": rss_loaded - rss_before,
+                      "rss_after_mb": current_rss_mb() - rss_before, "p50_ms": np.percentile(latencies, 50) * 1e3,
+                      "p99_ms": np.percentile(latencies, 99) * 1e3, "batch_seconds": batch_seconds, "mae": mae}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--trees', type=int, default=500)
+    parser.add_argument('--max-mae-increase', type=float, default=0.01)
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    parser.add_argument('--single-calls', type=int, default=200)
+    parser.add_argument('--measure', nargs=2, metavar=('MODEL', 'EVAL_FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.measure:
+        measure(*args.measure, args.batch_rows, args.single_calls)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, eval_file = build_artifacts(args, workdir)
+        print(f"{'artifact':>15s} {'size MB':>8s} {'load s':>7s} {'RSS MB':>7s} {'RSS*MB':>7s} "
+              f"{'p50 ms':>7s} {'p99 ms':>7s} {'batch s':>8s} {'MAE':>9s}")
+        for name, path in paths.items():
+            output = subprocess.run(
+                [sys.executable, __file__, '--measure', path, eval_file, '--batch-rows', str(args.batch_rows),
+                 '--single-calls', str(args.single_calls)],
+                check=True, capture_output=True, text=True).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{name:>15s} {r['size_mb']:8.1f} {r['load_seconds']:7.3f} {r['rss_load_mb']:7.1f} "
+                  f"{r['rss_after_mb']:7.1f} {r['p50_ms']:7.2f} {r['p99_ms']:7.2f} {r['batch_seconds']:8.2f} "
+                  f"{r['mae']:9.2f}")
+        print("RSS MB: growth after load; RSS*MB: after predicting (memory-mapped pages are read on first use).")
+
+
+if __name__ == '__main__':
+    main()
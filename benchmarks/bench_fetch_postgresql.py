@@ -0,0 +1,104 @@
+"""Wall time and peak RSS of FetchFromPostgresql against the old `read_sql` query.
+
+Needs a reachable Postgres (e.g. the `postgres` container of the compose file
+with its port published). data/data_cleaned.csv is replicated to `--rows` rows
+into a scratch table, then every mode runs in a fresh subprocess so that
+ru_maxrss reflects that run only:
+
+    read_sql  pd.read_sql("SELECT * ...") + to_csv (previous implementation)
+    cursor    named server-side cursor, projected columns, Parquet output
+    copy      COPY (SELECT ...) TO STDOUT, projected columns, Parquet output
+
+    PRICEWISE_DSN="dbname=house_prediction_db host=localhost user=airflow password=airflow" \\
+        python benchmarks/bench_fetch_postgresql.py --rows 1000000
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import warnings
+from time import perf_counter
+
+import pandas as pd
+import psycopg2 as db
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+
+DSN = os.environ.get('PRICEWISE_DSN', "dbname='house_prediction_db' host='localhost' user='airflow' password='airflow'")
+TABLE = 'bench_house_prediction_table'
+
+
+def create_table(conn, rows):
+    data = pd.read_csv(os.path.join(BENCH_DIR, '..', 'data', 'data_cleaned.csv'))
+    data = data.sample(rows, replace=True, random_state=0).reset_index(drop=True)
+    data['url'] = data['url'].astype(str) + '?copy=' + data.index.astype(str)
+
+    types = {col: 'BOOLEAN' if dtype == bool else 'FLOAT' if dtype.kind in 'if' else 'TEXT'
+             for col, dtype in data.dtypes.items()}
+    types['corner_property'] = 'BOOLEAN'
+    columns = ', '.join(f'{col} {sql_type}' for col, sql_type in types.items())
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE};")
+        cursor.execute(f"CREATE TABLE {TABLE} ({columns}, updated_at TIMESTAMP DEFAULT LOCALTIMESTAMP);")
+        buffer = io.StringIO()
+        data.to_csv(buffer, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {TABLE} ({', '.join(data.columns)}) FROM STDIN WITH CSV HEADER", buffer)
+    conn.commit()
+
+
+def run_worker(mode, output_dir):
+    from utilization.fetch_from_postgresql import FetchFromPostgresql
+
+    warnings.simplefilter('ignore')
+    start = perf_counter()
+    if mode == 'read_sql':
+        conn = db.connect(DSN)
+        df = pd.read_sql(f"SELECT * FROM {TABLE};", conn)
+        conn.close()
+        df.to_csv(os.path.join(output_dir, 'data_cleaned.csv'), index=False)
+        rows = len(df)
+    else:
+        rows = FetchFromPostgresql(os.path.join(output_dir, f'{mode}.parquet'), mode=mode, conn_string=DSN,
+                                   state_file=os.path.join(output_dir, 'fetch_state.json'), table=TABLE)
+    elapsed = perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"rows": rows, "seconds": elapsed, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--keep-table', action='store_true', help="Do not drop the scratch table afterwards.")
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    conn = db.connect(DSN)
+    try:
+        create_table(conn, args.rows)
+        print(f"{'mode':>10s} {'rows':>10s} {'seconds':>9s} {'peak RSS':>10s}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in ['read_sql', 'cursor', 'copy']:
+                result = subprocess.run([sys.executable, __file__, '--worker', mode, tmp],
+                                        capture_output=True, text=True, check=True)
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{mode:>10s} {stats['rows']:>10,} {stats['seconds']:8.1f}s {stats['peak_rss_mb']:8.0f}MB")
+    finally:
+        if not args.keep_table:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLE};")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
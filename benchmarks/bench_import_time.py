@@ -0,0 +1,79 @@
+"""Import time of the DAG file, the utilization modules and the app's model registry.
+
+Every module is imported in a fresh interpreter with `python -X importtime`;
+the report shows the total import time and the heavy third-party packages
+that were loaded. Modules listed in GUARDED must not load any of the heavy
+packages (the DAG file is re-parsed by the scheduler all the time, and the
+registry is imported on every app start), so the script exits with status 1
+if one does, or if a module takes longer than `--max-ms`.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --max-ms 300 mlops model_registry
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+DAGS_DIR = os.path.join(ROOT_DIR, 'dags')
+
+HEAVY_PACKAGES = ['sklearn', 'scipy', 'pandas', 'pyarrow', 'numpy', 'openai', 'zyte_api', 'bs4', 'psycopg2',
+                  'tensorflow', 'tf_keras']
+GUARDED = {'mlops', 'model_registry'}
+MODULES = ['mlops', 'model_registry', 'utilization.scraping_link', 'utilization.scraping_data',
+           'utilization.load_to_postgresql', 'utilization.fetch_from_postgresql', 'utilization.cleaning_data',
+           'utilization.partitioning', 'utilization.feature_engineering', 'utilization.modeling',
+           'utilization.choose_best_model']
+
+
+def import_profile(module):
+    """Import `module` in a fresh interpreter; returns (total µs, {package: cumulative µs})."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([DAGS_DIR, ROOT_DIR, os.environ.get('PYTHONPATH', '')])}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+
+    total, packages = 0, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.startswith(' ') and not name.startswith('  '):  # top-level import (one space after the bar)
+            total += int(cumulative)
+        if '.' not in name.strip():  # root of a package, at whatever depth it was first imported
+            packages[name.strip()] = int(cumulative)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--max-ms', type=float, default=None, help="Fail if a module takes longer to import")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':>34s} {'ms':>8s}  heavy packages loaded (cumulative ms)")
+    for module in args.modules:
+        try:
+            total, packages = import_profile(module)
+        except ImportError as e:
+            print(f"{module:>34s} {'-':>8s}  skipped ({e})")
+            continue
+        heavy = {name: packages[name] for name in HEAVY_PACKAGES if name in packages}
+        heavy_text = ', '.join(f"{name} {us / 1e3:.0f}" for name, us in sorted(heavy.items(), key=lambda x: -x[1]))
+        print(f"{module:>34s} {total / 1e3:8.1f}  {heavy_text or '-'}")
+        if module in GUARDED and heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if args.max_ms is not None and total / 1e3 > args.max_ms:
+            failures.append(f"{module} takes {total / 1e3:.0f} ms to import (limit {args.max_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
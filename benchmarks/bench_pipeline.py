@@ -0,0 +1,287 @@
+"""End-to-end pipeline benchmark on synthetic listings, with JSON results to diff between commits.
+
+For every `--rows` size, synthetic listings (see synthetic_listings.py) are
+written to a work directory and the pipeline stages run on them in order,
+each in a fresh process with all data paths redirected to that directory:
+
+    cleaning             CleaningData on the raw CSV
+    imputation           impute_with_knn on the train/test split of the cleaned data
+    feature_engineering  FeatureEngineering (writes the input of modeling)
+    modeling             Modeling (halving search, `--modeling-budget` seconds at most)
+    choose_best_model    ChooseBestModel (paired test, compact export)
+    predict_single       one-row predictions of best_model_ever, p50/p99
+    predict_batch        one `--batch-rows` predict of best_model_ever
+
+Each stage reports wall time, rows processed, rows/s and the process's peak
+RSS. Results are written as JSON (commit, machine, parameters, stages) to
+`--output`; `--compare OLD.json` prints the change per stage against an
+earlier run. A stage that fails or times out is recorded with its error and
+the stages depending on it are skipped.
+
+    python benchmarks/bench_pipeline.py --rows 10000 100000
+    python benchmarks/bench_pipeline.py --rows 1000000 --stages cleaning imputation
+    python benchmarks/bench_pipeline.py --rows 10000 --compare benchmarks/results/pipeline-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timezone
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'dags'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+NUM_COLS = ['land_size_m2', 'building_size_m2', 'road_width', 'maid_bedroom', 'maid_bathroom', 'kitchen',
+            'floor_level', 'bedroom', 'bathroom', 'garage', 'carport', 'voltage_watt']
+CAT_COLS = ['city', 'property_type', 'certificate', 'furniture', 'house_facing', 'water_source',
+            'property_condition']
+STAGES = ['cleaning', 'imputation', 'feature_engineering', 'modeling', 'choose_best_model', 'predict_single',
+          'predict_batch']
+# Stage -> stages whose output it reads
+DEPENDS_ON = {
+    'cleaning': [],
+    'imputation': ['cleaning'],
+    'feature_engineering': ['cleaning'],
+    'modeling': ['feature_engineering'],
+    'choose_best_model': ['modeling'],
+    'predict_single': ['choose_best_model'],
+    'predict_batch': ['choose_best_model'],
+}
+RESULT_PREFIX = 'BENCH_RESULT '
+RAW_FILE = 'Property_Scraping.csv'
+
+
+# ================== Stages (run in a child process) ==================
+
+def redirect_paths(workdir):
+    """Point every data file of the pipeline modules (and their metrics) into `workdir`."""
+    from utilization import choose_best_model, feature_engineering, instrumentation, modeling
+
+    def path(name):
+        return os.path.join(workdir, name)
+
+    instrumentation.configure(path('metrics.jsonl'), path('metrics.prom'), path('profiles'))
+    feature_engineering.CLEANED_DATA_FILE = path('data_cleaned.parquet')
+    feature_engineering.FE_DATA_FILE = path('data_after_fe.pkl')
+    modeling.FE_DATA_FILE = path('data_after_fe.pkl')
+    modeling.BEST_MODEL_FILE = path('best_model.pkl')
+    modeling.BEST_MODEL_HGB_FILE = path('best_model_hgb.pkl')
+    choose_best_model.FE_DATA_FILE = path('data_after_fe.pkl')
+    choose_best_model.BEST_MODEL_FILE = path('best_model.pkl')
+    choose_best_model.BEST_MODEL_HGB_FILE = path('best_model_hgb.pkl')
+    choose_best_model.BEST_MODEL_EVER_FILE = path('best_model_ever.pkl')
+    choose_best_model.COMPACT_MODEL_EVER_DIR = path('best_model_ever.compact')
+    # No Keras model in the work directory: the ANN candidate is skipped
+    choose_best_model.ANN_MODEL_FILE = path('model_ann.keras')
+    choose_best_model.ANN_PREPROCESSING_FILE = path('model_ann_preprocessing.pkl')
+    choose_best_model.ANN_BUNDLE_FILE = path('model_ann.pkl')
+    choose_best_model.ANN_LITE_BUNDLE_FILE = path('model_ann_lite.pkl')
+
+def load_test_set(workdir):
+    import pandas as pd
+    loaded = pd.read_pickle(os.path.join(workdir, 'data_after_fe.pkl'))
+    return loaded["X_test"]
+
+def run_stage(stage, workdir, args):
+    """Run one stage; returns (rows processed, extra figures)."""
+    redirect_paths(workdir)
+    if stage == 'cleaning':
+        from utilization.cleaning_data import CleaningData
+        CleaningData(os.path.join(workdir, RAW_FILE), os.path.join(workdir, 'data_cleaned.csv'),
+                     parquet_file=os.path.join(workdir, 'data_cleaned.parquet'))
+        from utilization.storage import read_table
+        return args.input_rows, {"rows_out": len(read_table(os.path.join(workdir, 'data_cleaned.parquet'),
+                                                            columns=['url']))}
+
+    if stage == 'imputation':
+        from utilization.feature_engineering import (CLEANED_DATA_FILE, impute_with_knn, read_and_filter_data,
+                                                     split_features_and_target)
+        X_train, X_test, _, _ = split_features_and_target(read_and_filter_data(CLEANED_DATA_FILE))
+        start = perf_counter()
+        impute_with_knn(X_train, X_test, NUM_COLS, CAT_COLS)
+        return len(X_train) + len(X_test), {"impute_seconds": perf_counter() - start}
+
+    if stage == 'feature_engineering':
+        from utilization.feature_engineering import CLEANED_DATA_FILE, FeatureEngineering
+        from utilization.storage import read_table
+        FeatureEngineering()
+        return len(read_table(CLEANED_DATA_FILE, columns=['price_mio'])), {}
+
+    if stage == 'modeling':
+        from utilization.modeling import SEARCH_TIME_BUDGET, Modeling
+        Modeling(trials_file=os.path.join(workdir, 'trials.jsonl'),
+                 time_budget=args.modeling_budget or SEARCH_TIME_BUDGET)
+        from utilization.model_bundle import load_bundle
+        bundles = {name: load_bundle(os.path.join(workdir, f'{name}.pkl')) for name in ['best_model', 'best_model_hgb']
+                   if os.path.exists(os.path.join(workdir, f'{name}.pkl'))}
+        n_train = bundles['best_model'].metadata["n_train_rows"]
+        return n_train, {name: bundle.metadata["metrics"] for name, bundle in bundles.items()}
+
+    if stage == 'choose_best_model':
+        from utilization.choose_best_model import ChooseBestModel
+        ChooseBestModel()
+        return len(load_test_set(workdir)), {}
+
+    import numpy as np
+    from model_registry import resolve_model_path
+    from utilization.model_bundle import load_bundle
+    bundle = load_bundle(resolve_model_path(os.path.join(workdir, 'best_model_ever.pkl')))
+    bundle.warm_up()
+    X_test = load_test_set(workdir)
+    if stage == 'predict_single':
+        latencies = []
+        for i in range(args.single_calls):
+            record = X_test.iloc[[i % len(X_test)]]
+            start = perf_counter()
+            bundle.predict(record)
+            latencies.append(perf_counter() - start)
+        return args.single_calls, {"p50_ms": float(np.percentile(latencies, 50) * 1e3),
+                                   "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+                                   "estimator": bundle.metadata.get("estimator")}
+    if stage == 'predict_batch':
+        batch = X_test.sample(args.batch_rows, replace=True, random_state=0)
+        start = perf_counter()
+        bundle.predict(batch)
+        return len(batch), {"predict_seconds": perf_counter() - start, "estimator": bundle.metadata.get("estimator")}
+    raise ValueError(f"Unknown stage: {stage!r}")
+
+def child_main(args):
+    from model_registry import current_rss_mb
+    baseline_rss = current_rss_mb()
+    metrics_file = os.path.join(args.workdir, 'metrics.jsonl')
+    metrics_offset = os.path.getsize(metrics_file) if os.path.exists(metrics_file) else 0
+    start = perf_counter()
+    rows, extra = run_stage(args.run_stage, args.workdir, args)
+    seconds = perf_counter() - start
+    # Spans recorded by the stage itself (e.g. modeling's search), see utilization.instrumentation
+    if os.path.exists(metrics_file):
+        with open(metrics_file) as f:
+            f.seek(metrics_offset)
+            spans = {name: span["seconds"] for line in f for name, span in json.loads(line)["spans"].items()}
+        if spans:
+            extra["spans"] = spans
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    print(RESULT_PREFIX + json.dumps({"seconds": seconds, "rows": rows, "rows_per_second": rows / seconds,
+                                      "peak_rss_mb": peak_rss_mb, "baseline_rss_mb": baseline_rss, **extra},
+                                     default=str))
+
+
+# ================== Driver ==================
+
+def git_commit():
+    def git(*cmd):
+        result = subprocess.run(['git', *cmd], cwd=ROOT_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return git('rev-parse', '--short', 'HEAD'), bool(git('status', '--porcelain', '--untracked-files=no'))
+
+def stage_process(stage, workdir, args, input_rows):
+    command = [sys.executable, __file__, '--run-stage', stage, '--workdir', workdir,
+               '--input-rows', str(input_rows), '--batch-rows', str(args.batch_rows),
+               '--single-calls', str(args.single_calls)]
+    if args.modeling_budget:
+        command += ['--modeling-budget', str(args.modeling_budget)]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=args.stage_timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timeout after {args.stage_timeout}s"}
+    lines = [line for line in result.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if result.returncode != 0 or not lines:
+        stderr = result.stderr.strip().splitlines()
+        return {"error": stderr[-1] if stderr else f"exit status {result.returncode}"}
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+def run_size(rows, args):
+    from synthetic_listings import write_listings
+
+    stages = {}
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        start = perf_counter()
+        write_listings(os.path.join(workdir, RAW_FILE), rows, seed=args.seed)
+        generate_seconds = perf_counter() - start
+        print(f"\n{rows:,} listings generated in {generate_seconds:.1f}s")
+        print(f"{'stage':>20s} {'seconds':>9s} {'rows':>10s} {'rows/s':>11s} {'peak RSS MB':>12s}")
+        for stage in STAGES:
+            if stage not in args.stages:
+                continue
+            missing = [dependency for dependency in DEPENDS_ON[stage]
+                       if dependency not in stages or "error" in stages[dependency]]
+            if missing:
+                stages[stage] = {"error": f"skipped, needs {', '.join(missing)}"}
+            else:
+                stages[stage] = stage_process(stage, workdir, args, rows)
+            r = stages[stage]
+            if "error" in r:
+                print(f"{stage:>20s} {r['error']}")
+            else:
+                print(f"{stage:>20s} {r['seconds']:9.2f} {r['rows']:10,d} {r['rows_per_second']:11,.0f} "
+                      f"{r['peak_rss_mb']:12.0f}")
+    return {"rows": rows, "generate_seconds": generate_seconds, "stages": stages}
+
+def compare(results, baseline_file):
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    base_runs = {run["rows"]: run["stages"] for run in baseline["runs"]}
+    print(f"\nChange vs {baseline.get('commit')} ({os.path.basename(baseline_file)}):")
+    print(f"{'rows':>10s} {'stage':>20s} {'seconds':>18s} {'peak RSS MB':>18s}")
+    for run in results["runs"]:
+        for stage, r in run["stages"].items():
+            base = base_runs.get(run["rows"], {}).get(stage)
+            if not base or "error" in base or "error" in r:
+                continue
+            print(f"{run['rows']:10,d} {stage:>20s} {base['seconds']:7.2f} -> {r['seconds']:7.2f} "
+                  f"{base['peak_rss_mb']:7.0f} -> {r['peak_rss_mb']:7.0f}  "
+                  f"({r['seconds'] / base['seconds'] - 1:+.0%} time, "
+                  f"{r['peak_rss_mb'] / base['peak_rss_mb'] - 1:+.0%} memory)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000])
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--modeling-budget', type=float, default=None,
+                        help="Search time budget of Modeling in seconds (default: the DAG's SEARCH_TIME_BUDGET)")
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    parser.add_argument('--single-calls', type=int, default=200)
+    parser.add_argument('--stage-timeout', type=float, default=3600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help="Parent directory of the per-size work directories")
+    parser.add_argument('--output', default=None, help="Result JSON (default benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument('--compare', default=None, metavar='OLD_JSON')
+    parser.add_argument('--run-stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--input-rows', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    if args.run_stage:
+        child_main(args)
+        return
+
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit, "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        "parameters": {"modeling_budget": args.modeling_budget, "batch_rows": args.batch_rows,
+                       "single_calls": args.single_calls, "seed": args.seed},
+        "runs": [run_size(rows, args) for rows in args.rows],
+    }
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"pipeline-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
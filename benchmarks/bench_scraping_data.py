@@ -0,0 +1,140 @@
+"""Measure ScrapingData extraction throughput offline with fake Zyte/OpenAI clients.
+
+The fakes sleep to simulate network latency, so the numbers show how well the
+pipeline overlaps fetching, text extraction and GPT calls. The first run is
+interrupted after `--crash-after` fetches; a second run on the journal it left
+checks that only the unfinished listings are processed again, and a third run
+from scratch checks that the HTML/extraction cache avoids every call.
+
+    python benchmarks/bench_scraping_data.py --listings 200 --workers 16
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from utilization import instrumentation  # noqa: E402
+from utilization.scraping_data import SCHEMA, ScrapingData, ScrapingJournal  # noqa: E402
+
+
+class SimulatedCrash(BaseException):
+    """Not an `Exception`, so it isn't counted as a failed listing but aborts the run like a killed worker."""
+
+
+class FakeZyteAPI:
+    """Stand-in for `zyte_api.ZyteAPI` returning a small listing page.
+
+    With `crash_after`, every call after the first `crash_after` ones raises
+    `SimulatedCrash`.
+    """
+
+    def __init__(self, latency, crash_after=None):
+        self.latency = latency
+        self.crash_after = crash_after
+        self.calls = 0
+
+    def get(self, query):
+        self.calls += 1
+        if self.crash_after is not None and self.calls > self.crash_after:
+            raise SimulatedCrash()
+        sleep(self.latency)
+        return {"html": f"<html><body><h1>Rumah dijual</h1><p>{query['url']}</p>"
+                        f"<p>LT 120 m2, LB 90 m2, 3 KT, 2 KM, SHM</p></body></html>"}
+
+
+class FakeOpenAI:
+    """Stand-in for `openai.OpenAI` answering with a JSON record matching the schema."""
+
+    def __init__(self, latency, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, temperature):
+        self.calls += 1
+        sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Simulated API failure")
+        record = {key: (1 if spec["type"] == "number" else "x") for key, spec in SCHEMA.items()}
+        content = "```json\n" + json.dumps(record) + "\n```"
+        usage = SimpleNamespace(prompt_tokens=len(messages[-1]["content"]) // 4, completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--zyte-latency', type=float, default=0.3)
+    parser.add_argument('--gpt-latency', type=float, default=0.8)
+    parser.add_argument('--crash-after', type=int, default=None,
+                        help="Fetches before run 1 is interrupted (default: half of the listings)")
+    args = parser.parse_args()
+    crash_after = args.listings // 2 if args.crash_after is None else args.crash_after
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        links_file = os.path.join(tmp, 'link_properties.csv')
+        output_file = os.path.join(tmp, 'Property_Scraping.csv')
+        journal_file = os.path.join(tmp, 'scraping_journal.jsonl')
+        cache_dir = os.path.join(tmp, 'cache')
+        metrics_file = os.path.join(tmp, 'metrics.jsonl')
+        instrumentation.configure(metrics_file, os.path.join(tmp, 'metrics.prom'), os.path.join(tmp, 'profiles'))
+        pd.DataFrame({
+            'property_title': [f'Rumah {i}' for i in range(args.listings)],
+            'property_url': [f'/properti/bogor/hos{i:08d}/' for i in range(args.listings)],
+        }).to_csv(links_file, index=False)
+        paths = dict(links_file=links_file, output_file=output_file, journal_file=journal_file,
+                     index_file=os.path.join(tmp, 'scrape_index.csv'), incremental=False)
+
+        # Run 1: 20% of GPT calls fail and the run is killed after `crash_after` fetches
+        zyte, gpt = FakeZyteAPI(args.zyte_latency, crash_after=crash_after), FakeOpenAI(args.gpt_latency, 0.2)
+        start = perf_counter()
+        try:
+            ScrapingData(max_workers=args.workers, client_zyte=zyte, client_openai=gpt, cache_dir=cache_dir, **paths)
+        except SimulatedCrash:
+            pass
+        first = perf_counter() - start
+        rows_first = len(ScrapingJournal(journal_file).load())
+
+        # Run 2: resumes from the journal run 1 left, only unfinished listings are processed
+        zyte2, gpt2 = FakeZyteAPI(args.zyte_latency), FakeOpenAI(args.gpt_latency)
+        start = perf_counter()
+        ScrapingData(max_workers=args.workers, client_zyte=zyte2, client_openai=gpt2, cache_dir=cache_dir, **paths)
+        second = perf_counter() - start
+        rows_second = len(pd.read_csv(output_file))
+
+        # Run 3: same listings again, everything should come from the cache
+        os.remove(output_file)
+        zyte3, gpt3 = FakeZyteAPI(args.zyte_latency), FakeOpenAI(args.gpt_latency)
+        start = perf_counter()
+        ScrapingData(max_workers=args.workers, client_zyte=zyte3, client_openai=gpt3, cache_dir=cache_dir, **paths)
+        third = perf_counter() - start
+        with open(metrics_file) as f:
+            first_metrics, second_metrics = json.loads(f.readline()), json.loads(f.readline())
+
+    serial = rows_first * (args.zyte_latency + args.gpt_latency + 1)
+    print(f"\nRun 1 (interrupted after {crash_after} fetches): {rows_first} listings journaled in {first:.2f}s "
+          f"-> {rows_first / first:.1f} listings/s (serial loop with sleep(1): ~{serial:.0f}s)")
+    print(f"Run 2 (resume): {second_metrics['counters'].get('rows_in', 0)} unfinished listings processed "
+          f"({zyte2.calls} fetches, {gpt2.calls} GPT calls) in {second:.2f}s, {rows_second} rows in the output")
+    print(f"Run 3 (cached): {zyte3.calls} fetches, {gpt3.calls} GPT calls in {third:.2f}s")
+    counters = first_metrics["counters"]
+    print(f"Run 1 metrics: {counters.get('tokens_prompt', 0):,} prompt + {counters.get('tokens_completion', 0):,} "
+          f"completion tokens, {counters.get('extraction_errors', 0)} extraction errors")
+    for service, call in first_metrics["external_calls"].items():
+        print(f"  {service}: {call['count']} calls, {call['errors']} errors, p50 {call['p50_seconds'] * 1e3:.0f} ms, "
+              f"p95 {call['p95_seconds'] * 1e3:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
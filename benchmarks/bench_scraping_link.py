@@ -0,0 +1,87 @@
+"""Measure ScrapingLink throughput (pages/sec) against a local stub HTTP server.
+
+The stub serves search pages with a fixed latency and answers every 5th first
+request with 503, so retries and connection reuse are exercised too.
+
+    python benchmarks/bench_scraping_link.py --pages 70 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from utilization.scraping_link import ScrapingLink  # noqa: E402
+
+CARDS_PER_PAGE = 20
+
+
+def make_handler(latency):
+    seen_pages = set()
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+            with lock:
+                first_hit = page not in seen_pages
+                seen_pages.add(page)
+            sleep(latency)
+
+            if first_hit and page % 5 == 0:
+                status, body = 503, b'busy'
+            else:
+                cards = ''.join(
+                    f'<div class="card-featured__middle-section">'
+                    f'<a title="Rumah {page}-{i}" href="/properti/bogor/hos{page:04d}{i:03d}/">x</a></div>'
+                    for i in range(CARDS_PER_PAGE)
+                )
+                status, body = 200, f'<html><body>{cards}</body></html>'.encode()
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=70)
+    parser.add_argument('--latency', type=float, default=0.2, help="Server latency per request in seconds.")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=20.0, help="Requests per second allowed by the token bucket.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/jual/cari/?page={{}}'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'link_properties.csv')
+        start = perf_counter()
+        rows = ScrapingLink(1, args.pages, max_workers=args.workers, requests_per_second=args.rate,
+                            output_file=output_file, base_url=base_url)
+        elapsed = perf_counter() - start
+    server.shutdown()
+
+    expected = args.pages * CARDS_PER_PAGE
+    print(f"\n{args.pages} pages, {rows}/{expected} links in {elapsed:.2f}s -> {args.pages / elapsed:.2f} pages/s")
+    # The old serial loop needs at least latency + sleep(2) per page
+    print(f"Serial baseline (latency + 2s sleep): >= {args.pages * (args.latency + 2):.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Load time of the feature-engineering input, CSV vs Parquet.
+
+data/Property_Scraping.csv is cleaned once, replicated to `--rows` rows and
+written as both CSV and Parquet; then read_and_filter_data loads the selected
+columns from each file.
+
+    python benchmarks/bench_storage.py --rows 500000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+from time import perf_counter
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'dags'))
+
+from utilization.cleaning_data import CleaningData
+from utilization.feature_engineering import read_and_filter_data
+from utilization.storage import read_table, write_table
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        result = func(*args)
+        timings.append(perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, 'data_cleaned.csv')
+        parquet_file = os.path.join(tmp, 'data_cleaned.parquet')
+        CleaningData(os.path.join(BENCH_DIR, '..', 'data', 'Property_Scraping.csv'), csv_file,
+                     parquet_file=parquet_file)
+        cleaned = read_table(parquet_file)
+        cleaned = cleaned.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+        cleaned.to_csv(csv_file, index=False)
+        write_table(cleaned, parquet_file)
+
+        csv_seconds, from_csv = best_of(args.repeat, read_and_filter_data, csv_file)
+        parquet_seconds, from_parquet = best_of(args.repeat, read_and_filter_data, parquet_file)
+
+        print(f"rows: {len(cleaned):,}")
+        print(f"CSV     {os.path.getsize(csv_file) / 1e6:8.1f}MB  {csv_seconds:6.2f}s")
+        print(f"Parquet {os.path.getsize(parquet_file) / 1e6:8.1f}MB  {parquet_seconds:6.2f}s "
+              f"({csv_seconds / parquet_seconds:.1f}x faster)")
+        print(f"categorical columns kept: {list(from_parquet.select_dtypes('category').columns)}")
+        pd.testing.assert_frame_equal(from_csv, from_parquet.astype(from_csv.dtypes.to_dict()), check_dtype=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Frozen copy of the impute_with_knn implementation replaced by utilization.imputation.
+
+Kept only as the reference implementation for benchmarks/bench_imputation.py.
+"""
+import pandas as pd
+from sklearn.impute import KNNImputer
+from sklearn.preprocessing import LabelEncoder
+
+# ===================== Helper Functions =====================
+
+def impute_with_knn(X_train, X_test, num_cols, cat_cols):
+    # Create deep copies to avoid modifying original dataframes
+    X_train_imputed = X_train.copy(deep=True)
+    X_test_imputed = X_test.copy(deep=True)
+    
+    # Prepare data with numeric columns and encoded categorical columns
+    def prepare_data_for_imputation(df, label_encoders):
+        # Create a copy of the dataframe
+        prepared_df = df.copy(deep=True)
+        
+        # Handle numeric columns
+        for col in num_cols:
+            # Replace NaNs with median for numeric columns
+            prepared_df[col] = prepared_df[col].fillna(prepared_df[col].median())
+        
+        # Handle categorical columns
+        for col in cat_cols:
+            # If encoder exists, use it, otherwise create a new one
+            if col not in label_encoders:
+                # Combine unique values from both train and test
+                combined_categories = pd.concat([X_train[col], X_test[col]]).dropna().unique()
+                
+                # Create LabelEncoder with combined categories
+                le = LabelEncoder()
+                le.fit(combined_categories.astype(str))
+                label_encoders[col] = le
+            
+            # Get the encoder for this column
+            le = label_encoders[col]
+            
+            # Create a copy of the column for transformation
+            col_to_encode = prepared_df[col].copy()
+            
+            # Replace NaNs with a special category that is in the original categories
+            col_to_encode = col_to_encode.fillna(le.classes_[0])
+            
+            # Transform categorical columns
+            prepared_df[col] = le.transform(col_to_encode.astype(str))
+        
+        return prepared_df, label_encoders
+    
+    # Dictionary to store label encoders
+    label_encoders = {}
+    
+    # Prepare train and test data
+    X_train_prep, label_encoders = prepare_data_for_imputation(X_train, label_encoders)
+    X_test_prep, label_encoders = prepare_data_for_imputation(X_test, label_encoders)
+    
+    # Combine all columns to impute
+    cols_to_impute = num_cols + cat_cols
+    
+    # Prepare data for KNN Imputer
+    X_train_to_impute = X_train_prep[cols_to_impute]
+    X_test_to_impute = X_test_prep[cols_to_impute]
+    
+    # Initialize KNN Imputer
+    knn_imputer = KNNImputer(n_neighbors=5)
+    
+    # Fit and transform training data
+    X_train_imputed_values = knn_imputer.fit_transform(X_train_to_impute)
+
+    # Transform test data
+    X_test_imputed_values = knn_imputer.transform(X_test_to_impute)
+    
+    # Update the original dataframes with imputed values
+    X_train_imputed[cols_to_impute] = X_train_imputed_values
+    X_test_imputed[cols_to_impute] = X_test_imputed_values
+    
+    # Decode categorical columns
+    for col in cat_cols:
+        # Inverse transform categorical columns
+        X_train_imputed[col] = label_encoders[col].inverse_transform(
+            X_train_imputed[col].astype(int)
+        )
+        X_test_imputed[col] = label_encoders[col].inverse_transform(
+            X_test_imputed[col].astype(int)
+        )
+    
+    return X_train_imputed, X_test_imputed
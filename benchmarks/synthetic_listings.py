@@ -0,0 +1,228 @@
+"""Synthetic Jabodetabek house listings in the raw scraping format, at any scale.
+
+Rows have the columns of data/Property_Scraping.csv (the input of
+`CleaningData`; after cleaning they are the columns of `create_db.sql`, with
+`price` in rupiah instead of `price_mio`). The seed scrape provides:
+
+- the value distribution of every categorical or short free-text column
+  (certificate, water_source, road_width, property_condition, ...), sampled
+  as-is so the cleaning keyword rules see real spellings;
+- (address, city) pairs, so locations stay consistent;
+- the missing rate of every column and the rate of literal zeros in the
+  numeric ones (the scraper's "if there is NaN fill 0"), plus the rate of
+  failed scrapes (no title, price or location).
+
+Sizes, rooms, voltage, years and the price come from a simple hedonic model
+(price grows with land and building size and depends on the city), so the
+features carry signal for the models. Titles and descriptions are assembled
+from templates with the listing's own numbers, at the seed's lengths. URLs are
+unique except for a small duplicate rate, like a real crawl.
+
+    python benchmarks/synthetic_listings.py --rows 1000000 --output /tmp/listings.csv
+"""
+import argparse
+import os
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_FILE = os.path.join(BENCH_DIR, '..', 'data', 'Property_Scraping.csv')
+CHUNK_ROWS = 100_000
+
+SAMPLED_COLUMNS = ['property_type', 'certificate', 'furniture', 'building_material', 'floor_material',
+                   'house_facing', 'concept_and_style', 'view', 'internet_access', 'road_width', 'water_source',
+                   'corner_property', 'property_condition', 'ad_type']
+GENERATED_NUMERIC = ['land_size_m2', 'building_size_m2', 'bedroom', 'bathroom', 'garage', 'carport',
+                     'voltage_watt', 'maid_bedroom', 'maid_bathroom', 'kitchen', 'dining_room', 'living_room',
+                     'floor_level', 'year_built', 'year_renovated']
+# Price level relative to the rest of Jabodetabek, by city keyword (first match wins)
+CITY_PRICE_FACTORS = [('jakarta selatan', 2.2), ('jakarta pusat', 2.0), ('jakarta', 1.5),
+                      ('tangerang selatan', 1.3), ('tangerang', 1.0), ('bekasi', 0.8), ('depok', 0.8),
+                      ('bogor', 0.7)]
+VOLTAGES = np.array([1300, 2200, 3500, 4400, 5500, 6600, 7700, 11000, 16500])
+
+TITLE_TEMPLATES = [
+    "Dijual Rumah {style} {floors} Lantai di {area}",
+    "Rumah Siap Huni {area} Dekat Tol, LT {land} LB {building}",
+    "Dijual Cepat Rumah Hoek {area} {bedroom} KT",
+    "Rumah Baru {style} di {area}, {city}",
+    "Jual Rumah Murah Lokasi Strategis {area}",
+]
+INTRO_TEMPLATES = [
+    "Dijual rumah {style} di {area}, {city}. ",
+    "Rumah tinggal nyaman dan asri di kawasan {area}. ",
+    "[DIJUAL] Rumah {floors} lantai siap huni di {area}, {city}. ",
+    "Hunian keluarga di lingkungan perumahan {area} yang aman. ",
+]
+FILLER_SENTENCES = [
+    "Lokasi strategis dekat sekolah, rumah sakit dan pusat perbelanjaan.",
+    "Akses mudah ke pintu tol dan stasiun KRL.",
+    "Lingkungan aman, one gate system dengan keamanan 24 jam.",
+    "Bebas banjir, jalan depan lebar muat dua mobil.",
+    "Bangunan kokoh, sirkulasi udara dan cahaya bagus.",
+    "Cocok untuk hunian keluarga maupun investasi.",
+    "Dekat masjid, taman bermain dan jogging track.",
+    "Surat-surat lengkap, bisa KPR semua bank.",
+    "Harga masih bisa nego tipis untuk pembeli serius.",
+    "Carport luas, dapur bersih dan kering, taman belakang.",
+    "Kawasan berkembang dengan fasilitas lengkap di sekitarnya.",
+    "Siap huni, tinggal bawa koper.",
+]
+
+
+# ================== Seed Profile ==================
+
+def seed_profile(path=SEED_FILE):
+    """Distributions, missing rates and zero rates of the seed scrape."""
+    seed = pd.read_csv(path)
+    # Failed scrapes (no title, price or city; the numbers default to 0) are modelled
+    # separately from the per-column missingness
+    failed = seed[['title', 'price', 'city']].isna().all(axis=1)
+    profile = {"columns": list(seed.columns), "failed_rate": float(failed.mean()),
+               "failed_columns": list(seed.columns[seed[failed].isna().all()]) if failed.any() else [],
+               "missing": seed[~failed].isna().mean().to_dict(), "values": {}, "zeros": {}}
+    seed = seed[~failed]
+    for col in SAMPLED_COLUMNS:
+        counts = seed[col].dropna().value_counts(normalize=True)
+        profile["values"][col] = (counts.index.to_numpy(dtype=object), counts.to_numpy())
+    for col in GENERATED_NUMERIC:
+        observed = seed[col].dropna()
+        profile["zeros"][col] = float((observed == 0).mean()) if len(observed) else 0.0
+    profile["locations"] = seed[['address', 'city']].to_numpy(dtype=object)
+    profile["duplicate_url_rate"] = float(seed['url'].duplicated().mean())
+    return profile
+
+
+# ================== Generator ==================
+
+def _slug(values: pd.Series) -> pd.Series:
+    return values.fillna('jabodetabek').str.lower().str.replace(r'[^a-z0-9]+', '-', regex=True).str.strip('-')
+
+def _city_factor(city: pd.Series) -> np.ndarray:
+    lowered = city.fillna('').str.lower()
+    factor = np.ones(len(city))
+    assigned = np.zeros(len(city), dtype=bool)
+    for keyword, value in CITY_PRICE_FACTORS:
+        match = lowered.str.contains(keyword, regex=False).to_numpy() & ~assigned
+        factor[match] = value
+        assigned |= match
+    return factor
+
+def _fill_template(templates, fields: pd.DataFrame, rng) -> pd.Series:
+    choice = rng.integers(len(templates), size=len(fields))
+    out = pd.Series('', index=fields.index, dtype=object)
+    for i, template in enumerate(templates):
+        rows = fields[choice == i]
+        if len(rows):
+            out[choice == i] = [template.format(**row) for row in rows.to_dict('records')]
+    return out
+
+def generate_chunk(rows, profile, rng, start_id=0) -> pd.DataFrame:
+    """`rows` synthetic listings with ids from `start_id`."""
+    data = {}
+    locations = profile["locations"][rng.integers(len(profile["locations"]), size=rows)]
+    address, city = pd.Series(locations[:, 0]), pd.Series(locations[:, 1])
+
+    building = np.clip(np.round(rng.lognormal(np.log(150), 0.6, rows)), 21, 3000)
+    land = np.clip(np.round(building * rng.lognormal(-0.1, 0.45, rows)), 24, 20000)
+    floors = np.clip(np.round(building / land * 1.3 + rng.normal(0, 0.3, rows)), 1, 4)
+    bedroom = np.clip(np.round(building / 45 + rng.normal(0, 0.8, rows)), 1, 12)
+    data.update({
+        'land_size_m2': land, 'building_size_m2': building, 'bedroom': bedroom,
+        'bathroom': np.maximum(bedroom - rng.integers(0, 2, rows), 1),
+        'garage': rng.poisson(0.6, rows).astype(float), 'carport': rng.poisson(1.1, rows).astype(float),
+        'voltage_watt': VOLTAGES[np.clip(np.searchsorted([80, 130, 200, 280, 380, 500, 700, 1000], building)
+                                         + rng.integers(-1, 2, rows), 0, len(VOLTAGES) - 1)].astype(float),
+        'maid_bedroom': (rng.random(rows) < np.clip(building / 600, 0, 0.9)).astype(float),
+        'kitchen': 1.0 + (rng.random(rows) < 0.1), 'dining_room': np.ones(rows), 'living_room': np.ones(rows),
+        'floor_level': floors, 'year_built': rng.integers(1985, 2025, rows).astype(float),
+    })
+    data['maid_bathroom'] = data['maid_bedroom'] * (rng.random(rows) < 0.8)
+    data['year_renovated'] = np.minimum(data['year_built'] + rng.integers(3, 25, rows), 2024)
+
+    price_mio = 14 * building ** 0.55 * land ** 0.45 * _city_factor(city) * rng.lognormal(0, 0.3, rows)
+    data['price'] = np.round(price_mio * 1e6, -7)
+
+    for col in SAMPLED_COLUMNS:
+        values, weights = profile["values"][col]
+        data[col] = values[rng.choice(len(values), size=rows, p=weights)] if len(values) else np.full(rows, None)
+
+    ids = np.arange(start_id, start_id + rows) + 10_000_000
+    df = pd.DataFrame(data)
+    df['address'], df['city'] = address, city
+    fields = pd.DataFrame({
+        'area': address.str.split(',').str[0].fillna(city).fillna('Jabodetabek'), 'city': city.fillna('Jabodetabek'),
+        'style': rng.choice(['Minimalis', 'Modern', 'Classic', 'Tropis', 'Scandinavian'], rows),
+        'floors': floors.astype(int), 'land': land.astype(int), 'building': building.astype(int),
+        'bedroom': bedroom.astype(int), 'bathroom': df['bathroom'].astype(int),
+        'watt': df['voltage_watt'].astype(int), 'certificate': df['certificate'].fillna('SHM'),
+        'water': df['water_source'].fillna('PDAM'), 'id': ids,
+    })
+    df['url'] = '/properti/' + _slug(city) + '/hos' + pd.Series(ids).astype(str) + '/'
+    df['title'] = _fill_template(TITLE_TEMPLATES, fields, rng)
+
+    spec = ("LT " + fields['land'].astype(str) + " m2, LB " + fields['building'].astype(str) + " m2, "
+            + fields['bedroom'].astype(str) + " KT, " + fields['bathroom'].astype(str) + " KM. Sertifikat "
+            + fields['certificate'].astype(str) + ", listrik " + fields['watt'].astype(str) + " watt")
+    # About a third of the seed's descriptions name no water source, so cleaning can't always recover it
+    water = rng.random(rows) < 0.65
+    spec = spec + pd.Series(np.where(water, ", air " + fields['water'].astype(str), ''), index=df.index) + ". "
+    fillers = pd.Series('', index=df.index, dtype=object)
+    for _ in range(10):  # ~6 filler sentences on average, for descriptions of the seed's length
+        picked = pd.Series(np.asarray(FILLER_SENTENCES, dtype=object)[rng.integers(len(FILLER_SENTENCES), size=rows)])
+        fillers = fillers + picked.where(rng.random(rows) < 0.6, '') + ' '
+    df['description'] = (_fill_template(INTRO_TEMPLATES, fields, rng) + spec + fillers.str.replace(r'\s+', ' ', regex=True)
+                         + "Hubungi agen #" + fields['id'].astype(str))
+    ad_formats = np.array(['#{}', 'shs{}', 'JK{}-CQID', '{}'], dtype=object)
+    df['ad_id'] = [fmt.format(i) for fmt, i in zip(ad_formats[rng.integers(len(ad_formats), size=rows)], ids)]
+
+    # Zeros and missing values at the seed's rates (zeros only where the seed has them)
+    for col in GENERATED_NUMERIC:
+        df.loc[rng.random(rows) < profile["zeros"][col], col] = 0.0
+    for col in df.columns.difference(['address', 'city']):  # the seed's location pairs are already missing as often
+        rate = profile["missing"].get(col, 0.0)
+        if rate > 0:
+            df.loc[rng.random(rows) < rate, col] = np.nan
+
+    df.loc[rng.random(rows) < profile["failed_rate"], profile["failed_columns"]] = np.nan
+
+    # A few URLs repeat an earlier listing, like pages seen twice in a crawl
+    duplicates = np.flatnonzero(rng.random(rows) < profile["duplicate_url_rate"])
+    duplicates = duplicates[duplicates > 0]
+    df.loc[duplicates, 'url'] = df['url'].to_numpy()[rng.integers(0, duplicates)]
+    return df[profile["columns"]]
+
+def generate_listings(rows, seed=0, chunk_rows=CHUNK_ROWS, profile=None):
+    """Yield `rows` listings in DataFrames of at most `chunk_rows` rows."""
+    profile = profile or seed_profile()
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        yield generate_chunk(min(chunk_rows, rows - start), profile, rng, start_id=start)
+
+def write_listings(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write `rows` listings as CSV (the format `CleaningData` reads), chunk by chunk; returns the path."""
+    tmp_path = f"{path}.tmp"
+    for i, chunk in enumerate(generate_listings(rows, seed, chunk_rows)):
+        chunk.to_csv(tmp_path, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    write_listings(args.output, args.rows, args.seed)
+    seconds = perf_counter() - start
+    print(f"{args.rows:,} listings written to {args.output} in {seconds:.1f}s "
+          f"({args.rows / seconds:,.0f} rows/s, {os.path.getsize(args.output) / 1e6:,.0f} MB).")
+
+
+if __name__ == '__main__':
+    main()
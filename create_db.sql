@@ -5,7 +5,7 @@ CREATE DATABASE house_prediction_db;
 
 BEGIN;
 CREATE TABLE house_prediction_table (
-	url TEXT,
+	url TEXT PRIMARY KEY,
     title TEXT,
     description TEXT,
     price_mio FLOAT,
@@ -40,9 +40,13 @@ CREATE TABLE house_prediction_table (
     corner_property BOOLEAN,
     property_condition TEXT,
     ad_type TEXT,
-    ad_id TEXT
+    ad_id TEXT,
+    row_hash BIGINT,
+    updated_at TIMESTAMP DEFAULT LOCALTIMESTAMP
 );
 
+CREATE INDEX house_prediction_table_updated_at_idx ON house_prediction_table (updated_at);
+
 COPY house_prediction_table (
     url, title, description, price_mio, address, city, land_size_m2, building_size_m2,
     bedroom, bathroom, garage, carport, property_type, certificate, voltage_watt,
@@ -1,18 +1,57 @@
 from airflow.models import DAG
 
 from airflow.operators.python import PythonOperator
-from airflow.providers.postgres.operators.postgres import PostgresOperator
 
 from datetime import datetime
 from datetime import timedelta
 
-from utilization.scraping_link import ScrapingLink
-from utilization.scraping_data import ScrapingData
-from utilization.cleaning_data import CleaningData
-from utilization.feature_engineering import FeatureEngineering
-from utilization.fetch_from_postgresql import FetchFromPostgresql
-from utilization.modeling import Modeling
-from utilization.choose_best_model import ChooseBestModel
+from functools import partial
+from importlib import import_module
+from inspect import signature
+
+from utilization import instrumentation  # Standard library only, cheap to import
+
+DATA_DIR = '/opt/airflow/data'
+# Search pages scraped per run, split into ranges scraped by parallel tasks.
+# Each range gets an equal share of the request rate and its task starts with
+# an empty bucket of capacity 1, so the ranges together stay within
+# REQUESTS_PER_SECOND, without a burst at the start.
+SEARCH_PAGES = (1, 2)
+PAGE_PARTITIONS = 2
+REQUESTS_PER_SECOND = 0.5
+
+# Task callables are referenced by import path and imported only when the task
+# runs, so parsing this file doesn't load sklearn, pandas, openai, psycopg2, ...
+def run_callable(path, **kwargs):
+    """Import `module:function` and call it with the keyword arguments it accepts.
+
+    Airflow passes its context together with the task's op_kwargs; only the
+    function's own parameters are kept. A `partition` entry labels the task's
+    metrics (see utilization.instrumentation).
+    """
+    module_name, function_name = path.split(':')
+    function = getattr(import_module(module_name), function_name)
+    parameters = signature(function).parameters
+    with instrumentation.labels(partition=kwargs.get('partition')):
+        return function(**{name: value for name, value in kwargs.items() if name in parameters})
+
+def lazy_callable(path):
+    """Callable for PythonOperator that imports the task's function only when it runs."""
+    return partial(run_callable, path)
+
+def page_ranges(first_page, last_page, partitions):
+    """ScrapingLink arguments of `partitions` contiguous page ranges covering first_page..last_page."""
+    bounds = [first_page + round(i * (last_page - first_page + 1) / partitions) for i in range(partitions + 1)]
+    return [
+        {
+            'start_page': start,
+            'end_page': end - 1,
+            'requests_per_second': REQUESTS_PER_SECOND / partitions,
+            'output_file': f'{DATA_DIR}/link_properties.pages-{start}-{end - 1}.csv',
+            'partition': f'pages-{start}-{end - 1}',
+        }
+        for start, end in zip(bounds, bounds[1:]) if end > start
+    ]
 
 default_args= {
     'owner': 'GGGaming',
@@ -27,54 +66,82 @@ with DAG(
     default_args=default_args, 
     catchup=False) as dag:
 
-    # task: 1
-    scraping_link = PythonOperator(
+    # task: 1 (one task per search-page range)
+    scraping_link = PythonOperator.partial(
         task_id='scraping_link',
-        python_callable=ScrapingLink
-    )    
+        python_callable=lazy_callable('utilization.scraping_link:ScrapingLink')
+    ).expand(op_kwargs=page_ranges(*SEARCH_PAGES, PAGE_PARTITIONS))
 
-    # task: 2
-    scraping_data = PythonOperator(
-        task_id='scraping_data',
-        python_callable=ScrapingData
+    # task: 2 (returns the arguments of the per-city scraping tasks)
+    merge_links = PythonOperator(
+        task_id='merge_links',
+        python_callable=lazy_callable('utilization.partitioning:MergeLinks')
     )
 
-    # task: 3
-    update_table_db = PostgresOperator(
-        task_id="update_table_db",
-        postgres_conn_id='postgres',
-        sql='sql/update_table.sql'
-    )
-    
-    # task: 4
-    fetch_data = PythonOperator(
-        task_id='fetch_from_postgresql',
-        python_callable=FetchFromPostgresql
+    # task: 3 (one task per city)
+    scraping_data = PythonOperator.partial(
+        task_id='scraping_data',
+        python_callable=lazy_callable('utilization.scraping_data:ScrapingData')
+    ).expand(op_kwargs=merge_links.output)
+
+    # task: 4 (returns the arguments of the per-city cleaning tasks). Runs even when
+    # no city had links to scrape, since the catalog is still cleaned and retrained on
+    merge_listings = PythonOperator(
+        task_id='merge_listings',
+        python_callable=lazy_callable('utilization.partitioning:MergeListings'),
+        trigger_rule='none_failed'
     )
 
-    # task: 5
-    cleaning_data = PythonOperator(
+    # task: 5 (one task per city)
+    cleaning_data = PythonOperator.partial(
         task_id='cleaning_data',
-        python_callable=CleaningData
-    )
-        
+        python_callable=lazy_callable('utilization.cleaning_data:CleaningData')
+    ).expand(op_kwargs=merge_listings.output)
+
     # task: 6
+    merge_cleaned = PythonOperator(
+        task_id='merge_cleaned',
+        python_callable=lazy_callable('utilization.partitioning:MergeCleaned')
+    )
+
+    # task: 7 (loads the cleaned data, in parallel with feature engineering and modeling)
+    update_table_db = PythonOperator(
+        task_id="update_table_db",
+        python_callable=lazy_callable('utilization.load_to_postgresql:LoadToPostgresql')
+    )
+
+    # task: 8
     feature_engineering = PythonOperator(
         task_id='feature_engineering',
-        python_callable=FeatureEngineering
+        python_callable=lazy_callable('utilization.feature_engineering:FeatureEngineering')
     )
 
-    # task: 7
+    # task: 9
     modeling = PythonOperator(
         task_id='modeling',
-        python_callable=Modeling,
-        execution_timeout=timedelta(minutes=20)
+        python_callable=lazy_callable('utilization.modeling:Modeling'),
+        op_kwargs={'train_hgb': False},
+        execution_timeout=timedelta(minutes=20),
+        # A retry resumes the search from the trial store instead of starting over
+        retries=2,
+        retry_delay=timedelta(minutes=1)
     )
 
-    # task: 8
+    # task: 10 (the gradient boosting challenger, outside the forest search's timeout)
+    modeling_hgb = PythonOperator(
+        task_id='modeling_hgb',
+        python_callable=lazy_callable('utilization.modeling:ModelingHGB'),
+        execution_timeout=timedelta(minutes=20),
+        retries=1,
+        retry_delay=timedelta(minutes=1)
+    )
+
+    # task: 11
     choose_best_model = PythonOperator(
         task_id='choose_best_model',
-        python_callable=ChooseBestModel
+        python_callable=lazy_callable('utilization.choose_best_model:ChooseBestModel')
     )
 
-    scraping_link >> scraping_data >> update_table_db >> fetch_data >> cleaning_data >> feature_engineering >> modeling >> choose_best_model
\ No newline at end of file
+    scraping_link >> merge_links >> scraping_data >> merge_listings >> cleaning_data >> merge_cleaned
+    merge_cleaned >> update_table_db
+    merge_cleaned >> feature_engineering >> modeling >> modeling_hgb >> choose_best_model
@@ -0,0 +1,188 @@
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from utilization.imputation import KNNFeatureImputer
+from utilization.model_bundle import ModelBundle, PredictionPipeline, load_bundle, save_bundle
+
+# ================== Constants ==================
+ANN_MODEL_FILE = '/opt/airflow/data/model_ann.keras'
+ANN_BUNDLE_FILE = '/opt/airflow/data/model_ann.pkl'
+ANN_LITE_BUNDLE_FILE = '/opt/airflow/data/model_ann_lite.pkl'
+# Written by modeling_ann.ipynb next to the Keras file: the fitted scaler/encoder
+# (`transformer`), the rows it was fitted on (`X_train`, `y_train`) and the URLs
+# of every row used in training, validation included (`training_urls`)
+ANN_PREPROCESSING_FILE = '/opt/airflow/data/model_ann_preprocessing.pkl'
+
+_load_lock = threading.Lock()
+
+# ================== Keras Estimator ==================
+
+def _load_keras_model(model_bytes):
+    try:
+        import tf_keras as keras  # Keras 2 API; TensorFlow >= 2.16 ships Keras 3, which can't read the 2.15 file
+    except ImportError:
+        from tensorflow import keras
+    with tempfile.NamedTemporaryFile(suffix='.keras') as f:
+        f.write(model_bytes)
+        f.flush()
+        return keras.models.load_model(f.name, compile=False)
+
+def _tflite_interpreter(model_bytes):
+    """TFLite interpreter from the standalone runtime if installed, else from TensorFlow."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+    return Interpreter(model_content=model_bytes)
+
+class KerasRegressor(BaseEstimator, RegressorMixin):
+    """Predict-only step that runs the ANN, as a Keras model or as a TFLite flatbuffer.
+
+    The model file is embedded in the pickle, so a bundle works wherever it is
+    copied. The runtime is loaded on the first `predict` in each process (serve
+    through `ModelRegistry`, which warms it up once), and inputs are fed in
+    chunks of `batch_size` rows by calling the network directly, without the
+    per-call overhead of `Model.predict`. With `model_format='tflite'` only a
+    TFLite interpreter is needed (`ai-edge-litert` or `tflite-runtime`), not
+    full TensorFlow. The network is trained in modeling_ann.ipynb, so there is
+    no `fit`; bundles hold it in a `PredictionPipeline`.
+    """
+
+    def __init__(self, model_bytes=None, model_format='keras', batch_size=1024):
+        self.model_bytes = model_bytes
+        self.model_format = model_format
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_file(cls, model_path, **kwargs):
+        with open(model_path, 'rb') as f:
+            model_bytes = f.read()
+        return cls(model_bytes, 'tflite' if model_path.endswith('.tflite') else 'keras', **kwargs)
+
+    @property
+    def model_(self):
+        with _load_lock:
+            if getattr(self, '_model', None) is None:
+                self._lock = threading.Lock()
+                self._input_shape = None
+                if self.model_format == 'tflite':
+                    self._model = _tflite_interpreter(self.model_bytes)
+                else:
+                    self._model = _load_keras_model(self.model_bytes)
+            return self._model
+
+    def _predict_tflite(self, interpreter, X):
+        # One interpreter per process: resizing and invoking must not interleave between threads
+        with self._lock:
+            input_index = interpreter.get_input_details()[0]['index']
+            if X.shape != self._input_shape:
+                interpreter.resize_tensor_input(input_index, X.shape)
+                interpreter.allocate_tensors()
+                self._input_shape = X.shape
+            interpreter.set_tensor(input_index, X)
+            interpreter.invoke()
+            return interpreter.get_tensor(interpreter.get_output_details()[0]['index']).ravel()
+
+    def predict(self, X):
+        X = X.toarray() if hasattr(X, 'toarray') else X
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        model = self.model_
+        out = []
+        for start in range(0, len(X), self.batch_size):
+            chunk = X[start:start + self.batch_size]
+            if self.model_format == 'tflite':
+                out.append(self._predict_tflite(model, chunk))
+            else:
+                out.append(np.asarray(model(chunk, training=False)).ravel())
+        return np.concatenate(out).astype(np.float64) if out else np.empty(0)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in ('_model', '_lock', '_input_shape'):
+            state.pop(attr, None)
+        return state
+
+def convert_to_tflite(keras_step: KerasRegressor) -> KerasRegressor:
+    """Convert the Keras network to a TFLite flatbuffer (needs TensorFlow)."""
+    import tensorflow as tf
+    model = _load_keras_model(keras_step.model_bytes)
+    function = tf.function(lambda x: model(x, training=False))
+    concrete = function.get_concrete_function(tf.TensorSpec([None, model.input_shape[-1]], tf.float32))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], function)
+    return KerasRegressor(converter.convert(), 'tflite', batch_size=keras_step.batch_size)
+
+# ================== ANN Bundle ==================
+
+def load_ann_preprocessing(preprocessing_path=ANN_PREPROCESSING_FILE):
+    with open(preprocessing_path, 'rb') as f:
+        return pickle.load(f)
+
+def build_ann_bundle(num_cols, cat_cols, model_path=ANN_MODEL_FILE, preprocessing_path=ANN_PREPROCESSING_FILE):
+    """Bundle the saved Keras model with the preprocessing it was trained with.
+
+    The scaler and encoder are the notebook's fitted ones, not refitted: on
+    other rows they would scale the inputs differently from what the weights
+    expect. Only the imputer is fitted here, on the notebook's training rows.
+    """
+    preprocessing = load_ann_preprocessing(preprocessing_path)
+    X_train, y_train = preprocessing['X_train'], preprocessing['y_train']
+    transformer = preprocessing['transformer']
+    # Categories unseen in the notebook get all-zero columns instead of an error
+    encoder = transformer.named_transformers_['pipe_cat']
+    (encoder[-1] if hasattr(encoder, 'steps') else encoder).set_params(handle_unknown='ignore')
+    pipeline = PredictionPipeline([
+        ('imputer', KNNFeatureImputer(num_cols, cat_cols).fit(X_train)),
+        ('transformer', transformer),
+        ('model', KerasRegressor.from_file(model_path)),
+    ])
+    bundle = ModelBundle.from_training(pipeline, X_train, y_train, cat_cols,
+                                       params={"model_path": model_path, "preprocessing_path": preprocessing_path})
+    bundle.metadata["runtime"] = "keras"
+    return bundle
+
+def tflite_bundle(bundle: ModelBundle) -> ModelBundle:
+    """Copy of an ANN bundle whose network runs on the TFLite interpreter."""
+    steps = bundle.pipeline.steps
+    pipeline = PredictionPipeline(steps[:-1] + [(steps[-1][0], convert_to_tflite(steps[-1][1]))])
+    return ModelBundle(pipeline, bundle.feature_columns, dtypes=bundle.dtypes, categories=bundle.categories,
+                       metadata={**bundle.metadata, "runtime": "tflite"}, version=bundle.version)
+
+def _outdated(path, *source_paths):
+    return not os.path.exists(path) or any(os.path.getmtime(path) < os.path.getmtime(source_path)
+                                           for source_path in source_paths)
+
+def ensure_ann_bundle(num_cols, cat_cols, model_path=ANN_MODEL_FILE, preprocessing_path=ANN_PREPROCESSING_FILE,
+                      bundle_path=ANN_BUNDLE_FILE, lite_bundle_path=ANN_LITE_BUNDLE_FILE):
+    """Return the ANN bundle path, (re)building it when the notebook's files are newer.
+
+    Without the Keras model or the notebook's preprocessing there is no
+    usable ANN: None is returned and bundles left from an earlier build are
+    removed. When TensorFlow is available a TFLite copy is written to
+    `lite_bundle_path` as well, for serving without TensorFlow, whenever it
+    is missing or older than the bundle.
+    """
+    if not (os.path.exists(model_path) and os.path.exists(preprocessing_path)):
+        for path in (bundle_path, lite_bundle_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+                print(f"Removed '{path}': no Keras model or preprocessing from modeling_ann.ipynb.")
+        return None
+    bundle = None
+    if _outdated(bundle_path, model_path, preprocessing_path):
+        bundle = build_ann_bundle(num_cols, cat_cols, model_path, preprocessing_path)
+        save_bundle(bundle, bundle_path)
+        print(f"ANN bundle written to '{bundle_path}'.")
+    if lite_bundle_path and _outdated(lite_bundle_path, bundle_path):
+        try:
+            save_bundle(tflite_bundle(bundle or load_bundle(bundle_path)), lite_bundle_path)
+            print(f"TFLite ANN bundle written to '{lite_bundle_path}'.")
+        except ImportError as e:
+            print(f"TFLite export skipped: {e}")
+    return bundle_path
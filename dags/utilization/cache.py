@@ -0,0 +1,273 @@
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from inspect import signature
+from typing import Union
+
+from utilization import instrumentation
+
+# ================== Constants ==================
+CACHE_DIR = '/opt/airflow/data/cache'
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+MEMORY_CACHE_MAX_ENTRIES = 1024
+# Stages decorated with `skip_if_unchanged` always run when this is set to 1
+FORCE_RUN_ENV = 'PRICEWISE_FORCE_RUN'
+FINGERPRINT_SUFFIX = '.fingerprint.json'
+# Library versions that change trained models, part of every stage fingerprint
+FINGERPRINT_PACKAGES = ['numpy', 'pandas', 'scikit-learn', 'scipy']
+
+# ================== Helper Functions ==================
+
+def content_key(*parts) -> str:
+    """Build a content-addressed key (SHA-256) from JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def module_file(name: str) -> str:
+    module = sys.modules.get(name)
+    return getattr(module, '__file__', None) or importlib.util.find_spec(name).origin
+
+def package_version(name: str) -> Union[str, None]:
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+# ================== Disk Cache ==================
+
+class DiskCache:
+    """On-disk key/value cache with size-based LRU eviction.
+
+    Values are stored one file per key under `directory`. The least recently
+    used entries are removed once the total size exceeds `max_bytes`. Recency
+    survives restarts because every hit touches the file's mtime.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Union[bytes, None]:
+        """Return the cached bytes for `key`, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes):
+        """Store `value` under `key` and evict old entries if the cache is too big."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"  # Partitioned scraping tasks share the cache
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(value) - self._entries.pop(key, 0)
+            self._entries[key] = len(value)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key: str, value):
+        self.set(key, json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+# ================== Memory Cache ==================
+
+class MemoryCache:
+    """In-process key/value cache holding at most `max_entries` values (LRU eviction).
+
+    Keys must be hashable. Like `DiskCache`, `get` returns None on a miss and
+    hits and misses are counted for `stats`.
+    """
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # least recently used first
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+# ================== Stage Fingerprints ==================
+
+def input_hashes(inputs) -> dict:
+    """SHA-256 of every input file; missing files are None, so an optional input that appears later
+    (e.g. a new candidate model) changes the fingerprint too."""
+    return {path: file_sha256(path) if os.path.isfile(path) else None for path in inputs}
+
+def stage_fingerprint(files: dict, modules, params: dict) -> str:
+    """Content key of a stage run: its input hashes (`input_hashes`), the source of its modules, library
+    versions and parameters."""
+    code = {name: file_sha256(module_file(name)) for name in modules}
+    packages = {name: package_version(name) for name in FINGERPRINT_PACKAGES}
+    return content_key(files, code, packages, params)
+
+def remove_fingerprint(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def output_state(outputs) -> dict:
+    """Size and modification time of every output file (None if missing)."""
+    state = {}
+    for path in outputs:
+        stat = os.stat(path) if os.path.isfile(path) else None
+        state[path] = None if stat is None else [stat.st_size, stat.st_mtime_ns]
+    return state
+
+def read_fingerprint(path: str) -> Union[dict, None]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_fingerprint(path: str, record: dict):
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)
+
+def skip_if_unchanged(inputs, outputs, modules=()):
+    """Skip a pipeline stage whose inputs, code and parameters haven't changed since it last ran.
+
+    `inputs` and `outputs` are called with the stage's bound arguments and
+    return file paths; they are resolved at call time, so module constants
+    redirected elsewhere (benchmarks) are honoured. After a run, its
+    fingerprint (`stage_fingerprint` of the inputs, the stage's module plus
+    `modules`, and the arguments) is written next to the first output
+    together with the size and mtime of every output. The next call returns
+    None without running when the fingerprint matches and the outputs are
+    untouched. Set PRICEWISE_FORCE_RUN=1 to always run.
+
+    The inputs are hashed before the run, so an input another task changes
+    meanwhile still triggers the next run; only inputs that are also outputs
+    (written by the stage itself) are hashed again afterwards. A stage that
+    returns False has not finished its work (e.g. a search stopped by its
+    time budget): no fingerprint is kept, so the next call runs it again.
+    """
+    def decorator(func):
+        code = [func.__module__, *modules]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature(func).bind(*args, **kwargs)
+            arguments.apply_defaults()
+            params = dict(arguments.arguments)
+            input_paths, output_paths = list(inputs(params)), list(outputs(params))
+            record_file = f"{output_paths[0]}{FINGERPRINT_SUFFIX}"
+
+            files = input_hashes(input_paths)
+            record = read_fingerprint(record_file)
+            if os.environ.get(FORCE_RUN_ENV) != '1' and record is not None:
+                if (record.get("outputs") == output_state(output_paths)
+                        and record.get("key") == stage_fingerprint(files, code, params)):
+                    instrumentation.add("skipped")
+                    print(f"{func.__name__} skipped: inputs, code and parameters unchanged since the last run.")
+                    return None
+
+            result = func(*args, **kwargs)
+            if result is False:
+                remove_fingerprint(record_file)
+                print(f"{func.__name__} did not finish; it will run again next time.")
+                return result
+            # A stage may update one of its inputs in place (ChooseBestModel's champion),
+            # and the next run must compare against that state
+            files.update(input_hashes([path for path in input_paths if path in output_paths]))
+            write_fingerprint(record_file, {"key": stage_fingerprint(files, code, params),
+                                            "outputs": output_state(output_paths)})
+            return result
+        return wrapper
+    return decorator
@@ -1,106 +1,198 @@
-from utilization.fetch_from_postgresql import FetchFromPostgresql
-from utilization.cleaning_data import CleaningData
-from utilization.feature_engineering import read_and_filter_data, split_features_and_target, impute_with_knn
-import pandas as pd
+from utilization import instrumentation
+from utilization.ann_model import (ANN_BUNDLE_FILE, ANN_LITE_BUNDLE_FILE, ANN_MODEL_FILE, ANN_PREPROCESSING_FILE,
+                                   ensure_ann_bundle, load_ann_preprocessing)
+from utilization.cache import skip_if_unchanged
+from utilization.compact_forest import MANIFEST_FILE, export_compact_bundle, read_manifest, remove_compact_export
+from utilization.model_bundle import load_bundle, save_bundle
+from utilization.modeling import BEST_MODEL_FILE, BEST_MODEL_HGB_FILE, FE_DATA_FILE
+from utilization.parallel_evaluation import predict_candidates
 import pickle
+import os
 
 import numpy as np
+from scipy.stats import ttest_rel
 from sklearn.model_selection import KFold
 from sklearn.metrics import mean_absolute_error, r2_score
 
-
-# Fungsi untuk memuat model
-def load_models():
-    with open('best_model.pkl', 'rb') as file1:
-        best_model = pickle.load(file1)
-    with open('data/best_model_ever.pkl', 'rb') as file2:
-        best_model_ever = pickle.load(file2)
-    return best_model, best_model_ever
-
-
-# Fungsi untuk evaluasi model
-def evaluate_pretrained_model(model, X, y, cv=3):
+BEST_MODEL_EVER_FILE = "/opt/airflow/data/best_model_ever.pkl"
+COMPACT_MODEL_EVER_DIR = "/opt/airflow/data/best_model_ever.compact"
+# Relative MAE increase allowed when dropping trees from the compact export
+TREE_SELECTION_TOLERANCE = 0.01
+# Same folds for every candidate; enough folds for a paired test to have some power
+EVALUATION_FOLDS = 10
+SIGNIFICANCE_LEVEL = 0.05
+CHAMPION = "best_model_ever"
+ANN_CANDIDATE = "model_ann"
+# The ANN is only compared when at least this many test rows per fold remain without its training rows
+MIN_ROWS_PER_FOLD = 3
+
+
+# Fungsi untuk memuat test set hasil FeatureEngineering, supaya tidak perlu
+# fetch, cleaning, dan imputasi ulang hanya untuk evaluasi
+def load_test_data():
+    with open(FE_DATA_FILE, "rb") as f:
+        loaded_data = pickle.load(f)
+    return loaded_data
+
+
+# Semua kandidat (nama -> path bundle): champion, RandomForest, HistGradientBoosting
+# dan model ANN (Keras) jika model dan preprocessing dari notebook ada
+def candidate_paths(num_cols, cat_cols):
+    candidates = {
+        CHAMPION: BEST_MODEL_EVER_FILE,
+        "best_model": BEST_MODEL_FILE,
+        "best_model_hgb": BEST_MODEL_HGB_FILE,
+    }
+    candidates = {name: path for name, path in candidates.items() if os.path.exists(path)}
+    ann_path = ensure_ann_bundle(num_cols, cat_cols, ANN_MODEL_FILE, ANN_PREPROCESSING_FILE,
+                                 ANN_BUNDLE_FILE, ANN_LITE_BUNDLE_FILE)
+    if ann_path is not None:
+        candidates[ANN_CANDIDATE] = ann_path
+    return candidates
+
+
+# ANN dilatih di notebook pada data lain, jadi sebagian test set FE bisa jadi data training-nya.
+# Mask baris test (dikenali dari URL) yang tidak pernah dilihat ANN; None jika tidak bisa dikenali
+def ann_unseen_rows(loaded_data):
+    training_urls = load_ann_preprocessing(ANN_PREPROCESSING_FILE).get("training_urls")
+    url_test = loaded_data.get("url_test")
+    if training_urls is None or url_test is None:
+        return None
+    return ~url_test.isin(training_urls).to_numpy()
+
+
+# Model lama (tanpa imputer di dalam pipeline) butuh input yang sudah diimputasi
+def evaluation_features(bundle, X_test, X_test_imputed):
+    return X_test if bundle.handles_missing else X_test_imputed
+
+
+# MAE dan R² per fold dari prediksi yang sudah dihitung (fold sama untuk semua kandidat)
+def fold_scores(y, y_pred, cv=EVALUATION_FOLDS):
     kf = KFold(n_splits=cv, shuffle=True, random_state=10)
-    mae_scores = []
-    r2_scores = []
-
-    for fold, (_, test_index) in enumerate(kf.split(X), 1):
-        X_test = X.iloc[test_index]
-        y_test = y.iloc[test_index]
-        
-        # Prediksi menggunakan model yang sudah dilatih
-        y_pred = model.predict(X_test)
-        
-        # Hitung metrik
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        mae_scores.append(mae)
-        r2_scores.append(r2)
-        
-        # Debug: Tampilkan metrik untuk setiap fold
-        print(f"Fold {fold} - MAE: {mae:.2f}, R²: {r2:.2f}")
-    
-    # Rata-rata dan standar deviasi MAE dan R²
-    mean_mae = np.mean(mae_scores)
-    std_mae = np.std(mae_scores)
-    mean_r2 = np.mean(r2_scores)
-    std_r2 = np.std(r2_scores)
-
-    print(f"\nMAE - Mean: {mean_mae:.2f}, Std: {std_mae:.2f}")
-    print(f"R² - Mean: {mean_r2:.2f}, Std: {std_r2:.2f}")
-
-    return mean_mae, std_mae, mean_r2, std_r2
+    mae_scores, r2_scores = [], []
+    for _, test_index in kf.split(y):
+        mae_scores.append(mean_absolute_error(y.iloc[test_index], y_pred[test_index]))
+        r2_scores.append(r2_score(y.iloc[test_index], y_pred[test_index]))
+    return np.array(mae_scores), np.array(r2_scores)
+
+
+# Pilih model dengan paired t-test pada MAE per fold: challenger hanya menggantikan
+# champion jika MAE-nya signifikan lebih rendah (one-sided, dikoreksi Bonferroni
+# untuk jumlah challenger). champion_mae berisi MAE champion per fold pada baris yang
+# sama dengan tiap challenger; dari yang signifikan, selisih MAE terbesar yang menang.
+# Tanpa champion, MAE rata-rata terendah yang menang.
+def select_best_model(fold_mae, champion_mae, champion=CHAMPION, alpha=SIGNIFICANCE_LEVEL):
+    challengers = [name for name in fold_mae if name != champion]
+    if not champion_mae:
+        return min(challengers, key=lambda name: fold_mae[name].mean())
+
+    significant = {}
+    for name in challengers:
+        t_stat, p_value = ttest_rel(fold_mae[name], champion_mae[name], alternative='less')
+        difference = fold_mae[name].mean() - champion_mae[name].mean()
+        better = p_value < alpha / len(challengers)
+        print(f"{name} vs {champion}: mean MAE difference {difference:+.2f}, t = {t_stat:.2f}, "
+              f"p = {p_value:.4f} -> {'significantly better' if better else 'not significantly better'}")
+        if better:
+            significant[name] = difference
+    return min(significant, key=significant.get) if significant else champion
+
+
+# Ekspor best_model_ever ke format compact (array node + memory map) untuk serving.
+# Subset pohon dipilih pada baris seleksi (bagian training yang tidak dipakai fit),
+# bukan pada test set yang dipakai membandingkan model.
+def export_compact_model(bundle, X_select, X_select_imputed, y_select, max_mae_increase=TREE_SELECTION_TOLERANCE):
+    try:
+        export_compact_bundle(bundle, COMPACT_MODEL_EVER_DIR,
+                              evaluation_features(bundle, X_select, X_select_imputed), y_select,
+                              max_mae_increase=max_mae_increase)
+    except TypeError as e:
+        # Ekspor lama harus dihapus, kalau tidak aplikasi tetap memakai model sebelumnya
+        remove_compact_export(COMPACT_MODEL_EVER_DIR)
+        print(f"Compact export skipped: {e}")
 
 
 # Fungsi utama untuk memilih model terbaik
-def ChooseBestModel():
-    # Define numerical and categorical columns
-    num_cols = ['land_size_m2', 'building_size_m2', 'road_width', 'maid_bedroom',
-                'maid_bathroom', 'kitchen', 'floor_level', 'bedroom', 'bathroom',
-                'garage', 'carport', 'voltage_watt']
-
-    cat_cols = ['city', 'property_type', 'certificate', 'furniture', 'house_facing',
-                'water_source', 'property_condition']
-    
-    FetchFromPostgresql()
-    CleaningData()
-    df = read_and_filter_data('/opt/airflow/data/data_cleaned.csv')
-    X_train, X_test, y_train, y_test = split_features_and_target(df)
-    X_train_imputed, X_test_imputed = impute_with_knn(X_train, X_test, num_cols, cat_cols)
-
-    # Load models
-    best_model, best_model_ever = load_models()
-
-    # Evaluasi untuk model pertama
-    print("Evaluating Best Model:")
-    mae_best_model, std_mae_best_model, r2_best_model, std_r2_best_model = evaluate_pretrained_model(best_model, X_test_imputed, y_test, cv=3)
-
-    # Evaluasi untuk model kedua
-    print("\nEvaluating Best Model Ever:")
-    mae_best_model_ever, std_mae_best_model_ever, r2_best_model_ever, std_r2_best_model_ever = evaluate_pretrained_model(best_model_ever, X_test_imputed, y_test, cv=3)
-
-    # Print hasil evaluasi rata-rata dan standar deviasi
-    print("\nFinal Results:")
-    print(f"Best Model - MAE: {mae_best_model:.2f} (±{std_mae_best_model:.2f}), R²: {r2_best_model:.2f} (±{std_r2_best_model:.2f})")
-    print(f"Best Model Ever - MAE: {mae_best_model_ever:.2f} (±{std_mae_best_model_ever:.2f}), R²: {r2_best_model_ever:.2f} (±{std_r2_best_model_ever:.2f})")
+# Input semua kandidat; dilewati jika data test, model dan kode tidak berubah sejak run terakhir
+def choose_best_model_inputs(params):
+    return [FE_DATA_FILE, BEST_MODEL_EVER_FILE, BEST_MODEL_FILE, BEST_MODEL_HGB_FILE,
+            ANN_MODEL_FILE, ANN_PREPROCESSING_FILE, ANN_BUNDLE_FILE, ANN_LITE_BUNDLE_FILE]
+
+
+def choose_best_model_outputs(params):
+    # The ANN bundles are built here from the notebook's files, so they are outputs as well
+    return [BEST_MODEL_EVER_FILE, os.path.join(COMPACT_MODEL_EVER_DIR, MANIFEST_FILE),
+            ANN_BUNDLE_FILE, ANN_LITE_BUNDLE_FILE]
+
+
+@instrumentation.stage("choose_best_model")
+@skip_if_unchanged(choose_best_model_inputs, choose_best_model_outputs,
+                   modules=['utilization.ann_model', 'utilization.compact_forest', 'utilization.imputation',
+                            'utilization.model_bundle', 'utilization.parallel_evaluation'])
+def ChooseBestModel(n_jobs=-1, cv=EVALUATION_FOLDS, alpha=SIGNIFICANCE_LEVEL):
+    # Load test set
+    loaded_data = load_test_data()
+    X_test, X_test_imputed, y_test = loaded_data["X_test"], loaded_data["X_test_imputed"], loaded_data["y_test"]
+    instrumentation.add("rows_in", len(X_test))
+
+    # Prediksi semua kandidat paralel (satu proses per kandidat, test set lewat shared memory)
+    with instrumentation.span("prepare_candidates"):
+        candidates = candidate_paths(loaded_data["num_cols"], loaded_data["cat_cols"])
+    with instrumentation.span("predict_candidates"):
+        predictions, errors = predict_candidates(candidates, X_test, X_test_imputed, n_jobs=n_jobs)
+    instrumentation.add("candidates", len(predictions))
+    for name, error in errors.items():
+        print(f"Candidate {name} skipped: {error}")
+    # Champion yang ada tapi gagal dievaluasi tidak boleh ditimpa tanpa perbandingan
+    if CHAMPION in errors:
+        raise RuntimeError(f"{CHAMPION} exists but could not be evaluated: {errors[CHAMPION]}")
+
+    # ANN hanya dinilai pada baris test yang tidak dipakai melatihnya; kandidat lain pada
+    # seluruh test set. ANN dilewati jika baris training-nya tidak bisa dikenali
+    eval_rows = {name: np.ones(len(y_test), dtype=bool) for name in predictions}
+    if ANN_CANDIDATE in predictions:
+        unseen = ann_unseen_rows(loaded_data)
+        if unseen is None:
+            print(f"Candidate {ANN_CANDIDATE} skipped: the rows it was trained on are unknown.")
+            del predictions[ANN_CANDIDATE]
+        elif unseen.sum() < cv * MIN_ROWS_PER_FOLD:
+            print(f"Candidate {ANN_CANDIDATE} skipped: only {unseen.sum()} test rows were not used to train it.")
+            del predictions[ANN_CANDIDATE]
+        else:
+            eval_rows[ANN_CANDIDATE] = unseen
+    if not any(name != CHAMPION for name in predictions):
+        raise RuntimeError("No challenger model could be evaluated.")
+
+    # Print hasil evaluasi rata-rata dan standar deviasi. Champion dinilai ulang pada
+    # baris tiap challenger, supaya t-test tetap berpasangan
+    print(f"\nFinal Results ({cv} folds):")
+    fold_mae, champion_mae = {}, {}
+    for name, y_pred in predictions.items():
+        rows = eval_rows[name]
+        fold_mae[name], fold_r2 = fold_scores(y_test[rows], y_pred[rows], cv)
+        print(f"{name} - MAE: {fold_mae[name].mean():.2f} (±{fold_mae[name].std():.2f}), "
+              f"R²: {fold_r2.mean():.2f} (±{fold_r2.std():.2f})"
+              + ("" if rows.all() else f" on the {rows.sum()} of {len(rows)} rows it was not trained on"))
+        if CHAMPION in predictions and name != CHAMPION:
+            champion_mae[name], _ = fold_scores(y_test[rows], predictions[CHAMPION][rows], cv)
 
     # Logika untuk menyimpan model terbaik
-    if (mae_best_model < mae_best_model_ever) and (std_mae_best_model <= std_mae_best_model_ever):
-        print("\nBest Model has better performance. Saving it as 'best_model_ever.pkl'.")
-        best_model_ever = best_model
-        with open("/opt/airflow/data/best_model_ever.pkl", "wb") as file:
-            pickle.dump(best_model_ever, file)
-    elif (mae_best_model_ever < mae_best_model) and (std_mae_best_model_ever <= std_mae_best_model):
-        print("\nBest Model Ever retains its position as the best model.")
+    winner = select_best_model(fold_mae, champion_mae, CHAMPION, alpha)
+    if winner == CHAMPION:
+        print(f"\n{CHAMPION} retains its position as the best model.")
+        best_model_ever = load_bundle(BEST_MODEL_EVER_FILE)
     else:
-        # Jika terjadi konflik, pilih berdasarkan MAE saja
-        if mae_best_model < mae_best_model_ever:
-            print("\nConflict resolved: Best Model has better MAE. Saving it as 'best_model_ever.pkl'.")
-            best_model_ever = best_model
-            with open("/opt/airflow/data/best_model_ever.pkl", "wb") as file:
-                pickle.dump(best_model_ever, file)
-        else:
-            print("\nConflict resolved: Best Model Ever remains as the best model.")
+        best_model_ever = load_bundle(candidates[winner])
+        print(f"\n{winner} (version {best_model_ever.version}) is the new best model. "
+              f"Saving it as 'best_model_ever.pkl'.")
+        save_bundle(best_model_ever, BEST_MODEL_EVER_FILE)
+
+    # Ekspor ulang jika ekspor compact belum ada atau berasal dari model lain
+    manifest = read_manifest(COMPACT_MODEL_EVER_DIR)
+    if manifest is None or manifest.get("version") != best_model_ever.version:
+        with instrumentation.span("export_compact"):
+            export_compact_model(best_model_ever, loaded_data["X_select"], loaded_data["X_select_imputed"],
+                                 loaded_data["y_select"])
 
 
 if __name__ == "__main__":
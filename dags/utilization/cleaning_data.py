@@ -1,6 +1,116 @@
+import os
 import numpy as np
 import pandas as pd
 import re
+from utilization import instrumentation
+from utilization.storage import TableWriter
+
+# ================== Constants ==================
+INPUT_FILE = '/opt/airflow/data/Property_Scraping.csv'
+OUTPUT_FILE = '/opt/airflow/data/data_cleaned.csv'
+PARQUET_FILE = '/opt/airflow/data/data_cleaned.parquet'
+CHUNKSIZE = 50_000
+
+# Fixed dtypes so every chunk parses the same way (e.g. an all-empty text
+# column in one chunk must not turn into float64)
+TEXT_COLUMNS = ['url', 'title', 'description', 'address', 'city', 'property_type', 'certificate', 'furniture',
+                'building_material', 'floor_material', 'house_facing', 'concept_and_style', 'view',
+                'internet_access', 'road_width', 'water_source', 'property_condition', 'ad_type', 'ad_id']
+NUMERIC_COLUMNS = ['price', 'land_size_m2', 'building_size_m2', 'bedroom', 'bathroom', 'garage', 'carport',
+                   'voltage_watt', 'maid_bedroom', 'maid_bathroom', 'kitchen', 'dining_room', 'living_room',
+                   'floor_level', 'year_built', 'year_renovated']
+RAW_DTYPES = {**{col: 'object' for col in TEXT_COLUMNS}, **{col: 'float64' for col in NUMERIC_COLUMNS},
+              'corner_property': 'boolean'}
+
+# ================== Keyword Classes ==================
+# Every dict/list below is checked in order: the first class whose keyword
+# occurs in the text wins, exactly like the sequential loops it replaced.
+
+CITY_NAMES = ['Jakarta', 'Bogor', 'Depok', 'Tangerang', 'Bekasi']
+
+PROPERTY_TYPE_KEYWORDS = {
+    r'rumah|house|mansion': 'Rumah',
+    r'apartment|apartmen|apartement|apartemen|kos|kost': 'Hunian Sewa',
+    r'pabrik|kantor|office|ruko|ruang usaha|kios|kiosk|gudang': 'Ruang Usaha',
+    r'tanah|lahan|kavling|gedung': 'Tanah dan Properti Lain'
+}
+DROPPED_PROPERTY_TYPES = ['Tanah dan Properti Lain', 'Hunian Sewa', 'Ruang Usaha']
+
+# Klasifikasi tipe rumah berdasarkan ukuran bangunan: (21, 36] -> 'Rumah Tipe 36', dst.
+HOUSE_TYPE_BINS = [-np.inf, 21, 36, 45, 54, 60, 70, 120, np.inf]
+HOUSE_TYPE_LABELS = ['Rumah Tipe 21', 'Rumah Tipe 36', 'Rumah Tipe 45', 'Rumah Tipe 54',
+                     'Rumah Tipe 60', 'Rumah Tipe 70', 'Rumah Tipe 120', 'Rumah Tipe >120']
+
+CERTIFICATE_CATEGORIES = ['SHM', 'HGB', 'Other']
+
+PROPERTY_CONDITION_KEYWORDS = {
+    'Renovated': ['renov', 'full renov', 'renovasi', 'renoved', 'renovasi baru', 'baru renovasi', 'finished', 'selesai renovasi', 'proses finishing'],
+    'New': ['new', 'brand new', 'baru', 'unit baru', 'first time', 'primery', 'full baru', 'baru selesai', 'unit baru gress'],
+    'Need Renovation': ['butuh renovasi', 'harus renovasi', 'setengah jadi', 'perlu renovasi', 'perlu perawatan', 'lama', 'tua'],
+    'Well Maintained': ['terawat', 'siap huni', 'bersih', 'rapi', 'kokoh', 'bagus', 'layak huni', 'ready to move', 'well maintained', 'layak', 'baik', 'well']
+}
+
+WATER_SOURCE_KEYWORDS = {
+    'PAM/PDAM': r'\b(?:pam|pdam|air pam|air pdam|pln pam|aetra|water treatment|palyja)\b',
+    'Sumber Air': r'\b(?:sumur|jet pump|jetpump|sumur bor|air sumur|bor|tanah|air tanah|filter|osmosis|reverse osmosis|sistem filter|pompa|submersible pump|water pump|mata air|air alami|wtp|jetpam|air jet pum|air ready|langsung dari sumbernya|air bagus|sumber air)\b',
+    'Gabungan': r'\b(?:pdam\s?\+?\s?sumur|pam\s?\+?\s?tanah|air jetpump)\b'
+}
+
+ROAD_WIDTH_KEYWORDS = [
+    (['1 mobil', '1mobil', '1 mbl', '1 arah mobil'], 2.5),  # Kondisi 1 mobil
+    (['2 mobil', '2 mobil lega', '2-3 mobil', '2 mobil pas', '2 mbl', 'akses jalan 2 mobil', '2 mobil 2 arah', 'row jalan 2 mobil', '2.5 mobil', '2mob', '2row'], 5),  # Kondisi 2 mobil
+    (['3 mobil', '3 row', '3 mbl', 'jalan 3 mobil', 'row jalan 3 mobil', '3 mobil lebih', '3mob'], 7.5),  # Kondisi 3 mobil
+    (['4 mobil', '4 mbl'], 10),  # Kondisi 4 mobil
+    (['5 mobil', '6 mobil', '7 mobil', '8 mobil', 'lebih dari 4 mobil'], 12),  # Kondisi lebih dari 4 mobil
+    (['lebar', 'besar', 'akses jalan', 'jalan besar'], 5),  # Kondisi lebar jalan besar atau akses jalan lebar
+    (['super lebar'], 15)  # Kondisi "super lebar"
+]
+ROAD_WIDTH_METER_REGEX = re.compile(r'(\d+\.?\d*)\s?(meter|mtr)')
+
+# ================== Regex Helpers ==================
+
+def keywords_to_pattern(keywords: list) -> str:
+    """Turn a list of literal keywords into one regex alternation."""
+    return '|'.join(re.escape(keyword) for keyword in keywords)
+
+def compile_keyword_classes(patterns: list) -> tuple:
+    """Compile lowercase keyword-class patterns into one combined regex plus one regex per class.
+
+    Matching is done on lowercased text, which is much faster than re.IGNORECASE
+    for the word-boundary alternations used here.
+    """
+    combined = re.compile('|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(patterns)))
+    return combined, [re.compile(pattern) for pattern in patterns]
+
+def first_match(series: pd.Series, keyword_classes: tuple) -> np.ndarray:
+    """Return the index of the first class (in list order) found in each row's text, -1 if none or missing.
+
+    One pass of the combined regex finds the leftmost class; only rows where that
+    isn't class 0 are re-checked for a higher-priority class further right.
+    """
+    combined, regexes = keyword_classes
+    series = series.str.lower()
+    leftmost = series.str.extract(combined).notna().to_numpy()
+    idx = np.where(leftmost.any(axis=1), leftmost.argmax(axis=1), -1)
+    for i, regex in enumerate(regexes[:-1]):
+        candidates = np.flatnonzero(idx > i)
+        if len(candidates) == 0:
+            break
+        found = series.iloc[candidates].str.contains(regex, na=False).to_numpy()
+        idx[candidates[found]] = i
+    return idx
+
+def label_first_match(series: pd.Series, keyword_classes: tuple, labels: list) -> pd.Series:
+    """Map each row to the label of its first matching class, NaN if nothing matches."""
+    idx = first_match(series, keyword_classes)
+    values = np.asarray(labels, dtype=object)[np.maximum(idx, 0)]
+    return pd.Series(np.where(idx >= 0, values, np.nan), index=series.index, dtype=object)
+
+CITY_REGEX = compile_keyword_classes([city.lower() for city in CITY_NAMES])
+PROPERTY_TYPE_REGEX = compile_keyword_classes(list(PROPERTY_TYPE_KEYWORDS))
+PROPERTY_CONDITION_REGEX = compile_keyword_classes([keywords_to_pattern(k) for k in PROPERTY_CONDITION_KEYWORDS.values()])
+WATER_SOURCE_REGEX = compile_keyword_classes(list(WATER_SOURCE_KEYWORDS.values()))
+ROAD_WIDTH_REGEX = compile_keyword_classes([keywords_to_pattern(keywords) for keywords, _ in ROAD_WIDTH_KEYWORDS])
 
 # ================== Helper Functions ==================
 
@@ -12,202 +122,111 @@ def rename_and_adjust_price(data: pd.DataFrame) -> pd.DataFrame:
 
 def classify_city(data: pd.DataFrame) -> pd.DataFrame:
     """Filter city names to only include Jabodetabek regions."""
-    jabodetabek_keywords = ['Jakarta', 'Bogor', 'Depok', 'Tangerang', 'Bekasi']
-    data['city'] = data['city'].apply(lambda x: x.split(', ')[1] if isinstance(x, str) and ', ' in x else x)
-    data = data[data['city'].str.contains('|'.join(jabodetabek_keywords), case=False, na=False)]
-
-    # Keywords for classification
-    keywords = {
-        r'jakarta': 'Jakarta',
-        r'bogor': 'Bogor',
-        r'depok': 'Depok',
-        r'tangerang': 'Tangerang',
-        r'bekasi': 'Bekasi'
-    }
-
-    # Step 1: Classification based on 'address' column
-    for pattern, city_name in keywords.items():
-        data.loc[
-            data['city'].isna() & data['address'].str.contains(pattern, case=False, na=False),
-            'city'
-        ] = city_name
-
-    # Step 2: Classification based on 'title' column
-    for pattern, city_name in keywords.items():
-        data.loc[
-            data['city'].isna() & data['title'].str.contains(pattern, case=False, na=False),
-            'city'
-        ] = city_name
-
-    # Step 3: Standardize the city column using regex
-    for pattern, city_name in keywords.items():
-        data['city'] = data['city'].str.replace(rf'.*{pattern}.*', city_name, case=False, regex=True)
+    city = data['city']
+    has_separator = city.str.contains(', ', regex=False, na=False)
+    city = city.where(~has_separator, city.str.split(', ').str[1])
+    data = data[city.str.contains('|'.join(CITY_NAMES), case=False, na=False)].copy()
+    # Aligned on the kept rows: assigning the full Series to an empty frame would add every row back
+    data['city'] = city.loc[data.index]
+
+    # Step 1 & 2: Classification of missing cities based on 'address', then 'title'
+    for column in ['address', 'title']:
+        missing = data['city'].isna()
+        if missing.any():
+            data.loc[missing, 'city'] = label_first_match(data.loc[missing, column], CITY_REGEX, CITY_NAMES)
+
+    # Step 3: Standardize the city column. Multi-line values (rare) keep the
+    # line-by-line replacement of the original '.*city.*' regex.
+    city = data['city']
+    multiline = city.str.contains('\n', regex=False, na=False)
+    city = label_first_match(city.where(~multiline), CITY_REGEX, CITY_NAMES).fillna(city)
+    if multiline.any():
+        for city_name in CITY_NAMES:
+            city[multiline] = city[multiline].str.replace(rf'.*{city_name.lower()}.*', city_name, case=False, regex=True)
 
     # Step 4: Remove any additional spaces and ensure consistency
-    data['city'] = data['city'].str.strip()
+    data['city'] = city.str.strip().astype('category')
     return data
 
 def classify_property_type(data: pd.DataFrame) -> pd.DataFrame:
     """Classify property types based on predefined keywords."""
-    # Daftar kata kunci
-    keywords = {
-        r'rumah|house|mansion': 'Rumah',
-        r'apartment|apartmen|apartement|apartemen|kos|kost': 'Hunian Sewa',
-        r'pabrik|kantor|office|ruko|ruang usaha|kios|kiosk|gudang': 'Ruang Usaha',
-        r'tanah|lahan|kavling|gedung': 'Tanah dan Properti Lain'
-    }
-
-    # Normalisasi awal
-    data['property_type'] = data['property_type'].str.lower().str.strip()
-
-    # Klasifikasi berdasarkan 'property_type'
-    for pattern, prop_type in keywords.items():
-        data.loc[
-            data['property_type'].str.contains(pattern, case=False, na=False),
-            'property_type'
-        ] = prop_type
-
-    # Klasifikasi berdasarkan 'title'
-    for pattern, prop_type in keywords.items():
-        data.loc[
-            data['property_type'].isna() & data['title'].str.contains(pattern, case=False, na=False),
-            'property_type'
-        ] = prop_type
-
-    # Klasifikasi berdasarkan 'description'
-    for pattern, prop_type in keywords.items():
-        data.loc[
-            data['property_type'].isna() & data['description'].str.contains(pattern, case=False, na=False),
-            'property_type'
-        ] = prop_type
-
-    # Klasifikasi tipe rumah berdasarkan ukuran bangunan
-    def determine_house_type(row):
-        if row['property_type'] == 'Rumah':
-            size = row.get('building_size_m2', None)
-            if size is None: return 'Rumah Tipe Tidak Diketahui'
-            elif size <= 21: return 'Rumah Tipe 21'
-            elif 21 < size <= 36: return 'Rumah Tipe 36'
-            elif 36 < size <= 45: return 'Rumah Tipe 45'
-            elif 45 < size <= 54: return 'Rumah Tipe 54'
-            elif 54 < size <= 60: return 'Rumah Tipe 60'
-            elif 60 < size <= 70: return 'Rumah Tipe 70'
-            elif 70 < size <= 120: return 'Rumah Tipe 120'
-            else: return 'Rumah Tipe >120'
-        return row['property_type']  # Return original property_type for non-Rumah rows
-
-    # Update property_type with house_type where applicable
-    data['property_type'] = data.apply(determine_house_type, axis=1)
+    prop_types = list(PROPERTY_TYPE_KEYWORDS.values())
+
+    # Normalisasi awal, lalu klasifikasi berdasarkan 'property_type'
+    property_type = data['property_type'].str.lower().str.strip()
+    property_type = label_first_match(property_type, PROPERTY_TYPE_REGEX, prop_types).fillna(property_type)
+
+    # Klasifikasi berdasarkan 'title', lalu 'description'
+    for column in ['title', 'description']:
+        missing = property_type.isna()
+        if missing.any():
+            property_type[missing] = label_first_match(data.loc[missing, column], PROPERTY_TYPE_REGEX, prop_types)
+
+    # Klasifikasi tipe rumah berdasarkan ukuran bangunan (ukuran kosong masuk 'Rumah Tipe >120')
+    is_house = property_type == 'Rumah'
+    if 'building_size_m2' in data.columns:
+        house_type = pd.cut(data['building_size_m2'], bins=HOUSE_TYPE_BINS, labels=HOUSE_TYPE_LABELS)
+        house_type = house_type.astype(object).fillna(HOUSE_TYPE_LABELS[-1])
+    else:
+        house_type = 'Rumah Tipe Tidak Diketahui'
+    property_type = property_type.where(~is_house, house_type)
 
     # Drop rows where property_type is 'Tanah dan Properti Lain', 'Hunian Sewa', or 'Ruang Usaha'
-    data = data[(data['property_type'] != 'Tanah dan Properti Lain') &
-                 (data['property_type'] != 'Hunian Sewa') &
-                 (data['property_type'] != 'Ruang Usaha')]
+    keep = ~property_type.isin(DROPPED_PROPERTY_TYPES)
+    data = data[keep].copy()
+    data['property_type'] = property_type[keep].astype('category')
     return data
 
 def categorize_certificate(data: pd.DataFrame) -> pd.DataFrame:
     """Classify certificates into SHM, HGB, or Other."""
-    def certificate(value):
-        if pd.isna(value): return np.nan
-        elif 'SHM' in value: return 'SHM'
-        elif 'HGB' in value: return 'HGB'
-        else: return 'Other'
-    data['certificate'] = data['certificate'].apply(certificate)
+    certificate = data['certificate']
+    shm = certificate.str.contains('SHM', regex=False, na=False)
+    hgb = certificate.str.contains('HGB', regex=False, na=False)
+    labels = pd.Series(np.select([shm, hgb], ['SHM', 'HGB'], default='Other'), index=data.index)
+    data['certificate'] = pd.Categorical(labels.where(certificate.notna()), categories=CERTIFICATE_CATEGORIES)
     return data
 
 def categorize_property_condition(data: pd.DataFrame) -> pd.DataFrame:
     """Classify property condition into categories."""
-    def categorize(value):
-        if pd.isnull(value): 
-            return pd.NA
-        value_lower = str(value).lower()
-
-        renovated_keywords = ['renov', 'full renov', 'renovasi', 'renoved', 'renovasi baru', 'baru renovasi', 'finished', 'selesai renovasi', 'proses finishing']
-        if any(keyword in value_lower for keyword in renovated_keywords): return 'Renovated'
-        
-        new_keywords = ['new', 'brand new', 'baru', 'unit baru', 'first time', 'primery', 'full baru', 'baru selesai', 'unit baru gress']
-        if any(keyword in value_lower for keyword in new_keywords): return 'New'
-        
-        need_renovation_keywords = ['butuh renovasi', 'harus renovasi', 'setengah jadi', 'perlu renovasi', 'perlu perawatan', 'lama', 'tua']
-        if any(keyword in value_lower for keyword in need_renovation_keywords): return 'Need Renovation'
-        
-        well_maintained_keywords = ['terawat', 'siap huni', 'bersih', 'rapi', 'kokoh', 'bagus', 'layak huni', 'ready to move', 'well maintained', 'layak', 'baik', 'well']
-        if any(keyword in value_lower for keyword in well_maintained_keywords): return 'Well Maintained'
-        
-        return pd.NA
-    
-    data['property_condition'] = data['property_condition'].apply(categorize)
+    condition = data['property_condition']
+    text = condition.where(condition.isna(), condition.astype(str).str.lower())
+    labels = label_first_match(text, PROPERTY_CONDITION_REGEX, list(PROPERTY_CONDITION_KEYWORDS))
+    data['property_condition'] = pd.Categorical(labels, categories=list(PROPERTY_CONDITION_KEYWORDS))
     return data
 
 def categorize_water_source(data: pd.DataFrame) -> pd.DataFrame:
     """Classify water sources into predefined categories."""
-    keywords_water = {
-        'PAM/PDAM': r'\b(?:pam|pdam|air pam|air pdam|pln pam|aetra|water treatment|palyja)\b',
-        'Sumber Air': r'\b(?:sumur|jet pump|jetpump|sumur bor|air sumur|bor|tanah|air tanah|filter|osmosis|reverse osmosis|sistem filter|pompa|submersible pump|water pump|mata air|air alami|wtp|jetpam|air jet pum|air ready|langsung dari sumbernya|air bagus|sumber air)\b',
-        'Gabungan': r'\b(?:pdam\s?\+?\s?sumur|pam\s?\+?\s?tanah|air jetpump)\b'
-    }
-
-    data['water_source'] = data['water_source'].str.lower().str.strip()
+    categories = list(WATER_SOURCE_KEYWORDS)
+    water_source = data['water_source'].str.lower().str.strip()
 
     # Check and classify rows where 'water_source' is not missing
-    for category, pattern in keywords_water.items():
-        data.loc[data['water_source'].str.contains(pattern, case=False, na=False), 'water_source'] = category
+    water_source = label_first_match(water_source, WATER_SOURCE_REGEX, categories).fillna(water_source)
 
     # Step 2: Handle missing 'water_source' values by checking the 'description' for matching keywords
-    for category, pattern in keywords_water.items():
-        data.loc[data['water_source'].isna() & data['description'].str.contains(pattern, case=False, na=False), 'water_source'] = category
+    missing = water_source.isna()
+    if missing.any():
+        water_source[missing] = label_first_match(data.loc[missing, 'description'], WATER_SOURCE_REGEX, categories)
+
+    data['water_source'] = water_source.astype('category')
     return data
 
 def convert_road_width_to_meter(data: pd.DataFrame) -> pd.DataFrame:
     """Convert road width values into meters."""
-    def convert(value):
-        if pd.isnull(value): return np.nan
-        value_lower = str(value).lower()
-
-        if 'meter' in value_lower or 'mtr' in value_lower:
-            match = re.search(r'(\d+\.?\d*)\s?(meter|mtr)', value_lower)
-            if match: return float(match.group(1))
-        # Kondisi 1 mobil
-        if any(keyword in value_lower for keyword in ['1 mobil', '1mobil', '1 mbl', '1 arah mobil']):
-            return 2.5
-        
-        # Kondisi 2 mobil
-        if any(keyword in value_lower for keyword in ['2 mobil', '2 mobil lega', '2-3 mobil', '2 mobil pas', '2 mbl', 'akses jalan 2 mobil', '2 mobil 2 arah', 'row jalan 2 mobil', '2.5 mobil', '2mob', '2row']):
-            return 5
-        
-        # Kondisi 3 mobil
-        if any(keyword in value_lower for keyword in ['3 mobil', '3 row', '3 mbl', 'jalan 3 mobil', 'row jalan 3 mobil', '3 mobil lebih', '3mob']):
-            return 7.5
-        
-        # Kondisi 4 mobil
-        if any(keyword in value_lower for keyword in ['4 mobil', '4 mbl']):
-            return 10
-        
-        # Kondisi lebih dari 4 mobil
-        if any(keyword in value_lower for keyword in ['5 mobil', '6 mobil', '7 mobil', '8 mobil', 'lebih dari 4 mobil']):
-            return 12
-        
-        # Kondisi lebar jalan besar atau akses jalan lebar
-        if any(keyword in value_lower for keyword in ['lebar', 'besar', 'akses jalan', 'jalan besar']):
-            return 5
-        
-        # Kondisi "super lebar"
-        if 'super lebar' in value_lower:
-            return 15
-        
-        return np.nan
-    
-    data['road_width'] = data['road_width'].apply(convert)
-    data['road_width'] = pd.to_numeric(data['road_width'], errors='coerce')
+    road_width = data['road_width']
+    text = road_width.where(road_width.isna(), road_width.astype(str).str.lower())
+
+    # Ukuran dalam meter eksplisit, selain itu berdasarkan kata kunci jumlah mobil/lebar jalan
+    meters = pd.to_numeric(text.str.extract(ROAD_WIDTH_METER_REGEX)[0], errors='coerce')
+    by_keyword = label_first_match(text, ROAD_WIDTH_REGEX, [width for _, width in ROAD_WIDTH_KEYWORDS]).astype(float)
+
+    data['road_width'] = pd.to_numeric(meters.fillna(by_keyword), errors='coerce')
     return data
 
 
-# ================== Main Cleaning Function ==================
+# ================== Chunked Pipeline ==================
 
-def CleaningData():
-    """Main function for cleaning property data."""
-    data = pd.read_csv('/opt/airflow/data/Property_Scraping.csv')
-    data = data.drop_duplicates(subset='url')
+def clean_chunk(data: pd.DataFrame) -> pd.DataFrame:
+    """Run every cleaning stage except de-duplication on one chunk."""
     data = rename_and_adjust_price(data)
     data = classify_city(data)
     data = classify_property_type(data)
@@ -215,8 +234,65 @@ def CleaningData():
     data = categorize_property_condition(data)
     data = categorize_water_source(data)
     data = convert_road_width_to_meter(data)
-    data.to_csv('/opt/airflow/data/data_cleaned.csv', index=False)
-    print("Data cleaned and saved to 'data_cleaned.csv'.")
+    return data
+
+class SeenUrls:
+    """Compact set of 64-bit URL hashes for de-duplicating across chunks.
+
+    Keeps the first occurrence of every URL, like `drop_duplicates(subset='url')`
+    on the whole file, without holding the URL strings in memory.
+    """
+
+    def __init__(self):
+        self._hashes = set()
+
+    def drop_seen(self, data: pd.DataFrame) -> pd.DataFrame:
+        hashes = pd.util.hash_pandas_object(data['url'], index=False).to_numpy()
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        keep &= np.fromiter((h not in self._hashes for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        self._hashes.update(hashes[keep].tolist())
+        return data[keep]
+
+# ================== Main Cleaning Function ==================
+
+@instrumentation.stage("cleaning_data")
+def CleaningData(input_file=INPUT_FILE, output_file=OUTPUT_FILE, chunksize=CHUNKSIZE, parquet_file=PARQUET_FILE):
+    """Main function for cleaning property data.
+
+    The input is read and cleaned `chunksize` rows at a time and appended to the
+    output, so memory stays flat as the catalog grows (None = whole file at once).
+    The typed Parquet copy is what the downstream tasks read; the CSV is kept
+    for the initial COPY in `create_db.sql`.
+    """
+    chunks = pd.read_csv(input_file, dtype=RAW_DTYPES, chunksize=chunksize)
+    if chunksize is None:
+        chunks = [chunks]
+
+    seen_urls = SeenUrls()
+    tmp_file = f"{output_file}.tmp"
+    rows_in, rows_out, chunks_read = 0, 0, 0
+    with TableWriter(parquet_file) as parquet_writer:
+        for i, chunk in enumerate(chunks):
+            rows_in += len(chunk)
+            data = clean_chunk(seen_urls.drop_seen(chunk))
+            data.to_csv(tmp_file, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+            parquet_writer.write(data)
+            rows_out += len(data)
+            chunks_read += 1
+        if chunks_read == 0:
+            # A header-only input yields no chunk at all on older pandas; the outputs
+            # still get the cleaned columns (header-only CSV, empty Parquet)
+            data = clean_chunk(pd.read_csv(input_file, dtype=RAW_DTYPES, nrows=0))
+            data.to_csv(tmp_file, index=False)
+            parquet_writer.write(data)
+    os.replace(tmp_file, output_file)
+    instrumentation.add("rows_in", rows_in)
+    instrumentation.add("rows_out", rows_out)
+    instrumentation.add_file_size("bytes_read", input_file)
+    instrumentation.add_file_size("bytes_written", output_file)
+    instrumentation.add_file_size("bytes_written", parquet_file)
+    print(f"Data cleaned ({rows_in} -> {rows_out} rows) and saved to "
+          f"'{os.path.basename(output_file)}' and '{os.path.basename(parquet_file)}'.")
 
 
 # ================== Entry Point ==================
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.pipeline import Pipeline
+from utilization.model_bundle import ModelBundle, PredictionPipeline, prediction_pipeline
+
+# ================== Constants ==================
+ARRAY_NAMES = ['roots', 'left', 'right', 'feature', 'threshold', 'value']
+BUNDLE_FILE = 'bundle.pkl'
+MANIFEST_FILE = 'manifest.json'
+PREDICT_CHUNK_ROWS = 2_000
+
+# ================== Compact Forest ==================
+
+class CompactForestRegressor(BaseEstimator, RegressorMixin):
+    """Array-backed copy of a fitted forest of regression trees.
+
+    All trees are flattened into one set of node arrays (`roots` holds each
+    tree's root index, `left`/`right` are -1 at leaves). Thresholds are stored
+    as float32, rounded down to the nearest float32: scikit-learn compares
+    float32 inputs with `x <= threshold`, so this gives the same splits as the
+    float64 original. The arrays are saved as .npy files and memory-mapped on
+    load, so they are not part of the pickle.
+
+    `predict` walks all trees of a chunk of rows at once, level by level.
+    """
+
+    def __init__(self, roots=None, left=None, right=None, feature=None, threshold=None, value=None):
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+
+    @classmethod
+    def from_forest(cls, forest):
+        """Convert a fitted RandomForestRegressor (or any forest of DecisionTreeRegressors)."""
+        trees = [estimator.tree_ for estimator in getattr(forest, 'estimators_', [])]
+        if not trees or getattr(trees[0], 'n_outputs', 1) != 1:
+            raise TypeError(f"Expected a fitted single-output forest, got {type(forest).__name__}.")
+
+        roots, lefts, rights, features, thresholds, values = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            values.append(tree.value[:, 0, 0])
+            offset += tree.node_count
+
+        threshold = np.concatenate(thresholds)
+        threshold32 = threshold.astype(np.float32)
+        rounded_up = threshold32.astype(np.float64) > threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+
+        compact = cls(
+            roots=np.asarray(roots, dtype=np.int64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=threshold32,
+            value=np.concatenate(values).astype(np.float64),
+        )
+        compact.n_features_in_ = forest.n_features_in_
+        return compact
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def tree_predictions(self, X):
+        """Leaf value of every tree for every row, shape (n_rows, n_trees)."""
+        X = X.toarray() if sp.issparse(X) else X
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.n_trees))
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            chunk = X[start:start + PREDICT_CHUNK_ROWS]
+            nodes = np.tile(self.roots, len(chunk))
+            rows = np.repeat(np.arange(len(chunk)), self.n_trees)
+            active = np.flatnonzero(self.left[nodes] != -1)
+            while active.size:
+                current = nodes[active]
+                go_left = chunk[rows[active], self.feature[current]] <= self.threshold[current]
+                nodes[active] = np.where(go_left, self.left[current], self.right[current])
+                active = active[self.left[nodes[active]] != -1]
+            out[start:start + len(chunk)] = self.value[nodes].reshape(len(chunk), self.n_trees)
+        return out
+
+    def predict(self, X):
+        return self.tree_predictions(X).mean(axis=1)
+
+    def subset(self, tree_indices):
+        """A new compact forest with only the given trees (node arrays re-packed)."""
+        ends = np.append(self.roots[1:], len(self.left))
+        parts = {name: [] for name in ARRAY_NAMES}
+        offset = 0
+        for i in tree_indices:
+            start, end = self.roots[i], ends[i]
+            shift = offset - start
+            left, right = self.left[start:end], self.right[start:end]
+            parts['roots'].append(offset)
+            parts['left'].append(np.where(left == -1, -1, left + shift))
+            parts['right'].append(np.where(right == -1, -1, right + shift))
+            parts['feature'].append(self.feature[start:end])
+            parts['threshold'].append(self.threshold[start:end])
+            parts['value'].append(self.value[start:end])
+            offset += end - start
+        compact = CompactForestRegressor(
+            roots=np.asarray(parts['roots'], dtype=np.int64),
+            **{name: np.concatenate(parts[name]) for name in ARRAY_NAMES if name != 'roots'}
+        )
+        compact.n_features_in_ = getattr(self, 'n_features_in_', None)
+        return compact
+
+    def __getstate__(self):
+        # Arrays live in the .npy files next to the pickle
+        state = self.__dict__.copy()
+        for name in ARRAY_NAMES:
+            state[name] = None
+        return state
+
+# ================== Tree Selection ==================
+
+def greedy_tree_order(predictions, y):
+    """Order trees by greedy forward selection: each step adds the tree that lowers the MAE of the mean most."""
+    remaining = np.arange(predictions.shape[1])
+    order = []
+    total = np.zeros(len(y))
+    while remaining.size:
+        candidate_means = (total[:, None] + predictions[:, remaining]) / (len(order) + 1)
+        best = int(np.argmin(np.abs(candidate_means - y[:, None]).mean(axis=0)))
+        order.append(int(remaining[best]))
+        total += predictions[:, remaining[best]]
+        remaining = np.delete(remaining, best)
+    return order
+
+def select_trees(forest: CompactForestRegressor, X_val, y_val, max_mae_increase=0.01, random_state=0):
+    """Smallest tree subset whose MAE is within `max_mae_increase` (relative) of the full forest.
+
+    The validation rows are split in two halves: the greedy tree order is
+    built on one half and the subset size is chosen on the other, so the MAE
+    bound is not measured on the rows the trees were picked for.
+    Returns (selected tree indices, subset MAE, full MAE) on the second half.
+    """
+    predictions = forest.tree_predictions(X_val)
+    y_val = np.asarray(y_val, dtype=float)
+    rows = np.random.RandomState(random_state).permutation(len(y_val))
+    order_rows, check_rows = rows[:len(rows) // 2], rows[len(rows) // 2:]
+
+    order = greedy_tree_order(predictions[order_rows], y_val[order_rows])
+    check_predictions, y_check = predictions[check_rows][:, order], y_val[check_rows]
+    prefix_means = np.cumsum(check_predictions, axis=1) / np.arange(1, forest.n_trees + 1)
+    prefix_mae = np.abs(prefix_means - y_check[:, None]).mean(axis=0)
+    full_mae = float(prefix_mae[-1])
+    n_trees = int(np.argmax(prefix_mae <= full_mae * (1 + max_mae_increase))) + 1
+    return sorted(order[:n_trees]), float(prefix_mae[n_trees - 1]), full_mae
+
+# ================== Export / Load ==================
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _export_dirs(path):
+    """Versioned directories written for the export at `path`, oldest first."""
+    parent, name = os.path.split(os.path.abspath(path))
+    if not os.path.isdir(parent):
+        return []
+    return sorted(os.path.join(parent, entry) for entry in os.listdir(parent) if entry.startswith(f"{name}.v"))
+
+def remove_compact_export(path: str):
+    """Remove the export at `path` together with all its versioned directories."""
+    if os.path.islink(path):
+        os.remove(path)
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+    for directory in _export_dirs(path):
+        shutil.rmtree(directory, ignore_errors=True)
+
+def export_compact_bundle(bundle: ModelBundle, path: str, X_val=None, y_val=None, max_mae_increase=None):
+    """Write `bundle` as a directory with a compact forest, optionally keeping only a subset of trees.
+
+    The last pipeline step must be a fitted forest. If `max_mae_increase` is
+    given, trees are selected on (X_val, y_val) (raw features, as the bundle
+    expects them); these rows must not have been used to fit the forest.
+    The files go to a new versioned directory (`<path>.v<timestamp>`) and
+    `path` is a symlink to it, replaced atomically. Returns the exported
+    ModelBundle.
+    """
+    pipeline = bundle.pipeline
+    if not isinstance(pipeline, Pipeline):
+        raise TypeError("Only pipelines ending in a forest can be exported.")
+    step_name, forest = pipeline.steps[-1]
+    compact = CompactForestRegressor.from_forest(forest)
+    preprocessing = Pipeline(pipeline.steps[:-1]) if len(pipeline.steps) > 1 else None
+
+    compact_metadata = {"n_trees_original": compact.n_trees}
+    if max_mae_increase is not None:
+        X_val = bundle.align(X_val)
+        Xt_val = preprocessing.transform(X_val) if preprocessing is not None else X_val
+        trees, subset_mae, full_mae = select_trees(compact, Xt_val, y_val, max_mae_increase)
+        compact = compact.subset(trees)
+        compact_metadata.update({"max_mae_increase": max_mae_increase, "validation_mae_full": full_mae,
+                                 "validation_mae_subset": subset_mae})
+    compact_metadata.update({"n_trees": compact.n_trees, "n_nodes": len(compact.left)})
+
+    exported = ModelBundle(
+        PredictionPipeline(pipeline.steps[:-1] + [(step_name, compact)]),
+        bundle.feature_columns, dtypes=bundle.dtypes, categories=bundle.categories,
+        metadata={**bundle.metadata, "compact": compact_metadata}, version=bundle.version,
+    )
+
+    target = f"{path}.v{time.time_ns():020d}"
+    os.makedirs(target)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(target, f"{name}.npy"), getattr(compact, name))
+    with open(os.path.join(target, BUNDLE_FILE), 'wb') as f:
+        pickle.dump(exported, f)
+    files = [f"{name}.npy" for name in ARRAY_NAMES] + [BUNDLE_FILE]
+    manifest = {"version": exported.version, **compact_metadata,
+                "files": {name: _file_sha256(os.path.join(target, name)) for name in files}}
+    with open(os.path.join(target, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Replacing a symlink is atomic: readers see either the old or the new complete
+    # export, never no export. The link is relative, so it also resolves where the
+    # data folder is mounted elsewhere (the app reads it as data/)
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    link_path = f"{path}.link.tmp"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    os.symlink(os.path.basename(target), link_path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Export from before the directories were versioned: replaced once, not atomically
+        shutil.rmtree(path)
+    os.replace(link_path, path)
+    # The previous export is kept for readers still loading it; older (or unfinished) ones are removed
+    for directory in _export_dirs(path):
+        if os.path.realpath(directory) not in (os.path.realpath(target), previous):
+            shutil.rmtree(directory, ignore_errors=True)
+    print(f"Exported compact model to '{path}': {compact.n_trees}/{compact_metadata['n_trees_original']} trees, "
+          f"{len(compact.left):,} nodes.")
+    return exported
+
+def read_manifest(path: str):
+    """Manifest of a compact export, or None if there is none."""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def load_compact_bundle(path: str, mmap=True) -> ModelBundle:
+    """Load a directory written by `export_compact_bundle`, memory-mapping the node arrays."""
+    with open(os.path.join(path, BUNDLE_FILE), 'rb') as f:
+        bundle = pickle.load(f)
+    bundle.pipeline = prediction_pipeline(bundle.pipeline)
+    compact = bundle.pipeline.steps[-1][1]
+    for name in ARRAY_NAMES:
+        setattr(compact, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None))
+    return bundle
@@ -1,29 +1,40 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.impute import KNNImputer
-from sklearn.pipeline import make_pipeline
 import pickle
-from sklearn.pipeline import Pipeline, make_pipeline
-from sklearn.ensemble import RandomForestRegressor
+from utilization import instrumentation
+from utilization.cache import skip_if_unchanged
+from utilization.storage import read_table
+
+# sklearn (and the KNN imputer, which needs it) is imported inside the functions:
+# fetch_from_postgresql and the DAG only need the constants of this module
+
+# ===================== Constants =====================
+
+CLEANED_DATA_FILE = '/opt/airflow/data/data_cleaned.parquet'
+FE_DATA_FILE = '/opt/airflow/data/data_after_fe.pkl'
+SELECTED_COLUMNS = [
+    'land_size_m2', 'building_size_m2', 'road_width', 'city', 'property_type',
+    'certificate', 'furniture', 'house_facing', 'water_source', 'property_condition',
+    'bedroom', 'bathroom', 'garage', 'carport', 'voltage_watt', 'maid_bedroom',
+    'maid_bathroom', 'kitchen', 'floor_level', 'price_mio'
+]
+# Share of the training rows held out from model fitting, for choices made on a
+# fitted model (the trees kept by the compact export), so they are not made on the test set
+SELECTION_SIZE = 0.10
 
 # ===================== Helper Functions =====================
 
-def read_and_filter_data(filepath):
-    """Read CSV and select relevant columns."""
-    df = pd.read_csv(filepath)
-    selected_columns = [
-        'land_size_m2', 'building_size_m2', 'road_width', 'city', 'property_type',
-        'certificate', 'furniture', 'house_facing', 'water_source', 'property_condition',
-        'bedroom', 'bathroom', 'garage', 'carport', 'voltage_watt', 'maid_bedroom',
-        'maid_bathroom', 'kitchen', 'floor_level', 'price_mio'
-    ]
-    return df[selected_columns]
+def read_and_filter_data(filepath, columns=SELECTED_COLUMNS):
+    """Read only the relevant columns from Parquet (or CSV)."""
+    if filepath.endswith('.parquet'):
+        return read_table(filepath, columns=columns)
+    df = pd.read_csv(filepath, usecols=columns)
+    return df[columns]
 
 def split_features_and_target(df, target_column='price_mio',random_state=999):
     """Split data into features (X) and target (y)."""
+    from sklearn.model_selection import train_test_split
+
     X = df.drop(target_column, axis=1)
     y = df[target_column]
 
@@ -32,92 +43,34 @@ def split_features_and_target(df, target_column='price_mio',random_state=999):
 
     return X_train, X_test, y_train, y_test
 
+def split_selection_rows(X_train, y_train, selection_size=SELECTION_SIZE, random_state=999):
+    """Hold out `selection_size` of the training rows; returns X_train, X_select, y_train, y_select."""
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(X_train, y_train, test_size=selection_size, random_state=random_state)
+
 def impute_with_knn(X_train, X_test, num_cols, cat_cols):
-    # Create deep copies to avoid modifying original dataframes
-    X_train_imputed = X_train.copy(deep=True)
-    X_test_imputed = X_test.copy(deep=True)
-    
-    # Prepare data with numeric columns and encoded categorical columns
-    def prepare_data_for_imputation(df, label_encoders):
-        # Create a copy of the dataframe
-        prepared_df = df.copy(deep=True)
-        
-        # Handle numeric columns
-        for col in num_cols:
-            # Replace NaNs with median for numeric columns
-            prepared_df[col] = prepared_df[col].fillna(prepared_df[col].median())
-        
-        # Handle categorical columns
-        for col in cat_cols:
-            # If encoder exists, use it, otherwise create a new one
-            if col not in label_encoders:
-                # Combine unique values from both train and test
-                combined_categories = pd.concat([X_train[col], X_test[col]]).dropna().unique()
-                
-                # Create LabelEncoder with combined categories
-                le = LabelEncoder()
-                le.fit(combined_categories.astype(str))
-                label_encoders[col] = le
-            
-            # Get the encoder for this column
-            le = label_encoders[col]
-            
-            # Create a copy of the column for transformation
-            col_to_encode = prepared_df[col].copy()
-            
-            # Replace NaNs with a special category that is in the original categories
-            col_to_encode = col_to_encode.fillna(le.classes_[0])
-            
-            # Transform categorical columns
-            prepared_df[col] = le.transform(col_to_encode.astype(str))
-        
-        return prepared_df, label_encoders
-    
-    # Dictionary to store label encoders
-    label_encoders = {}
-    
-    # Prepare train and test data
-    X_train_prep, label_encoders = prepare_data_for_imputation(X_train, label_encoders)
-    X_test_prep, label_encoders = prepare_data_for_imputation(X_test, label_encoders)
-    
-    # Combine all columns to impute
-    cols_to_impute = num_cols + cat_cols
-    
-    # Prepare data for KNN Imputer
-    X_train_to_impute = X_train_prep[cols_to_impute]
-    X_test_to_impute = X_test_prep[cols_to_impute]
-    
-    # Initialize KNN Imputer
-    knn_imputer = KNNImputer(n_neighbors=5)
-    
-    # Fit and transform training data
-    X_train_imputed_values = knn_imputer.fit_transform(X_train_to_impute)
-
-    # Transform test data
-    X_test_imputed_values = knn_imputer.transform(X_test_to_impute)
-    
-    # Update the original dataframes with imputed values
-    X_train_imputed[cols_to_impute] = X_train_imputed_values
-    X_test_imputed[cols_to_impute] = X_test_imputed_values
-    
-    # Decode categorical columns
-    for col in cat_cols:
-        # Inverse transform categorical columns
-        X_train_imputed[col] = label_encoders[col].inverse_transform(
-            X_train_imputed[col].astype(int)
-        )
-        X_test_imputed[col] = label_encoders[col].inverse_transform(
-            X_test_imputed[col].astype(int)
-        )
-    
-    return X_train_imputed, X_test_imputed
+    """Fit a KNNFeatureImputer on X_train and return imputed copies of X_train and X_test."""
+    from utilization.imputation import KNNFeatureImputer
+
+    imputer = KNNFeatureImputer(num_cols, cat_cols).fit(X_train)
+    return imputer.transform(X_train), imputer.transform(X_test)
 
 # ===================== Main Feature Engineering =====================
 
+@instrumentation.stage("feature_engineering")
+@skip_if_unchanged(lambda params: [CLEANED_DATA_FILE], lambda params: [FE_DATA_FILE],
+                   modules=['utilization.imputation', 'utilization.storage'])
 def FeatureEngineering():
     """Main function to perform feature engineering."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, OrdinalEncoder
+    from utilization.imputation import KNNFeatureImputer
+
     # Filepath to cleaned data
-    filepath = '/opt/airflow/data/data_cleaned.csv'
+    filepath = CLEANED_DATA_FILE
 
     # Define numerical and categorical columns
     num_cols = ['land_size_m2', 'building_size_m2', 'road_width', 'maid_bedroom',
@@ -127,14 +80,21 @@ def FeatureEngineering():
     cat_cols = ['city', 'property_type', 'certificate', 'furniture', 'house_facing',
                 'water_source', 'property_condition']
 
-    # Step 1: Read and filter data
-    df = read_and_filter_data(filepath)
+    # Step 1: Read and filter data (the URL only identifies the rows, it is not a feature)
+    df = read_and_filter_data(filepath, SELECTED_COLUMNS + ['url'])
+    urls = df.pop('url')
+    instrumentation.add("rows_in", len(df))
+    instrumentation.add_file_size("bytes_read", filepath)
 
-    # Step 2: Split features and target
+    # Step 2: Split features and target, and hold out the selection rows from training
     X_train, X_test, y_train, y_test = split_features_and_target(df)
+    X_train, X_select, y_train, y_select = split_selection_rows(X_train, y_train)
 
     # Step 3: Handle missing values
-    X_train_imputed, X_test_imputed = impute_with_knn(X_train, X_test, num_cols, cat_cols)
+    with instrumentation.span("knn_imputation"):
+        imputer = KNNFeatureImputer(num_cols, cat_cols).fit(X_train)
+        X_train_imputed, X_select_imputed, X_test_imputed = (
+            imputer.transform(X) for X in (X_train, X_select, X_test))
 
     # Step 4: Making column transformer for preprocessing
     transformer = ColumnTransformer([
@@ -143,22 +103,44 @@ def FeatureEngineering():
     ])
     transformer
 
-    # Step 5: Making pipeline for Random Forest
+    # Step 5: Making pipeline for Random Forest (imputer included, so the
+    # saved model imputes missing inputs at inference exactly like in training)
     pipe_rf = Pipeline([
+    ('imputer', KNNFeatureImputer(num_cols, cat_cols)),
     ('transformer', transformer),
     ('model', RandomForestRegressor(random_state=999))
     ])
 
-    # Step 5: Save preprocessed data
+    # Step 6: Making pipeline for histogram gradient boosting. It handles NaN and
+    # categoricals natively, so no imputer and no one-hot columns: categoricals are
+    # ordinal-encoded (missing/unknown -> NaN) and come first in the output
+    pipe_hgb = Pipeline([
+    ('encoder', ColumnTransformer([
+        ('ordinal', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan), cat_cols)
+    ], remainder='passthrough')),
+    ('model', HistGradientBoostingRegressor(categorical_features=list(range(len(cat_cols))), random_state=999))
+    ])
+
+    # Step 7: Save preprocessed data
     data_to_save = {
+        "X_train": X_train,
+        "X_test": X_test,
         "X_train_imputed": X_train_imputed,
         "X_test_imputed": X_test_imputed,
+        "X_select": X_select,
+        "X_select_imputed": X_select_imputed,
         "y_train": y_train,
         "y_test": y_test,
-        "pipe_rf": pipe_rf
+        "y_select": y_select,
+        "url_test": urls.loc[X_test.index],
+        "num_cols": num_cols,
+        "cat_cols": cat_cols,
+        "pipe_rf": pipe_rf,
+        "pipe_hgb": pipe_hgb
     }
-    with open("/opt/airflow/data/data_after_fe.pkl", "wb") as f:
+    with open(FE_DATA_FILE, "wb") as f:
         pickle.dump(data_to_save, f)
+    instrumentation.add_file_size("bytes_written", FE_DATA_FILE)
 
     print('Feature Engineering completed successfully!')
 
@@ -1,17 +1,167 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
 import pandas as pd
 import psycopg2 as db
+from psycopg2 import sql
+from utilization import instrumentation
+from utilization.feature_engineering import SELECTED_COLUMNS
+from utilization.storage import TableWriter
+
+# ================== Constants ==================
+CONN_STRING = "dbname='house_prediction_db' host='postgres' user='airflow' password='airflow'"
+TABLE_NAME = 'house_prediction_table'
+OUTPUT_FILE = '/opt/airflow/data/data_from_db.parquet'
+FETCH_STATE_FILE = '/opt/airflow/data/fetch_state.json'
+FETCH_COLUMNS = ['url'] + SELECTED_COLUMNS
+BATCH_SIZE = 50_000
+
+# Postgres type OIDs -> pandas dtypes, so every batch gets the same schema
+# even when a column happens to be all NULL in it
+FLOAT_OIDS = {20, 21, 23, 700, 701, 1700}   # int8/2/4, float4/8, numeric
+BOOL_OID = 16
+TIMESTAMP_OIDS = {1114, 1184}
+
+# ================== Helper Functions ==================
+
+def load_last_fetch(path: str = FETCH_STATE_FILE):
+    """Return the database time of the last successful fetch, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return datetime.fromisoformat(json.load(f)['last_fetch'])
+
+def save_last_fetch(fetched_at: datetime, path: str = FETCH_STATE_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_fetch': fetched_at.isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def build_query(columns=FETCH_COLUMNS, where=None, since=None, table=TABLE_NAME):
+    """Compose `SELECT <columns> FROM <table> [WHERE ...]` and its parameters.
+
+    `where` is a raw SQL condition (it may use `%s` placeholders, passed as
+    `(where, params)`), `since` keeps only rows with `updated_at > since`.
+    """
+    conditions, params = [], []
+    if where is not None:
+        condition, condition_params = where if isinstance(where, tuple) else (where, ())
+        conditions.append(sql.SQL(condition))
+        params.extend(condition_params)
+    if since is not None:
+        conditions.append(sql.SQL("updated_at > %s"))
+        params.append(since)
+
+    query = sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(', ').join(sql.Identifier(col) for col in columns) if columns else sql.SQL('*'),
+        sql.Identifier(table)
+    )
+    if conditions:
+        query = sql.SQL("{} WHERE {}").format(query, sql.SQL(' AND ').join(conditions))
+    return query, params
+
+def column_dtypes(description) -> dict:
+    """Map a cursor description to pandas dtypes."""
+    dtypes = {}
+    for column in description:
+        if column.type_code in FLOAT_OIDS:
+            dtypes[column.name] = 'float64'
+        elif column.type_code == BOOL_OID:
+            dtypes[column.name] = 'boolean'
+        elif column.type_code in TIMESTAMP_OIDS:
+            dtypes[column.name] = 'datetime64[ns]'
+        else:
+            dtypes[column.name] = 'object'
+    return dtypes
+
+def iter_cursor_batches(conn, query, params, batch_size=BATCH_SIZE):
+    """Yield DataFrames of at most `batch_size` rows from a named server-side cursor."""
+    with conn.cursor(name='fetch_from_postgresql') as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        first_batch = True
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            # An empty result still yields one (empty) batch so the output file has a schema
+            if not rows and not first_batch:
+                break
+            dtypes = column_dtypes(cursor.description)
+            yield pd.DataFrame.from_records(rows, columns=list(dtypes)).astype(dtypes)
+            if not rows:
+                break
+            first_batch = False
+
+def iter_copy_batches(conn, query, params, batch_size=BATCH_SIZE):
+    """Yield DataFrames of at most `batch_size` rows streamed with `COPY (...) TO STDOUT`.
+
+    The COPY output is spooled to a temporary file and parsed in chunks, so
+    only one batch is held in memory at a time.
+    """
+    with conn.cursor() as cursor:
+        # Same query with LIMIT 0 only to learn the column types
+        cursor.execute(sql.SQL("{} LIMIT 0").format(query), params)
+        dtypes = column_dtypes(cursor.description)
+        # COPY takes no parameters, so they are bound client-side first
+        copy_query = sql.SQL("COPY ({}) TO STDOUT WITH CSV HEADER").format(
+            sql.SQL(cursor.mogrify(query, params).decode())
+        )
+        with tempfile.TemporaryFile(mode='w+b') as spool:
+            cursor.copy_expert(copy_query, spool)
+            spool.seek(0)
+            dates = [col for col, dtype in dtypes.items() if dtype.startswith('datetime')]
+            csv_dtypes = {col: dtype for col, dtype in dtypes.items() if col not in dates}
+            empty = True
+            for chunk in pd.read_csv(spool, dtype=csv_dtypes, parse_dates=dates, chunksize=batch_size,
+                                     true_values=['t'], false_values=['f']):
+                empty = False
+                yield chunk
+            if empty:
+                yield pd.DataFrame(columns=list(dtypes)).astype(dtypes)
+
+# ================== Main Fetch Function ==================
+
+@instrumentation.stage("fetch_from_postgresql")
+def FetchFromPostgresql(output_file=OUTPUT_FILE, columns=FETCH_COLUMNS, where=None, since=None,
+                        mode='cursor', batch_size=BATCH_SIZE, conn_string=CONN_STRING,
+                        state_file=FETCH_STATE_FILE, table=TABLE_NAME):
+    """Stream `house_prediction_table` into a Parquet file in bounded batches.
+
+    Only `columns` are selected (None = all), optionally filtered by `where`
+    and/or `since` (rows updated after that timestamp; 'last_run' uses the
+    time recorded in `state_file` by the previous fetch). `mode` is 'cursor'
+    for a named server-side cursor or 'copy' for `COPY ... TO STDOUT`.
+    Returns the number of rows written.
+    """
+    if mode not in ('cursor', 'copy'):
+        raise ValueError(f"Unknown fetch mode: {mode!r}")
+    if since == 'last_run':
+        since = load_last_fetch(state_file)
+    elif isinstance(since, str):
+        since = datetime.fromisoformat(since)
+
+    query, params = build_query(columns, where=where, since=since, table=table)
+    iter_batches = iter_cursor_batches if mode == 'cursor' else iter_copy_batches
 
-def FetchFromPostgresql():
     # Connect to PostgreSQL
-    conn_string = "dbname='house_prediction_db' host='postgres' user='airflow' password='airflow'"
     conn = db.connect(conn_string)
-    
-    # Fetch data from PostgreSQL
-    df = pd.read_sql("SELECT * FROM house_prediction_table;", conn)
-    conn.close()
+    try:
+        # Database clock, taken in the same transaction as the fetch itself
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT LOCALTIMESTAMP;")
+            fetched_at = cursor.fetchone()[0]
+        with TableWriter(output_file) as writer, instrumentation.span("stream_batches"):
+            for batch in iter_batches(conn, query, params, batch_size):
+                writer.write(batch)
+    finally:
+        conn.close()
+    save_last_fetch(fetched_at, state_file)
+    instrumentation.add("rows_out", writer.rows_written)
+    instrumentation.add_file_size("bytes_written", output_file)
 
-    # Save to a CSV file
-    df.to_csv('/opt/airflow/data/data_cleaned.csv', index=False)
+    print(f"Fetched {writer.rows_written} rows ({mode}) into '{os.path.basename(output_file)}'.")
+    return writer.rows_written
 
 if __name__ == "__main__":
-    FetchFromPostgresql()
\ No newline at end of file
+    FetchFromPostgresql()
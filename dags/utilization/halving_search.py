@@ -0,0 +1,162 @@
+import math
+from time import perf_counter
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+from sklearn.pipeline import Pipeline
+from utilization.cache import content_key
+from utilization.model_bundle import data_fingerprint
+from utilization.trial_store import TrialStore
+
+# ================== Successive Halving ==================
+
+class HalvingForestSearch:
+    """Successive-halving search over a pipeline ending in a forest, with `n_estimators` as the budget.
+
+    Every candidate starts with few trees on each CV fold; after each rung only
+    the best 1/`factor` of the candidates survive and their forests are grown
+    (`warm_start=True`, so existing trees are kept and only new ones are fitted)
+    up to the next budget, the last rung using `max_resource` trees.
+
+    The preprocessing steps (everything before the last pipeline step) do not
+    depend on the searched parameters, so they are fitted once per fold and the
+    transformed folds are reused by every candidate and rung.
+
+    With a `trial_store`, every fold score is persisted as soon as it is known
+    and reused on the next run on the same data, so a search interrupted by a
+    timeout resumes where it stopped. If `time_budget` (seconds) runs out, the search stops and
+    the best candidate of the last fully evaluated rung is refitted.
+
+    Mirrors the parts of the RandomizedSearchCV API that `Modeling` uses:
+    `fit`, `best_params_`, `best_score_` (negative MAE), `best_estimator_`.
+    """
+
+    def __init__(self, estimator: Pipeline, param_distributions: dict, n_candidates=50, cv=5,
+                 resource='model__n_estimators', max_resource=500, min_resource=10, factor=3,
+                 n_jobs=-1, random_state=0, trial_store: TrialStore = None, time_budget=None):
+        self.estimator = estimator
+        self.param_distributions = param_distributions
+        self.n_candidates = n_candidates
+        self.cv = cv
+        self.resource = resource
+        self.max_resource = max_resource
+        self.min_resource = min_resource
+        self.factor = factor
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.trial_store = trial_store
+        self.time_budget = time_budget
+
+    def _candidates(self):
+        space = {key: values for key, values in self.param_distributions.items() if key != self.resource}
+        all_lists = all(isinstance(values, (list, tuple)) for values in space.values())
+        n_candidates = min(self.n_candidates, len(ParameterGrid(space))) if all_lists else self.n_candidates
+        return list(ParameterSampler(space, n_iter=n_candidates, random_state=self.random_state))
+
+    def _resources(self, n_candidates):
+        """Budget per rung, e.g. [18, 55, 166, 500] for 36 candidates and factor 3."""
+        n_rungs = max(1, math.ceil(math.log(max(n_candidates, 1), self.factor)))
+        resources = [max(self.min_resource, self.max_resource // self.factor ** (n_rungs - 1 - i))
+                     for i in range(n_rungs)]
+        return sorted(set(resources))
+
+    def _preprocess_fold(self, X, y, train_index, val_index):
+        X_train, X_val = X.iloc[train_index], X.iloc[val_index]
+        if len(self.estimator.steps) > 1:
+            preprocessing = clone(Pipeline(self.estimator.steps[:-1])).fit(X_train, y.iloc[train_index])
+            X_train, X_val = preprocessing.transform(X_train), preprocessing.transform(X_val)
+        return X_train, y.iloc[train_index], X_val, y.iloc[val_index]
+
+    def _fingerprint(self, data):
+        """Identifies the data and search setup; part of every trial key."""
+        return content_key(data, repr(self.estimator), self.cv, self.random_state)
+
+    def fit(self, X, y):
+        start = perf_counter()
+        step_name, model = self.estimator.steps[-1]
+        prefix = f"{step_name}__"
+        resource_param = self.resource[len(prefix):]
+
+        candidates = self._candidates()
+        resources = self._resources(len(candidates))
+        splits = list(KFold(self.cv, shuffle=True, random_state=self.random_state).split(X))
+        data = data_fingerprint(X, y.to_frame())
+        fingerprint = self._fingerprint(data)
+        if self.trial_store is not None:
+            self.trial_store.start(data)
+        print(f"Successive halving: {len(candidates)} candidates, {self.cv} folds, "
+              f"{resource_param} rungs {resources}.")
+
+        folds = {}  # Preprocessed lazily: not needed for folds fully answered by the trial store
+        forests = {}
+        alive = list(range(len(candidates)))
+        self.cv_results_ = []
+        self.n_fits_ = 0
+        self.n_reused_ = 0
+        self.completed_ = True
+        best_scores, best_budget = None, None
+        for rung, budget in enumerate(resources):
+            scores = {}
+            for c in alive:
+                fold_mae = []
+                for f, (train_index, val_index) in enumerate(splits):
+                    key = TrialStore.make_key(candidates[c], budget, f, fingerprint)
+                    trial = self.trial_store.get(key) if self.trial_store is not None else None
+                    if trial is not None:
+                        fold_mae.append(trial['mae'])
+                        self.n_reused_ += 1
+                        continue
+                    if self.time_budget is not None and perf_counter() - start > self.time_budget:
+                        self.completed_ = False
+                        break
+
+                    if f not in folds:
+                        folds[f] = self._preprocess_fold(X, y, train_index, val_index)
+                    X_train, y_train, X_val, y_val = folds[f]
+                    # A forest missing here (e.g. lower rungs came from the store) is fitted from
+                    # scratch; with a fixed random_state that equals growing it with warm_start
+                    forest = forests.get((c, f))
+                    if forest is None:
+                        params = {key[len(prefix):]: value for key, value in candidates[c].items()}
+                        forest = clone(model).set_params(**params, warm_start=True)
+                        if 'n_jobs' in forest.get_params():
+                            forest.set_params(n_jobs=self.n_jobs)
+                        forests[(c, f)] = forest
+                    forest.set_params(**{resource_param: budget}).fit(X_train, y_train)
+                    mae = mean_absolute_error(y_val, forest.predict(X_val))
+                    fold_mae.append(mae)
+                    self.n_fits_ += 1
+                    if self.trial_store is not None:
+                        self.trial_store.add(key, data, params=candidates[c], resource=budget, fold=f, mae=mae)
+                if not self.completed_:
+                    break
+                scores[c] = float(np.mean(fold_mae))
+                self.cv_results_.append({"params": candidates[c], "rung": rung, self.resource: budget,
+                                         "fold_mae": fold_mae, "mean_mae": scores[c]})
+            if not self.completed_:
+                print(f"Time budget of {self.time_budget}s exhausted in rung {rung} ({resource_param}={budget}).")
+                break
+
+            best_scores, best_budget = scores, budget
+            alive = sorted(alive, key=scores.get)
+            if rung < len(resources) - 1:
+                survivors = max(1, math.ceil(len(alive) / self.factor))
+                for c in alive[survivors:]:
+                    for f in range(len(splits)):
+                        forests.pop((c, f), None)
+                alive = alive[:survivors]
+            print(f"Rung {rung} ({resource_param}={budget}): best MAE {scores[alive[0]]:.2f}, "
+                  f"{len(alive)} candidate(s) kept.")
+
+        if best_scores is None:
+            raise TimeoutError("Time budget ran out before the first rung was evaluated; "
+                               "rerun to resume from the trial store.")
+        best = min(best_scores, key=best_scores.get)
+        self.best_params_ = {**candidates[best], self.resource: best_budget}
+        self.best_score_ = -best_scores[best]
+        print(f"{self.n_fits_} fits, {self.n_reused_} fold scores reused from the trial store.")
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        self.fit_seconds_ = perf_counter() - start
+        return self
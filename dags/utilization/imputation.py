@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.decomposition import PCA
+from sklearn.neighbors import NearestNeighbors
+
+# ================== Constants ==================
+MAX_REFERENCE_ROWS = 50_000
+CHUNK_SIZE = 10_000
+# Trees degrade to brute force in the ~45-dimensional one-hot space, so the
+# index is built on its first principal components (approximate search)
+N_COMPONENTS = 12
+# Neighbours fetched per query = n_neighbors * DONOR_FACTOR, so that each
+# missing cell still finds n_neighbors donors that have the value observed
+DONOR_FACTOR = 4
+
+# ================== KNN Imputer ==================
+
+class KNNFeatureImputer(BaseEstimator, TransformerMixin):
+    """KNN imputation for mixed numeric/categorical frames, fitted once.
+
+    `fit` stores medians/modes, the category lists and min-max ranges, and
+    builds a kd/ball-tree over (at most `max_reference_rows`) reference rows
+    encoded as scaled numerics plus one-hot categoricals and projected onto
+    `n_components` principal components (None = exact search in the full
+    space). `transform` queries
+    that index for the rows that have missing values only, `chunk_size` rows
+    at a time on `n_jobs` cores, and fills every missing cell from the first
+    `n_neighbors` donors that have it observed: mean for numeric columns, most
+    frequent value for categorical ones (median/mode if there is no donor).
+
+    Being a regular scikit-learn transformer, it is pickled with the model
+    pipeline so inference imputes exactly like training. It is slower than
+    the median fill it replaced (see benchmarks/bench_imputation.py), in
+    exchange for far more accurate imputations.
+    """
+
+    def __init__(self, num_cols, cat_cols, n_neighbors=5, max_reference_rows=MAX_REFERENCE_ROWS,
+                 n_components=N_COMPONENTS, algorithm='kd_tree', chunk_size=CHUNK_SIZE, n_jobs=-1,
+                 random_state=0):
+        self.num_cols = num_cols
+        self.cat_cols = cat_cols
+        self.n_neighbors = n_neighbors
+        self.max_reference_rows = max_reference_rows
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+
+        self.medians_ = X[self.num_cols].median().fillna(0).to_numpy(dtype=float)
+        self.categories_ = [np.sort(X[col].dropna().astype(str).unique()) for col in self.cat_cols]
+        self.modes_ = [X[col].dropna().astype(str).mode().iat[0] if len(cats) else None
+                       for col, cats in zip(self.cat_cols, self.categories_)]
+
+        numeric = self._numeric_values(X)
+        filled = np.where(np.isnan(numeric), self.medians_, numeric)
+        self.min_ = filled.min(axis=0) if len(filled) else np.zeros(len(self.num_cols))
+        value_range = (filled.max(axis=0) - self.min_) if len(filled) else np.ones(len(self.num_cols))
+        self.scale_ = np.where(value_range > 0, value_range, 1.0)
+
+        # Reference (donor) rows, sampled if the training set is large
+        if len(X) > self.max_reference_rows:
+            rng = np.random.default_rng(self.random_state)
+            positions = np.sort(rng.choice(len(X), self.max_reference_rows, replace=False))
+            reference = X.iloc[positions]
+        else:
+            reference = X
+        self.reference_num_ = self._numeric_values(reference)
+        self.reference_cat_ = self._category_codes(reference)
+
+        encoded = self._encode(self.reference_num_, self.reference_cat_)
+        self.projection_ = None
+        if self.n_components is not None and self.n_components < min(encoded.shape):
+            self.projection_ = PCA(self.n_components, random_state=self.random_state).fit(encoded)
+            encoded = self.projection_.transform(encoded)
+
+        n_query = min(self.n_neighbors * DONOR_FACTOR, len(reference))
+        self.index_ = NearestNeighbors(n_neighbors=n_query, algorithm=self.algorithm, n_jobs=self.n_jobs)
+        self.index_.fit(encoded)
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X).copy()
+        numeric = self._numeric_values(X)
+        codes = self._category_codes(X)
+        missing_num = np.isnan(numeric)
+        unknown_cat = (codes < 0) & X[self.cat_cols].notna().to_numpy()
+        missing_cat = (codes < 0) & ~unknown_cat
+        rows = np.flatnonzero(missing_num.any(axis=1) | missing_cat.any(axis=1))
+
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            encoded = self._encode(numeric[chunk], codes[chunk])
+            if self.projection_ is not None:
+                encoded = self.projection_.transform(encoded)
+            _, neighbors = self.index_.kneighbors(encoded)
+            numeric[chunk] = self._impute_numeric(numeric[chunk], neighbors)
+            codes[chunk] = self._impute_categorical(codes[chunk], neighbors)
+        codes[unknown_cat] = -1
+
+        for j, col in enumerate(self.num_cols):
+            X[col] = numeric[:, j]
+        for j, col in enumerate(self.cat_cols):
+            # Categories never seen in fit are kept as they were
+            known = codes[:, j] >= 0
+            values = X[col].to_numpy(dtype=object, na_value=None).copy()
+            values[known] = self.categories_[j][codes[known, j]]
+            X[col] = values
+        return X
+
+    def get_feature_names_out(self, input_features=None):
+        return self.feature_names_in_
+
+    # ================== Encoding ==================
+
+    def _numeric_values(self, X):
+        return X[self.num_cols].to_numpy(dtype=float, na_value=np.nan)
+
+    def _category_codes(self, X):
+        """Integer codes per categorical column, -1 for missing or unknown values."""
+        codes = np.full((len(X), len(self.cat_cols)), -1, dtype=np.int64)
+        for j, (col, categories) in enumerate(zip(self.cat_cols, self.categories_)):
+            values = X[col]
+            observed = values.notna().to_numpy()
+            codes[observed, j] = pd.Categorical(values[observed].astype(str), categories=categories).codes
+        return codes
+
+    def _encode(self, numeric, codes):
+        """Distance space: min-max scaled numerics (median-filled) + one-hot categoricals.
+
+        One-hot blocks are scaled by 1/sqrt(2) so a category mismatch adds 1 to
+        the squared distance, like a full-range numeric difference. Missing
+        categories are encoded as the mode.
+        """
+        filled = np.where(np.isnan(numeric), self.medians_, numeric)
+        blocks = [(filled - self.min_) / self.scale_]
+        for j, categories in enumerate(self.categories_):
+            if not len(categories):
+                continue
+            column = codes[:, j]
+            column = np.where(column >= 0, column, np.searchsorted(categories, self.modes_[j]))
+            one_hot = np.zeros((len(column), len(categories)))
+            one_hot[np.arange(len(column)), column] = 1 / np.sqrt(2)
+            blocks.append(one_hot)
+        return np.hstack(blocks)
+
+    # ================== Donor Aggregation ==================
+
+    def _first_donors(self, observed):
+        """Mask of the first `n_neighbors` observed donors (neighbors are sorted by distance)."""
+        return observed & (np.cumsum(observed, axis=1) <= self.n_neighbors)
+
+    def _impute_numeric(self, numeric, neighbors):
+        for j in range(numeric.shape[1]):
+            missing = np.isnan(numeric[:, j])
+            if not missing.any():
+                continue
+            donors = self.reference_num_[neighbors[missing], j]
+            use = self._first_donors(~np.isnan(donors))
+            counts = use.sum(axis=1)
+            totals = np.where(use, donors, 0.0).sum(axis=1)
+            numeric[missing, j] = np.where(counts > 0, totals / np.maximum(counts, 1), self.medians_[j])
+        return numeric
+
+    def _impute_categorical(self, codes, neighbors):
+        for j, categories in enumerate(self.categories_):
+            missing = codes[:, j] < 0
+            if not missing.any() or not len(categories):
+                continue
+            donors = self.reference_cat_[neighbors[missing], j]
+            use = self._first_donors(donors >= 0)
+            votes = np.stack([(use & (donors == c)).sum(axis=1) for c in range(len(categories))], axis=1)
+            mode_code = np.searchsorted(categories, self.modes_[j])
+            codes[missing, j] = np.where(votes.max(axis=1) > 0, votes.argmax(axis=1), mode_code)
+        return codes
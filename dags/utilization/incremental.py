@@ -0,0 +1,75 @@
+import os
+from contextlib import contextmanager
+from time import time
+
+import pandas as pd
+import psycopg2 as db
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, the index is only written by one task at a time there
+    fcntl = None
+
+# ================== Constants ==================
+SCRAPE_INDEX_FILE = '/opt/airflow/data/scrape_index.csv'
+MAX_AGE_DAYS = 90
+
+# ================== Scrape Index ==================
+
+def load_scrape_index(path: str = SCRAPE_INDEX_FILE) -> dict:
+    """Return {url: last_scraped (epoch seconds)} from the local scrape index."""
+    if not os.path.exists(path):
+        return {}
+    index = pd.read_csv(path)
+    return dict(zip(index['url'], index['last_scraped']))
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive lock on `path`.lock, so the scraping tasks of all city partitions can update `path`."""
+    with open(f"{path}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def update_scrape_index(urls, path: str = SCRAPE_INDEX_FILE, scraped_at: float = None):
+    """Mark `urls` as scraped at `scraped_at` (default: now) in the local index."""
+    scraped_at = time() if scraped_at is None else scraped_at
+    with locked(path):
+        index = load_scrape_index(path)
+        index.update({url: scraped_at for url in urls})
+        tmp_path = f"{path}.tmp"
+        pd.DataFrame({'url': list(index), 'last_scraped': list(index.values())}).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+def fetch_known_urls(conn_string: str) -> set:
+    """Return the set of listing URLs already stored in `house_prediction_table`."""
+    conn = db.connect(conn_string)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT url FROM house_prediction_table WHERE url IS NOT NULL;")
+            return {row[0] for row in cursor}
+    finally:
+        conn.close()
+
+# ================== Delta Selection ==================
+
+def select_links_to_process(urls, index: dict, known_urls: set = frozenset(),
+                            max_age_days: float = MAX_AGE_DAYS, now: float = None):
+    """Split discovered `urls` into (new, stale, fresh) lists.
+
+    A URL is *new* if it is neither in the scrape index nor in the database, and
+    *stale* if its last scrape is older than `max_age_days`. URLs only known from
+    the database (no timestamp yet) count as fresh.
+    """
+    now = time() if now is None else now
+    max_age_seconds = max_age_days * 24 * 60 * 60
+    new, stale, fresh = [], [], []
+    for url in urls:
+        last_scraped = index.get(url)
+        if last_scraped is None:
+            (fresh if url in known_urls else new).append(url)
+        elif now - last_scraped > max_age_seconds:
+            stale.append(url)
+        else:
+            fresh.append(url)
+    return new, stale, fresh
@@ -0,0 +1,410 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+from contextlib import ContextDecorator, contextmanager
+from datetime import datetime, timezone
+from time import perf_counter, process_time
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows: no peak RSS, and the Prometheus file is updated without a lock
+    fcntl = resource = None
+
+# ================== Constants ==================
+METRICS_FILE = '/opt/airflow/data/metrics/metrics.jsonl'
+PROMETHEUS_FILE = '/opt/airflow/data/metrics/pricewise.prom'
+PROFILE_DIR = '/opt/airflow/data/metrics/profiles'
+# Opt-in profiling: stage names separated by commas ("*" = every stage), and the
+# profiler to use ("cprofile" or "py-spy"), e.g. set in the Airflow worker's environment
+PROFILE_ENV = 'PRICEWISE_PROFILE'
+PROFILER_ENV = 'PRICEWISE_PROFILER'
+METRIC_PREFIX = 'pricewise'
+# Buffered stages (see `buffer_stages`) reach the Prometheus file this long after their first run
+FLUSH_INTERVAL_SECONDS = 10.0
+# Peak RSS is reported in KiB on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_lock = threading.Lock()
+# Stage running in this thread, and the last one started in the process: worker
+# threads (e.g. the scraping pool) record into the process's stage, while the
+# app's sessions, each in its own thread, record into their own
+_local = threading.local()
+_process_run = None
+_labels = {}  # Added to every stage of the process, see `labels`
+# Stages kept in memory until the next flush, and their pending Prometheus samples
+_buffered_stages = set()
+_pending_gauges, _pending_counters = {}, {}
+_flush_interval = FLUSH_INTERVAL_SECONDS
+
+# ================== Configuration ==================
+
+def configure(metrics_file=None, prometheus_file=None, profile_dir=None):
+    """Change where metrics and profiles are written (e.g. `data/` when running outside Airflow)."""
+    global METRICS_FILE, PROMETHEUS_FILE, PROFILE_DIR
+    METRICS_FILE = metrics_file or METRICS_FILE
+    PROMETHEUS_FILE = prometheus_file or PROMETHEUS_FILE
+    PROFILE_DIR = profile_dir or PROFILE_DIR
+
+def buffer_stages(*names, interval=FLUSH_INTERVAL_SECONDS):
+    """Keep the metrics of frequent stages (one per prediction) in memory instead of writing every run.
+
+    Runs of these stages are not appended to METRICS_FILE; their counters and
+    last-run gauges are merged into PROMETHEUS_FILE at most `interval`
+    seconds after a run, on `flush` and when the process exits.
+    """
+    global _flush_interval
+    if not _buffered_stages:
+        atexit.register(flush)
+    _buffered_stages.update(names)
+    _flush_interval = interval
+
+@contextmanager
+def labels(**extra_labels):
+    """Add labels (None values are ignored) to the stages started in this process, e.g. a task's partition."""
+    global _labels
+    previous = _labels
+    _labels = {**previous, **{key: value for key, value in extra_labels.items() if value is not None}}
+    try:
+        yield
+    finally:
+        _labels = previous
+
+def profiler_for(name):
+    """The profiler requested for stage `name` through PRICEWISE_PROFILE, or None."""
+    stages = {s.strip() for s in os.environ.get(PROFILE_ENV, '').split(',') if s.strip()}
+    if name not in stages and '*' not in stages:
+        return None
+    return os.environ.get(PROFILER_ENV, 'cprofile').lower()
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT / 1024 ** 2
+
+def current_run():
+    """The StageRun that records the calling thread's metrics, or None outside a stage."""
+    return getattr(_local, 'run', None) or _process_run
+
+# ================== Stage Runs ==================
+
+class StageRun:
+    """Spans, counters and external calls recorded during one run of a stage."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self.spans = {}  # span -> {count, seconds, max_seconds}
+        self.calls = {}  # service -> {count, errors, latencies}
+        self._lock = threading.Lock()
+
+    def add(self, counter, value):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add_span(self, name, seconds):
+        with self._lock:
+            span = self.spans.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            span["count"] += 1
+            span["seconds"] += seconds
+            span["max_seconds"] = max(span["max_seconds"], seconds)
+
+    def add_call(self, service, seconds, failed):
+        with self._lock:
+            call = self.calls.setdefault(service, {"count": 0, "errors": 0, "latencies": []})
+            call["count"] += 1
+            call["errors"] += int(failed)
+            call["latencies"].append(seconds)
+
+    def call_summary(self) -> dict:
+        """Count, errors, total seconds and latency percentiles per external service."""
+        summary = {}
+        for service, call in self.calls.items():
+            latencies = sorted(call["latencies"])
+            summary[service] = {
+                "count": call["count"],
+                "errors": call["errors"],
+                "seconds": sum(latencies),
+                "p50_seconds": latencies[len(latencies) // 2],
+                "p95_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max_seconds": latencies[-1],
+            }
+        return summary
+
+class stage(ContextDecorator):
+    """Record one run of a pipeline stage, as a decorator or a context manager.
+
+    Wall and CPU time, peak RSS, the counters, spans and external calls recorded
+    while the stage runs are appended as one JSON line to METRICS_FILE and
+    merged into the Prometheus text file PROMETHEUS_FILE (for node_exporter's
+    textfile collector), whether the stage succeeds or raises; stages named in
+    `buffer_stages` are aggregated in memory instead. A stage entered
+    while another one runs in the same thread is recorded as a span of the outer one.
+    Metrics are best effort: a file that can't be written never fails the stage.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # Every call of a decorated function gets its own context
+        return type(self)(self.name, **self.labels)
+
+    def __enter__(self):
+        global _process_run
+        self._outer = getattr(_local, 'run', None)
+        if self._outer is not None:
+            self._start = perf_counter()
+            return self._outer
+        _local.run = _process_run = self.run = StageRun(self.name, {**_labels, **self.labels})
+        self._started_at = datetime.now(timezone.utc)
+        self._profiler = start_profiler(self.name, profiler_for(self.name))
+        self._cpu_start = process_time()
+        self._start = perf_counter()
+        return self.run
+
+    def __exit__(self, exc_type, exc, tb):
+        global _process_run
+        seconds = perf_counter() - self._start
+        if self._outer is not None:
+            self._outer.add_span(self.name, seconds)
+            return False
+        _local.run = None
+        if _process_run is self.run:
+            _process_run = None
+        profile_file = stop_profiler(self._profiler)
+        record = {
+            "stage": self.name,
+            "labels": self.run.labels,
+            "started_at": self._started_at.isoformat(),
+            "status": "ok" if exc_type is None else "error",
+            "error": None if exc_type is None else f"{exc_type.__name__}: {exc}",
+            "seconds": seconds,
+            "cpu_seconds": process_time() - self._cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+            "counters": self.run.counters,
+            "spans": self.run.spans,
+            "external_calls": self.run.call_summary(),
+            "profile": profile_file,
+        }
+        try:
+            if self.name in _buffered_stages:
+                buffer_record(record)
+            else:
+                write_record(record)
+        except OSError as e:
+            print(f"Metrics of stage {self.name} not written: {e}")
+        return False
+
+@contextmanager
+def span(name):
+    """Time a block of the running stage; nothing is recorded outside a stage."""
+    run = current_run()
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        if run is not None:
+            run.add_span(name, perf_counter() - start)
+
+@contextmanager
+def external_call(service):
+    """Time one call to an external service (Zyte, OpenAI, PostgreSQL...); failed calls count as errors."""
+    run = current_run()
+    start = perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        if run is not None:
+            run.add_call(service, perf_counter() - start, failed)
+
+def add(counter, value=1):
+    """Add `value` to a counter of the running stage (rows_in, rows_out, bytes_written...)."""
+    run = current_run()
+    if run is not None:
+        run.add(counter, value)
+
+def add_file_size(counter, path):
+    """Add the size of a file, or of all files in a directory, to a counter (e.g. bytes_read)."""
+    if os.path.isdir(path):
+        add(counter, sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, files in os.walk(path) for name in files))
+    elif os.path.exists(path):
+        add(counter, os.path.getsize(path))
+
+def add_token_usage(usage):
+    """Add the token counts of an OpenAI completion's `usage` to the running stage."""
+    if usage is None:
+        return
+    add("tokens_prompt", usage.prompt_tokens or 0)
+    add("tokens_completion", usage.completion_tokens or 0)
+
+# ================== Profiling ==================
+
+def start_profiler(name, profiler):
+    """Start cProfile (calling thread only) or a py-spy process sampling every thread."""
+    if profiler is None:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{name}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}")
+    if profiler == 'py-spy':
+        if shutil.which('py-spy') is None:
+            print("py-spy is not installed; profiling with cProfile instead.")
+        else:
+            path = f"{stem}.svg"
+            process = subprocess.Popen(['py-spy', 'record', '--pid', str(os.getpid()), '--output', path],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return 'py-spy', process, path
+    profile = cProfile.Profile()
+    profile.enable()
+    return 'cprofile', profile, f"{stem}.prof"
+
+def stop_profiler(started):
+    """Stop a profiler from `start_profiler`; returns the file it wrote, or None."""
+    if started is None:
+        return None
+    kind, profiler, path = started
+    if kind == 'py-spy':
+        profiler.send_signal(signal.SIGINT)  # py-spy writes the flame graph when interrupted
+        profiler.wait()
+    else:
+        profiler.disable()
+        profiler.dump_stats(path)
+    return path
+
+# ================== Output ==================
+
+def write_record(record):
+    """Append a stage record to METRICS_FILE and merge it into PROMETHEUS_FILE."""
+    with _lock:
+        os.makedirs(os.path.dirname(METRICS_FILE) or '.', exist_ok=True)
+        with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+        update_prometheus_file(record, PROMETHEUS_FILE)
+
+def buffer_record(record):
+    """Add a stage record to the pending samples; the first one after a flush schedules the next flush."""
+    gauges, counters = prometheus_samples(record)
+    with _lock:
+        schedule = not _pending_gauges and not _pending_counters
+        _pending_gauges.update(gauges)
+        for key, value in counters.items():
+            _pending_counters[key] = _pending_counters.get(key, 0) + value
+    if schedule:
+        timer = threading.Timer(_flush_interval, _flush_quietly)
+        timer.daemon = True
+        timer.start()
+
+def flush():
+    """Merge the pending samples of buffered stages into PROMETHEUS_FILE."""
+    with _lock:
+        if not _pending_gauges and not _pending_counters:
+            return
+        gauges, counters = dict(_pending_gauges), dict(_pending_counters)
+        _pending_gauges.clear()
+        _pending_counters.clear()
+        merge_prometheus_samples(gauges, counters, PROMETHEUS_FILE)
+
+def _flush_quietly():
+    try:
+        flush()
+    except OSError as e:
+        print(f"Buffered metrics not written: {e}")
+
+def label_text(labels: dict) -> str:
+    return _label_text(tuple((key, str(value)) for key, value in labels.items()))
+
+# Cached: buffered stages render the same few label sets and names on every prediction
+@functools.lru_cache(maxsize=1024)
+def _label_text(items: tuple) -> str:
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped))
+
+@functools.lru_cache(maxsize=1024)
+def metric_name(*parts) -> str:
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', '_'.join((METRIC_PREFIX,) + parts))
+
+def prometheus_samples(record) -> tuple:
+    """(gauges, counters) of a stage record as {(metric, label text): value}.
+
+    Gauges describe the last run of the stage; counters (`_total`) add up over runs.
+    """
+    stage_text = label_text({"stage": record["stage"], **record["labels"]})
+    gauges, counters = {}, {}
+
+    def sample(samples, metric, value, **labels):
+        key = (metric_name(metric), f"{stage_text},{label_text(labels)}" if labels else stage_text)
+        samples[key] = samples.get(key, 0) + value
+
+    sample(gauges, 'stage_last_seconds', record["seconds"])
+    sample(gauges, 'stage_last_cpu_seconds', record["cpu_seconds"])
+    sample(gauges, 'stage_last_success', int(record["status"] == "ok"))
+    sample(gauges, 'stage_last_timestamp_seconds',
+           datetime.fromisoformat(record["started_at"]).timestamp() + record["seconds"])
+    if record["peak_rss_mb"] is not None:
+        sample(gauges, 'stage_last_peak_rss_bytes', record["peak_rss_mb"] * 1024 ** 2)
+    sample(counters, 'stage_runs_total', 1, status=record["status"])
+    sample(counters, 'stage_seconds_total', record["seconds"])
+    for counter, value in record["counters"].items():
+        sample(gauges, 'stage_last_count', value, counter=counter)
+        sample(counters, 'stage_count_total', value, counter=counter)
+    for name, span_stats in record["spans"].items():
+        sample(counters, 'span_seconds_total', span_stats["seconds"], span=name)
+        sample(counters, 'span_count_total', span_stats["count"], span=name)
+    for service, call in record["external_calls"].items():
+        sample(counters, 'external_calls_total', call["count"], service=service)
+        sample(counters, 'external_call_errors_total', call["errors"], service=service)
+        sample(counters, 'external_call_seconds_total', call["seconds"], service=service)
+        sample(gauges, 'external_call_last_p95_seconds', call["p95_seconds"], service=service)
+    return gauges, counters
+
+def read_prometheus_file(path) -> dict:
+    """{(metric, label text): value} of a text file written by `update_prometheus_file`."""
+    samples = {}
+    if not os.path.exists(path):
+        return samples
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$', line.strip())
+            if match:
+                samples[(match.group(1), match.group(2) or '')] = float(match.group(3))
+    return samples
+
+def update_prometheus_file(record, path):
+    """Merge a stage record into the Prometheus text file, replacing it atomically."""
+    merge_prometheus_samples(*prometheus_samples(record), path)
+
+def merge_prometheus_samples(gauges, counters, path):
+    """Replace the gauges and add the counters in the Prometheus text file, atomically."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Stages of parallel tasks share the file
+        samples = read_prometheus_file(path)
+        samples.update(gauges)
+        for key, value in counters.items():
+            samples[key] = samples.get(key, 0) + value
+
+        lines = []
+        for metric in sorted({metric for metric, _ in samples}):
+            lines.append(f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}")
+            for (name, labels), value in sorted(samples.items()):
+                if name == metric:
+                    lines.append(f"{name}{{{labels}}} {value:.17g}" if labels else f"{name} {value:.17g}")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
@@ -0,0 +1,169 @@
+import io
+import os
+from time import perf_counter
+
+import pandas as pd
+import psycopg2 as db
+from psycopg2 import sql
+from utilization import instrumentation
+from utilization.cleaning_data import PARQUET_FILE
+from utilization.fetch_from_postgresql import CONN_STRING, TABLE_NAME
+from utilization.storage import read_table
+
+# ================== Constants ==================
+INPUT_FILE = PARQUET_FILE
+BATCH_SIZE = 20_000
+TABLE_COLUMNS = [
+    'url', 'title', 'description', 'price_mio', 'address', 'city', 'land_size_m2', 'building_size_m2',
+    'bedroom', 'bathroom', 'garage', 'carport', 'property_type', 'certificate', 'voltage_watt',
+    'maid_bedroom', 'maid_bathroom', 'kitchen', 'dining_room', 'living_room', 'furniture',
+    'building_material', 'floor_material', 'floor_level', 'house_facing', 'concept_and_style',
+    'view', 'internet_access', 'road_width', 'year_built', 'year_renovated', 'water_source',
+    'corner_property', 'property_condition', 'ad_type', 'ad_id'
+]
+
+# Columns and indexes the upsert relies on; idempotent so they also migrate
+# tables created before row_hash/updated_at existed
+SCHEMA_STATEMENTS = [
+    "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_hash BIGINT;",
+    "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT LOCALTIMESTAMP;",
+    "CREATE INDEX IF NOT EXISTS {updated_at_index} ON {table} (updated_at);",
+]
+# ON CONFLICT (url) needs a unique index, which cannot be built while a URL
+# appears twice: keep the copy with the latest updated_at first. Rows that
+# predate updated_at all got the same backfilled value; among those the
+# physical position (ctid) decides, which is arbitrary but deterministic
+DEDUPLICATE_URLS = """
+    DELETE FROM {table} t USING {table} d
+    WHERE t.url = d.url
+      AND (COALESCE(t.updated_at, '-infinity'), t.ctid) < (COALESCE(d.updated_at, '-infinity'), d.ctid);"""
+CREATE_URL_INDEX = "CREATE UNIQUE INDEX {url_index} ON {table} (url);"
+# Any single-column unique index on url will do (e.g. the PRIMARY KEY from create_db.sql)
+HAS_URL_INDEX = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = %s::regclass AND i.indisunique AND i.indnatts = 1 AND a.attname = 'url'
+    );"""
+
+# ================== Helper Functions ==================
+
+def ensure_schema(conn, table=TABLE_NAME):
+    """Add the row_hash/updated_at columns and the url/updated_at indexes if missing."""
+    names = {
+        'table': sql.Identifier(table),
+        'url_index': sql.Identifier(f"{table}_url_key"),
+        'updated_at_index': sql.Identifier(f"{table}_updated_at_idx"),
+    }
+    with conn.cursor() as cursor:
+        for statement in SCHEMA_STATEMENTS:
+            cursor.execute(sql.SQL(statement).format(**names))
+        cursor.execute(HAS_URL_INDEX, (table,))
+        if not cursor.fetchone()[0]:
+            cursor.execute(sql.SQL(DEDUPLICATE_URLS).format(**names))
+            print(f"Removed {cursor.rowcount} duplicate URLs from {table}.")
+            cursor.execute(sql.SQL(CREATE_URL_INDEX).format(**names))
+    conn.commit()
+
+def compute_row_hashes(df: pd.DataFrame) -> pd.Series:
+    """64-bit content hash of every row over TABLE_COLUMNS (as signed BIGINT)."""
+    return pd.util.hash_pandas_object(df[TABLE_COLUMNS], index=False).astype('int64')
+
+def fetch_row_hashes(conn, table=TABLE_NAME) -> dict:
+    """Return {url: row_hash} for every row already stored in `table`."""
+    with conn.cursor(name='fetch_row_hashes') as cursor:
+        cursor.itersize = 100_000
+        cursor.execute(sql.SQL("SELECT url, row_hash FROM {} WHERE url IS NOT NULL;").format(sql.Identifier(table)))
+        return {url: row_hash for url, row_hash in cursor}
+
+def split_changes(df: pd.DataFrame, existing: dict):
+    """Split rows into (new, changed) frames plus the number of unchanged rows."""
+    stored = df['url'].map(existing)
+    is_new = ~df['url'].isin(existing.keys())
+    is_changed = ~is_new & (stored != df['row_hash'])
+    return df[is_new], df[is_changed], int((~is_new & ~is_changed).sum())
+
+def build_upsert(table=TABLE_NAME, staging='load_to_postgresql_staging'):
+    """`INSERT ... SELECT FROM staging ON CONFLICT (url) DO UPDATE` touching changed rows only."""
+    columns = TABLE_COLUMNS + ['row_hash']
+    updates = [col for col in columns if col != 'url']
+    return sql.SQL(
+        "INSERT INTO {table} ({columns}, updated_at) "
+        "SELECT {columns}, LOCALTIMESTAMP FROM {staging} "
+        "ON CONFLICT (url) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at "
+        "WHERE {table}.row_hash IS DISTINCT FROM EXCLUDED.row_hash;"
+    ).format(
+        table=sql.Identifier(table),
+        staging=sql.Identifier(staging),
+        columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+        updates=sql.SQL(', ').join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col)) for col in updates
+        ),
+    )
+
+def copy_batches(conn, df: pd.DataFrame, table=TABLE_NAME, batch_size=BATCH_SIZE,
+                 staging='load_to_postgresql_staging'):
+    """COPY `df` into a temp staging table from an in-memory CSV and upsert it, one batch per transaction."""
+    columns = TABLE_COLUMNS + ['row_hash']
+    upsert = build_upsert(table, staging)
+    copy = sql.SQL("COPY {} ({}) FROM STDIN WITH CSV").format(
+        sql.Identifier(staging), sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL(
+            "CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS);"
+        ).format(sql.Identifier(staging), sql.Identifier(table)))
+        for start in range(0, len(df), batch_size):
+            buffer = io.StringIO()
+            df[columns].iloc[start:start + batch_size].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cursor.execute(sql.SQL("TRUNCATE {};").format(sql.Identifier(staging)))
+            cursor.copy_expert(copy, buffer)
+            cursor.execute(upsert)
+            conn.commit()
+
+# ================== Main Load Function ==================
+
+@instrumentation.stage("update_table_db")
+def LoadToPostgresql(input_file=INPUT_FILE, batch_size=BATCH_SIZE, conn_string=CONN_STRING, table=TABLE_NAME):
+    """Upsert the cleaned listings into `house_prediction_table`, skipping unchanged rows.
+
+    Every row gets a content hash; only URLs that are new or whose hash differs
+    from the stored one are COPYed (in `batch_size` batches) and upserted.
+    Returns {inserted, updated, skipped, seconds, rows_per_second}.
+    """
+    start = perf_counter()
+    instrumentation.add_file_size("bytes_read", input_file)
+    df = read_table(input_file, columns=TABLE_COLUMNS)
+    df = df[df['url'].notna()].drop_duplicates('url', keep='last')
+    df['row_hash'] = compute_row_hashes(df)
+
+    conn = db.connect(conn_string)
+    try:
+        ensure_schema(conn, table)
+        with instrumentation.external_call("postgresql"):
+            existing = fetch_row_hashes(conn, table)
+        new_rows, changed_rows, skipped = split_changes(df, existing)
+        with instrumentation.external_call("postgresql"):
+            copy_batches(conn, pd.concat([new_rows, changed_rows]), table, batch_size)
+    finally:
+        conn.close()
+
+    elapsed = perf_counter() - start
+    report = {
+        "inserted": len(new_rows),
+        "updated": len(changed_rows),
+        "skipped": skipped,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(len(df) / max(elapsed, 1e-9)),
+    }
+    instrumentation.add("rows_in", len(df))
+    for key in ("inserted", "updated", "skipped"):
+        instrumentation.add(f"rows_{key}", report[key])
+    print(f"Loaded '{os.path.basename(input_file)}' into {table}: {report['inserted']} inserted, "
+          f"{report['updated']} updated, {report['skipped']} unchanged "
+          f"({report['rows_per_second']:,} rows/s).")
+    return report
+
+if __name__ == "__main__":
+    LoadToPostgresql()
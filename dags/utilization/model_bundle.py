@@ -0,0 +1,184 @@
+import hashlib
+import os
+import pickle
+import platform
+from datetime import datetime, timezone
+from time import perf_counter
+
+import pandas as pd
+import sklearn
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.pipeline import Pipeline
+from utilization.imputation import KNNFeatureImputer
+
+# ================== Constants ==================
+BUNDLE_FORMAT = 1
+
+# ================== Helper Functions ==================
+
+def data_fingerprint(*frames) -> str:
+    """Short content hash of the training data (index excluded)."""
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def category_vocabularies(pipeline, X: pd.DataFrame, cat_cols) -> dict:
+    """Categories the fitted pipeline knows, per categorical column."""
+    for step in getattr(pipeline, 'named_steps', {}).values():
+        if isinstance(step, KNNFeatureImputer):
+            return {col: list(categories) for col, categories in zip(step.cat_cols, step.categories_)}
+    return {col: sorted(X[col].dropna().astype(str).unique()) for col in cat_cols}
+
+# ================== Prediction Pipeline ==================
+
+class PredictionPipeline:
+    """Fitted preprocessing steps followed by a predict-only model.
+
+    For models that are converted rather than trained (compact forests, the
+    Keras/TFLite network): they have no `fit`, which scikit-learn's Pipeline
+    requires of its last step even to predict. Offers the parts of Pipeline
+    the bundles use: `steps`, `named_steps`, indexing a step and `predict`.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    @property
+    def named_steps(self) -> dict:
+        return dict(self.steps)
+
+    def __getitem__(self, index):
+        return self.steps[index][1]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def predict(self, X):
+        for _, step in self.steps[:-1]:
+            X = step.transform(X)
+        return self.steps[-1][1].predict(X)
+
+def prediction_pipeline(pipeline):
+    """`pipeline` as a PredictionPipeline if its last step can't be fitted (exports written as sklearn Pipelines)."""
+    if isinstance(pipeline, Pipeline) and not hasattr(pipeline.steps[-1][1], 'fit'):
+        return PredictionPipeline(pipeline.steps)
+    return pipeline
+
+# ================== Model Bundle ==================
+
+class ModelBundle:
+    """A fitted model pipeline together with everything needed to serve it.
+
+    Holds the fitted pipeline (imputer, ColumnTransformer, estimator), the
+    input schema (feature order and training dtypes), the category vocabulary
+    of every categorical column and the training metadata (time, row count,
+    data fingerprint, parameters, metrics, library versions). `predict`
+    accepts a DataFrame or a list of records and aligns it to the schema.
+    """
+
+    def __init__(self, pipeline, feature_columns, dtypes=None, categories=None, metadata=None, version=None):
+        self.format = BUNDLE_FORMAT
+        self.pipeline = pipeline
+        self.feature_columns = list(feature_columns)
+        self.dtypes = dtypes or {}
+        self.categories = categories or {}
+        self.metadata = metadata or {}
+        self.version = version or 'unversioned'
+
+    @classmethod
+    def from_training(cls, pipeline, X_train: pd.DataFrame, y_train: pd.Series, cat_cols, params=None, metrics=None):
+        """Bundle a pipeline fitted on (X_train, y_train)."""
+        trained_at = datetime.now(timezone.utc)
+        estimator = pipeline[-1] if isinstance(pipeline, (Pipeline, PredictionPipeline)) else pipeline
+        fingerprint = data_fingerprint(X_train, y_train.to_frame())
+        metadata = {
+            "trained_at": trained_at.isoformat(timespec='seconds'),
+            "n_train_rows": len(X_train),
+            "target": y_train.name,
+            "data_fingerprint": fingerprint,
+            "estimator": type(estimator).__name__,
+            "params": params or {},
+            "metrics": metrics or {},
+            "python_version": platform.python_version(),
+            "sklearn_version": sklearn.__version__,
+            "pandas_version": pd.__version__,
+        }
+        return cls(
+            pipeline,
+            feature_columns=X_train.columns,
+            dtypes={col: str(dtype) for col, dtype in X_train.dtypes.items()},
+            categories=category_vocabularies(pipeline, X_train, cat_cols),
+            metadata=metadata,
+            version=f"{trained_at:%Y%m%d%H%M%S}-{fingerprint[:8]}",
+        )
+
+    @classmethod
+    def from_legacy(cls, model):
+        """Wrap a bare pickled pipeline saved before bundles existed."""
+        feature_columns = list(getattr(model, 'feature_names_in_', []))
+        return cls(model, feature_columns, metadata={"legacy": True}, version='legacy')
+
+    @property
+    def handles_missing(self) -> bool:
+        """Whether the pipeline accepts missing values (legacy ones expect imputed input).
+
+        True with an imputer step or an estimator that supports NaN natively.
+        """
+        steps = getattr(self.pipeline, 'named_steps', {}).values()
+        return any(isinstance(step, (KNNFeatureImputer, HistGradientBoostingRegressor)) for step in steps)
+
+    def align(self, X) -> pd.DataFrame:
+        """Return X as a DataFrame with the training columns, in training order."""
+        X = X if isinstance(X, pd.DataFrame) else pd.DataFrame.from_records(X)
+        if not self.feature_columns:
+            return X
+        return X.reindex(columns=self.feature_columns)
+
+    def predict(self, X):
+        return self.pipeline.predict(self.align(X))
+
+    def sample_row(self) -> pd.DataFrame:
+        """A valid one-row input built from the schema: first known category, zero for numerics."""
+        return pd.DataFrame([{col: self.categories[col][0] if self.categories.get(col) else 0.0
+                              for col in self.feature_columns}])
+
+    def warm_up(self):
+        """Predict one row so lazily loaded runtimes (e.g. TensorFlow) are ready before the first request.
+
+        Returns the seconds it took, or None for legacy bundles without a schema.
+        """
+        if not self.feature_columns:
+            return None
+        start = perf_counter()
+        self.predict(self.sample_row())
+        return perf_counter() - start
+
+    def describe(self) -> dict:
+        """Version and metadata, e.g. for logs or the app sidebar."""
+        return {"version": self.version, **self.metadata}
+
+# ================== Save / Load ==================
+
+def save_bundle(bundle: ModelBundle, path: str):
+    """Pickle `bundle` atomically, so a running app never reads a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(bundle, file)
+    os.replace(tmp_path, path)
+
+def as_bundle(model) -> ModelBundle:
+    bundle = model if isinstance(model, ModelBundle) else ModelBundle.from_legacy(model)
+    bundle.pipeline = prediction_pipeline(bundle.pipeline)
+    return bundle
+
+def load_bundle(path: str) -> ModelBundle:
+    """Load a bundle; bare pipelines from older runs are wrapped as legacy bundles.
+
+    A directory is a compact export (see `utilization.compact_forest`).
+    """
+    if os.path.isdir(path):
+        from utilization.compact_forest import load_compact_bundle
+        return load_compact_bundle(path)
+    with open(path, 'rb') as file:
+        return as_bundle(pickle.load(file))
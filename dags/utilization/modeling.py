@@ -1,51 +1,75 @@
+from sklearn.base import clone
 from sklearn.metrics import r2_score, mean_absolute_error
 from sklearn.model_selection import RandomizedSearchCV
 import pickle
+from time import perf_counter
+from utilization import instrumentation
+from utilization.cache import skip_if_unchanged
+from utilization.feature_engineering import FE_DATA_FILE
+from utilization.halving_search import HalvingForestSearch
+from utilization.model_bundle import ModelBundle, save_bundle
+from utilization.trial_store import TRIALS_FILE, TrialStore
 
-def Modeling():
-    """Main function to train and evaluate the model."""
-    # Load Data
-    with open("/opt/airflow/data/data_after_fe.pkl", "rb") as f:
-        loaded_data = pickle.load(f)
-
-    X_train_imputed = loaded_data["X_train_imputed"]
-    X_test_imputed = loaded_data["X_test_imputed"]
-    y_train = loaded_data["y_train"]
-    y_test = loaded_data["y_test"]
-    pipe_rf = loaded_data['pipe_rf']
+BEST_MODEL_FILE = "/opt/airflow/data/best_model.pkl"
+BEST_MODEL_HGB_FILE = "/opt/airflow/data/best_model_hgb.pkl"
+# Leaves room for the final refit within the task's 20-minute execution_timeout
+# (the HistGradientBoosting search runs as its own task, see `ModelingHGB`)
+SEARCH_TIME_BUDGET = 15 * 60
 
-    # Parameter Grid
-    param_distributions = {
-        'model__n_estimators': [5, 10, 50, 100, 300, 500],
-        'model__max_depth': [10, 20, 30, None],
-        'model__min_samples_split': [2, 5, 10],
-        'model__min_samples_leaf': [1, 2, 4]
-    }
-
-    # RandomizedSearchCV
-    random_search = RandomizedSearchCV(
-        estimator=pipe_rf,
-        param_distributions=param_distributions,
-        n_iter=50,  # Reduce iterations for faster experimentation; adjust for final runs
-        cv=5,
-        scoring='neg_mean_absolute_error',
-        n_jobs=-1,
-        random_state=0  # Ensures reproducibility
-    )
+# Parameter Grid
+PARAM_DISTRIBUTIONS = {
+    'model__n_estimators': [5, 10, 50, 100, 300, 500],
+    'model__max_depth': [10, 20, 30, None],
+    'model__min_samples_split': [2, 5, 10],
+    'model__min_samples_leaf': [1, 2, 4]
+}
 
-    # Fit RandomizedSearchCV
-    random_search.fit(X_train_imputed, y_train)
+# Histogram gradient boosting: early stopping picks the number of iterations
+HGB_PARAM_DISTRIBUTIONS = {
+    'model__learning_rate': [0.03, 0.05, 0.1, 0.2],
+    'model__max_leaf_nodes': [15, 31, 63],
+    'model__min_samples_leaf': [5, 10, 20],
+    'model__l2_regularization': [0.0, 0.1, 1.0]
+}
 
-    # Display Best Results
-    print("Best Parameters:", random_search.best_params_)
-    print("Best Score (Negative MAE):", random_search.best_score_)
+def make_search(search_mode, pipe_rf, param_distributions=PARAM_DISTRIBUTIONS, trials_file=TRIALS_FILE,
+                time_budget=SEARCH_TIME_BUDGET):
+    """'halving': resumable successive halving over n_estimators, 'random': the original RandomizedSearchCV."""
+    if search_mode == 'halving':
+        return HalvingForestSearch(
+            estimator=pipe_rf,
+            param_distributions=param_distributions,
+            n_candidates=50,
+            cv=5,
+            max_resource=max(param_distributions['model__n_estimators']),
+            random_state=0,
+            trial_store=TrialStore(trials_file) if trials_file else None,
+            time_budget=time_budget
+        )
+    if search_mode == 'random':
+        return RandomizedSearchCV(
+            estimator=pipe_rf,
+            param_distributions=param_distributions,
+            n_iter=50,  # Reduce iterations for faster experimentation; adjust for final runs
+            cv=5,
+            scoring='neg_mean_absolute_error',
+            n_jobs=-1,
+            random_state=0  # Ensures reproducibility
+        )
+    raise ValueError(f"Unknown search mode: {search_mode!r}")
 
-    # Use the Best Model
-    best_model = random_search.best_estimator_
+def run_search(search_mode, pipe_rf, X_train, y_train, **search_options):
+    """Fit a search and return it with its wall time in seconds."""
+    search = make_search(search_mode, pipe_rf, **search_options)
+    start = perf_counter()
+    search.fit(X_train, y_train)
+    return search, perf_counter() - start
 
+def evaluate_model(model, X_train, y_train, X_test, y_test):
+    """Print and return train/test MAE and R2 of a fitted model."""
     # Predict train-set & test-set
-    y_train_predict = best_model.predict(X_train_imputed)
-    y_test_predict = best_model.predict(X_test_imputed)
+    y_train_predict = model.predict(X_train)
+    y_test_predict = model.predict(X_test)
 
     # RMSE (Root Mean Squared Error) Train and Test:
     mae_train = mean_absolute_error(y_train, y_train_predict)
@@ -57,12 +81,156 @@ def Modeling():
     print(f"Mean Absolute Error (MAE) - TEST: {mae_test:.2f}")
     print(f"R-squared (R2 Score): {r2_train:.2f}")
     print(f"R-squared (R2 Score): {r2_test:.2f}")
+    return {"mae_train": mae_train, "mae_test": mae_test, "r2_train": r2_train, "r2_test": r2_test}
+
+def load_fe_data():
+    with open(FE_DATA_FILE, "rb") as f:
+        loaded_data = pickle.load(f)
+    instrumentation.add_file_size("bytes_read", FE_DATA_FILE)
+    return loaded_data
+
+def fit_hgb(loaded_data, n_iter=20):
+    """Train the histogram gradient boosting candidate and save it as a bundle.
+
+    Uses the raw features: the model handles NaN and categoricals natively.
+    Returns the bundle, or None for FE artifacts written before `pipe_hgb` existed.
+    """
+    pipe_hgb = loaded_data.get('pipe_hgb')
+    if pipe_hgb is None:
+        print("No 'pipe_hgb' in the feature engineering output; skipping gradient boosting.")
+        return None
+    X_train, X_test = loaded_data["X_train"], loaded_data["X_test"]
+    y_train, y_test = loaded_data["y_train"], loaded_data["y_test"]
+
+    search = RandomizedSearchCV(
+        estimator=clone(pipe_hgb).set_params(model__max_iter=1000, model__early_stopping=True),
+        param_distributions=HGB_PARAM_DISTRIBUTIONS,
+        n_iter=n_iter,
+        cv=5,
+        scoring='neg_mean_absolute_error',
+        n_jobs=-1,
+        random_state=0
+    )
+    start = perf_counter()
+    with instrumentation.span("search_hgb"):
+        search.fit(X_train, y_train)
+    search_seconds = perf_counter() - start
+
+    print(f"HistGradientBoosting search: {search_seconds:.1f}s")
+    print("Best Parameters:", search.best_params_)
+    print("Best Score (Negative MAE):", search.best_score_)
+    metrics = evaluate_model(search.best_estimator_, X_train, y_train, X_test, y_test)
+    metrics.update({"cv_mae": -search.best_score_, "search_mode": "random", "search_seconds": search_seconds,
+                    "n_iter": int(search.best_estimator_[-1].n_iter_)})
+
+    bundle = ModelBundle.from_training(search.best_estimator_, X_train, y_train, loaded_data["cat_cols"],
+                                       params=search.best_params_, metrics=metrics)
+    save_bundle(bundle, BEST_MODEL_HGB_FILE)
+    instrumentation.add_file_size("bytes_written", BEST_MODEL_HGB_FILE)
+    print(f"HistGradientBoosting model version: {bundle.version}")
+    return bundle
+
+@instrumentation.stage("modeling_hgb")
+@skip_if_unchanged(lambda params: [FE_DATA_FILE], lambda params: [BEST_MODEL_HGB_FILE],
+                   modules=['utilization.model_bundle'])
+def ModelingHGB(n_iter=20):
+    """Train the HistGradientBoosting challenger on the FE data (see `fit_hgb`).
+
+    Runs as its own DAG task, with its own timeout and retries, after the
+    forest search (`Modeling(train_hgb=False)`).
+    """
+    loaded_data = load_fe_data()
+    instrumentation.add("rows_in", len(loaded_data["X_train"]))
+    fit_hgb(loaded_data, n_iter=n_iter)
+
+def modeling_outputs(params):
+    return [BEST_MODEL_FILE, BEST_MODEL_HGB_FILE] if params['train_hgb'] else [BEST_MODEL_FILE]
+
+@instrumentation.stage("modeling")
+@skip_if_unchanged(lambda params: [FE_DATA_FILE], modeling_outputs,
+                   modules=['utilization.halving_search', 'utilization.imputation', 'utilization.model_bundle',
+                            'utilization.trial_store'])
+def Modeling(search_mode='halving', compare_with=None, mae_tolerance=0.05, trials_file=TRIALS_FILE,
+             time_budget=SEARCH_TIME_BUDGET, train_hgb=True):
+    """Main function to train and evaluate the model.
+
+    The halving search records every fold score in `trials_file` (None to
+    disable), so a retried task skips finished fits, and stops after
+    `time_budget` seconds with the best model found so far. Fold scores of
+    earlier training data are dropped from the file when the search starts.
+
+    `compare_with` (e.g. 'random') also runs that search mode and
+    reports the wall time saved and whether the chosen model's test MAE is
+    within `mae_tolerance` (relative) of the reference search.
+
+    With `train_hgb`, a HistGradientBoosting challenger is trained as well
+    (see `fit_hgb`); the DAG trains it in a separate task (`ModelingHGB`).
+
+    Skipped when the FE data, the code and the arguments are the same as in
+    the last completed run (see `skip_if_unchanged`). Returns whether the
+    search finished within `time_budget`.
+    """
+    # Load Data
+    loaded_data = load_fe_data()
+
+    # Raw features: missing values are imputed by the pipeline's KNNFeatureImputer
+    X_train = loaded_data["X_train"]
+    X_test = loaded_data["X_test"]
+    y_train = loaded_data["y_train"]
+    y_test = loaded_data["y_test"]
+    pipe_rf = loaded_data['pipe_rf']
+    instrumentation.add("rows_in", len(X_train))
+
+    # Hyperparameter search
+    with instrumentation.span("search"):
+        search, search_seconds = run_search(search_mode, pipe_rf, X_train, y_train,
+                                            trials_file=trials_file, time_budget=time_budget)
+
+    # Display Best Results
+    print(f"Search mode: {search_mode} ({search_seconds:.1f}s)")
+    print("Best Parameters:", search.best_params_)
+    print("Best Score (Negative MAE):", search.best_score_)
+
+    # Use the Best Model
+    best_model = search.best_estimator_
+
+    # Evaluate on train-set & test-set
+    metrics = evaluate_model(best_model, X_train, y_train, X_test, y_test)
+    mae_test = metrics["mae_test"]
+    metrics.update({"cv_mae": -search.best_score_, "search_mode": search_mode, "search_seconds": search_seconds,
+                    "search_completed": getattr(search, 'completed_', True)})
+
+    # Optional comparison against a reference (e.g. exhaustive random) search
+    if compare_with and compare_with != search_mode:
+        reference, reference_seconds = run_search(compare_with, pipe_rf, X_train, y_train)
+        reference_mae_test = mean_absolute_error(y_test, reference.best_estimator_.predict(X_test))
+        relative_gap = (mae_test - reference_mae_test) / reference_mae_test
+        within_tolerance = relative_gap <= mae_tolerance
+        print(f"{compare_with} search: {reference_seconds:.1f}s, best parameters {reference.best_params_}, "
+              f"MAE - TEST: {reference_mae_test:.2f}")
+        print(f"Wall time saved: {reference_seconds - search_seconds:.1f}s "
+              f"({1 - search_seconds / reference_seconds:.0%}); test MAE {relative_gap:+.1%} vs {compare_with} "
+              f"-> {'within' if within_tolerance else 'OUTSIDE'} tolerance of {mae_tolerance:.0%}")
+        metrics.update({"reference_search_mode": compare_with, "reference_search_seconds": reference_seconds,
+                        "reference_mae_test": reference_mae_test, "within_tolerance": bool(within_tolerance)})
+
+    # Menyimpan model ke file, bersama schema, kategori, dan metadata training
+    bundle = ModelBundle.from_training(
+        best_model, X_train, y_train, loaded_data["cat_cols"],
+        params=search.best_params_,
+        metrics=metrics
+    )
+    save_bundle(bundle, BEST_MODEL_FILE)
+    instrumentation.add_file_size("bytes_written", BEST_MODEL_FILE)
+    print(f"Model version: {bundle.version}")
 
-    # Menyimpan model ke file
-    with open('/opt/airflow/data/best_model.pkl', 'wb') as file:
-        pickle.dump(best_model, file)
+    if train_hgb:
+        fit_hgb(loaded_data)
 
     print("Model berhasil disimpan!")
+    # An unfinished search is not fingerprinted (see `skip_if_unchanged`): the next run
+    # resumes it from the trial store instead of being skipped
+    return metrics["search_completed"]
 
 if __name__ == "__main__":
     Modeling()
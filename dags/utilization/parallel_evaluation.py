@@ -0,0 +1,116 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from utilization.model_bundle import load_bundle
+
+# ================== Shared Frames ==================
+
+class SharedFrame:
+    """A DataFrame stored as one float64 matrix in shared memory.
+
+    Numeric columns are stored as-is, categorical and string columns as
+    category codes (NaN for missing). `spec` is a small picklable description
+    (block name, shape, columns, categories) from which `attach_frame`
+    rebuilds the DataFrame in another process without copying it through
+    a pipe.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        columns = []
+        matrix = np.empty(df.shape, dtype=np.float64)
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categorical = series.cat
+                columns.append((col, 'category', list(categorical.categories), bool(categorical.ordered)))
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                matrix[:, i] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                columns.append((col, 'numeric', str(series.dtype), None))
+                continue
+            else:
+                categorical = series.astype('category').cat
+                columns.append((col, 'object', list(categorical.categories), None))
+            codes = categorical.codes.to_numpy().astype(np.float64)
+            codes[codes < 0] = np.nan
+            matrix[:, i] = codes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        np.ndarray(matrix.shape, dtype=np.float64, buffer=self.shm.buf)[:] = matrix
+        self.spec = {"name": self.shm.name, "shape": matrix.shape, "columns": columns, "index": list(df.index)}
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_frame(spec) -> pd.DataFrame:
+    """Rebuild the DataFrame described by `spec` from the shared block (columns are copied out)."""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    try:
+        matrix = np.ndarray(spec["shape"], dtype=np.float64, buffer=shm.buf)
+        data = {}
+        for i, (col, kind, info, ordered) in enumerate(spec["columns"]):
+            values = matrix[:, i].copy()
+            if kind == 'numeric':
+                data[col] = values if info == 'float64' else pd.Series(values).astype(info).array
+                continue
+            codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+            categorical = pd.Categorical.from_codes(codes, categories=info, ordered=bool(ordered))
+            data[col] = categorical if kind == 'category' else np.asarray(categorical.astype(object))
+        del matrix
+        return pd.DataFrame(data, index=spec["index"])
+    finally:
+        shm.close()
+
+# ================== Worker ==================
+
+_frames = {}
+
+def _attach_frames(specs):
+    for key, spec in specs.items():
+        _frames[key] = attach_frame(spec)
+
+def _predict_candidate(name, path):
+    """Load one candidate in the worker and predict the shared evaluation frame it expects."""
+    try:
+        bundle = load_bundle(path)
+        key = 'raw' if bundle.handles_missing else 'imputed'
+        return name, bundle.predict(_frames[key]), None
+    except Exception as e:  # A broken candidate (e.g. no TensorFlow) must not stop the others
+        return name, None, f"{type(e).__name__}: {e}"
+
+# ================== Parallel Prediction ==================
+
+def predict_candidates(candidates: dict, X_raw: pd.DataFrame, X_imputed: pd.DataFrame, n_jobs=-1):
+    """Predict the evaluation set with every candidate bundle, one process per candidate.
+
+    `candidates` maps a name to a bundle path; models are loaded inside the
+    workers, and the features are shared through shared memory instead of
+    being pickled to every worker. Returns ({name: predictions}, {name: error}).
+    """
+    n_workers = max(1, min(len(candidates), (os.cpu_count() or 1) if n_jobs == -1 else n_jobs))
+    predictions, errors = {}, {}
+    with SharedFrame(X_raw) as raw, SharedFrame(X_imputed) as imputed:
+        specs = {'raw': raw.spec, 'imputed': imputed.spec}
+        if n_workers == 1:
+            _attach_frames(specs)
+            results = [_predict_candidate(name, path) for name, path in candidates.items()]
+            _frames.clear()
+        else:
+            with ProcessPoolExecutor(n_workers, initializer=_attach_frames, initargs=(specs,)) as pool:
+                futures = [pool.submit(_predict_candidate, name, path) for name, path in candidates.items()]
+                results = [future.result() for future in futures]
+    for name, prediction, error in results:
+        if error is None:
+            predictions[name] = prediction
+        else:
+            errors[name] = error
+    return predictions, errors
@@ -0,0 +1,134 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+from utilization import instrumentation
+from utilization.cleaning_data import OUTPUT_FILE as CLEANED_CSV_FILE, PARQUET_FILE
+from utilization.scraping_data import JOURNAL_FILE, LINKS_FILE, OUTPUT_FILE as SCRAPED_FILE
+from utilization.storage import TableWriter, read_table
+
+# ================== Constants ==================
+# Listing URLs look like /properti/<city slug>/hos12345678/; every slug containing
+# one of these names (e.g. jakarta-selatan, tangerang-selatan) goes to that city's
+# partition, everything else to OTHER_PARTITION (cleaning drops most of those)
+CITY_PARTITIONS = ['jakarta', 'bogor', 'depok', 'tangerang', 'bekasi']
+OTHER_PARTITION = 'other'
+# Scraping workers shared by all city partitions, like ScrapingData's default for one run
+SCRAPING_WORKERS = 8
+
+# ================== Helper Functions ==================
+
+def partition_file(path: str, key: str) -> str:
+    """Path of partition `key` of a file: data/link_properties.csv -> data/link_properties.bogor.csv."""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{key}{extension}"
+
+def partition_files(path: str, prefix: str = '') -> list:
+    """Existing partitions of `path` whose key starts with `prefix`, in name order."""
+    stem, extension = os.path.splitext(path)
+    return sorted(glob.glob(f"{glob.escape(stem)}.{prefix}*{extension}"))
+
+def city_partitions(urls: pd.Series) -> pd.Series:
+    """City partition of every listing URL, from the city slug in the URL."""
+    slugs = urls.str.extract(r'/properti/([^/]+)/', expand=False).str.lower()
+    conditions = [slugs.str.contains(city, regex=False, na=False).to_numpy() for city in CITY_PARTITIONS]
+    return pd.Series(np.select(conditions, CITY_PARTITIONS, default=OTHER_PARTITION), index=urls.index)
+
+def remove_files(paths):
+    for path in paths:
+        os.remove(path)
+
+# ================== Merge Steps ==================
+
+@instrumentation.stage("merge_links")
+def MergeLinks(links_file=LINKS_FILE, output_file=SCRAPED_FILE, journal_file=JOURNAL_FILE,
+               max_workers=SCRAPING_WORKERS):
+    """Merge the links of every search-page range and split them per city.
+
+    The page-range files (`link_properties.pages-*.csv`, written by the mapped
+    `scraping_link` tasks) are combined into `links_file` without duplicate URLs
+    and split into one links file per city. Returns the ScrapingData keyword
+    arguments of every city with links, for the mapped `scraping_data` tasks:
+    each city gets its own journal and output file and a share of the
+    `max_workers` scraping workers proportional to its number of links.
+    """
+    parts = partition_files(links_file, 'pages-')
+    links = pd.concat([pd.read_csv(part) for part in parts], ignore_index=True) if parts else pd.read_csv(links_file)
+    links = links.dropna(subset=['property_url']).drop_duplicates('property_url')
+    links.to_csv(links_file, index=False)
+    remove_files(parts)
+
+    partition_kwargs = []
+    for city, city_links in links.groupby(city_partitions(links['property_url'])):
+        city_links.to_csv(partition_file(links_file, city), index=False)
+        partition_kwargs.append({
+            "links_file": partition_file(links_file, city),
+            "output_file": partition_file(output_file, f'scraped-{city}'),
+            "journal_file": partition_file(journal_file, city),
+            "max_workers": max(1, round(max_workers * len(city_links) / len(links))),
+            "partition": city,
+        })
+    instrumentation.add("rows_out", len(links))
+    print(f"Merged {len(parts)} page ranges into {len(links)} links: "
+          + ', '.join(f"{kwargs['partition']} {kwargs['max_workers']} workers" for kwargs in partition_kwargs))
+    return partition_kwargs
+
+@instrumentation.stage("merge_listings")
+def MergeListings(output_file=SCRAPED_FILE, cleaned_file=CLEANED_CSV_FILE, parquet_file=PARQUET_FILE):
+    """Upsert the listings scraped per city into `output_file` and split the catalog per city.
+
+    The per-city files of this run (`Property_Scraping.scraped-*.csv`) replace
+    older rows with the same URL, as `merge_into_csv` does for a single run.
+    The whole catalog is then written as one raw file per city for the mapped
+    `cleaning_data` tasks; returns their CleaningData keyword arguments.
+    """
+    scraped = partition_files(output_file, 'scraped-')
+    frames = [pd.read_csv(output_file)] if os.path.exists(output_file) else []
+    frames += [pd.read_csv(part) for part in scraped]
+    catalog = pd.concat(frames, ignore_index=True).drop_duplicates(subset='url', keep='last')
+    tmp_file = f"{output_file}.tmp"
+    catalog.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    remove_files(scraped)
+    # Cleaned partitions of an earlier, failed run must not end up in this run's data
+    remove_files(partition_files(parquet_file))
+
+    partition_kwargs = []
+    for city, listings in catalog.groupby(city_partitions(catalog['url'].fillna(''))):
+        listings.to_csv(partition_file(output_file, city), index=False)
+        partition_kwargs.append({
+            "input_file": partition_file(output_file, city),
+            "output_file": partition_file(cleaned_file, city),
+            "parquet_file": partition_file(parquet_file, city),
+            "partition": city,
+        })
+    instrumentation.add("rows_in", sum(len(frame) for frame in frames))
+    instrumentation.add("rows_out", len(catalog))
+    print(f"Merged {len(scraped)} scraped partitions into {len(catalog)} listings.")
+    return partition_kwargs
+
+@instrumentation.stage("merge_cleaned")
+def MergeCleaned(output_file=CLEANED_CSV_FILE, parquet_file=PARQUET_FILE, raw_file=SCRAPED_FILE):
+    """Combine the cleaned city partitions into the files read by feature engineering and the DB load.
+
+    Partitions are appended one at a time, so memory stays bounded by the
+    largest city. The partition files (raw and cleaned) are removed afterwards.
+    """
+    parts = partition_files(parquet_file)
+    if not parts:
+        raise FileNotFoundError(f"No cleaned partitions of {parquet_file}")
+    tmp_file = f"{output_file}.tmp"
+    with TableWriter(parquet_file) as writer:
+        for i, part in enumerate(parts):
+            data = read_table(part)
+            data.to_csv(tmp_file, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+            writer.write(data)
+    os.replace(tmp_file, output_file)
+    remove_files(parts)
+    remove_files(partition_files(output_file))
+    remove_files(partition_files(raw_file))
+    instrumentation.add("rows_out", writer.rows_written)
+    print(f"Merged {len(parts)} cleaned partitions ({writer.rows_written} rows) into "
+          f"'{os.path.basename(output_file)}' and '{os.path.basename(parquet_file)}'.")
+    return writer.rows_written
@@ -2,15 +2,72 @@ import os
 import json
 import base64
 import pandas as pd
-from time import sleep, perf_counter
-from typing import Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Union
 from dotenv import load_dotenv
-from openai import OpenAI
-from zyte_api import ZyteAPI
-from pydantic import BaseModel
 from multidict import CIMultiDict
 from w3lib.encoding import html_to_unicode, resolve_encoding
 import html_text
+from utilization.cache import CACHE_DIR, CACHE_MAX_BYTES, DiskCache, content_key
+from utilization.fetch_from_postgresql import CONN_STRING
+from utilization import instrumentation
+from utilization.incremental import (MAX_AGE_DAYS, SCRAPE_INDEX_FILE, fetch_known_urls, load_scrape_index,
+                                     select_links_to_process, update_scrape_index)
+
+# The API clients are only needed by ScrapingData itself; importing them lazily
+# (openai alone takes most of a second) keeps DAG parsing and helpers fast
+if TYPE_CHECKING:
+    from zyte_api import ZyteAPI
+
+# ================== Constants ==================
+
+BASE_URL = "https://www.rumah123.com"
+LINKS_FILE = '/opt/airflow/data/link_properties.csv'
+OUTPUT_FILE = '/opt/airflow/data/Property_Scraping.csv'
+JOURNAL_FILE = '/opt/airflow/data/scraping_journal.jsonl'
+HTML_MAX_AGE_SECONDS = 7 * 24 * 60 * 60  # Serve cached HTML without revalidation for a week
+
+# JSON schema of the data extracted from each listing
+SCHEMA = {
+    "title": {"type": "string", "description": "The title of the house"},
+    "description": {"type": "string", "description": "The description of the house"},
+    "price": {"type": "number", "description": "The price of the house"},
+    "address": {"type": "string", "description": "The address of the house"},
+    "city": {"type": "string", "description": "The city of the house"},
+    "land_size_m2": {"type": "number", "description": "The landsize (LT) without m2 of the house, if there is NaN fill 0"},
+    "building_size_m2": {"type": "number", "description": "The buildingsize (LB) without m2 of the house, if there is NaN fill 0"},
+    "bedroom": {"type": "number", "description": "The number of bedroom in the house, if there is NaN fill 0"},
+    "bathroom": {"type": "number", "description": "The number of bathroom in the house, if there is NaN fill 0"},
+    "garage": {"type": "number", "description": "The number of garage in the house, only the number and string that means number, if there is NaN fill 0"},
+    "carport": {"type": "number", "description": "The number of carport in the house if there is NaN fill 0"},
+    "property_type": {"type": "string", "description": "The type of the property, only if property_type = house"},
+    "certificate": {"type": "string", "description": "The certificate of the house, if there is Null fill Not Specified"},
+    "voltage_watt": {"type": "number", "description": "The voltage without watt of the house, if there is Null fill Not Specified"},
+    "maid_bedroom": {"type": "number", "description": "The number of maid bedroom in the house, if there is NaN fill 0"},
+    "maid_bathroom": {"type": "number", "description": "The number of maid bathroom in the house, if there is NaN fill 0"},
+    "kitchen": {"type": "number", "description": "The number of kitchen in the house, if there is NaN fill 0"},
+    "dining_room": {"type": "number", "description": "The number of dining room in the house, if there is NaN fill 0"},
+    "living_room": {"type": "number", "description": "The number of living room in the house, if there is NaN fill 0"},
+    "furniture": {"type": "string", "description": "The number of furniture in the house", "enum": ["Semi Furnished", "Furnished", "Unfurnished"]},
+    "building_material": {"type": "string", "description": "The number of building material in the house"},
+    "floor_material": {"type": "string", "description": "The number of building material in the house"},
+    "floor_level": {"type": "number", "description": "The number of floor level in the house, if there is NaN fill 0"},
+    "house_facing": {"type": "string", "description": "The number of face of the house", "enum": ["North", "South", "East", "West", "Southeast", "Southwest", "Northeast", "Northwest"]},
+    "concept_and_style": {"type": "string", "description": "The concept and style of the house"},
+    "view": {"type": "string", "description": "The view from the house"},
+    "internet_access": {"type": "string", "description": "Whether the house has internet access"},
+    "road_width": {"type": "string", "description": "The road width in front of the house"},
+    "year_built": {"type": "number", "description": "The year the house was built"},
+    "year_renovated": {"type": "number", "description": "The year the house was last renovated"},
+    "water_source": {"type": "string", "description": "The water source for the house"},
+    "corner_property": {"type": "boolean", "description": "Whether the house is a corner property (hook)"},
+    "property_condition": {"type": "string", "description": "The condition of the property"},
+    "ad_type": {"type": "string", "description": "The type of advertisement for the property"},
+    "ad_id": {"type": "string", "description": "The ID of the advertisement"}
+}
+
 
 # ================== Load Configuration ==================
 
@@ -54,17 +111,25 @@ def extract_html(web_page: dict) -> str:
 
 def initialize_clients(zyte_api_key: str, openai_api_key: str):
     """Initialize ZyteAPI and OpenAI clients."""
+    from openai import OpenAI
+    from zyte_api import ZyteAPI
+
     client_zyte = ZyteAPI(api_key=zyte_api_key)
     client_openai = OpenAI(api_key=openai_api_key)
     return client_zyte, client_openai
 
-def get_html_with_zapi(client_zyte: ZyteAPI, url: str, browser=False) -> Union[str, None]:
+def zyte_get(client_zyte: "ZyteAPI", query: dict) -> dict:
+    """Send one ZyteAPI request, recorded as an external call of the running stage."""
+    with instrumentation.external_call("zyte"):
+        return client_zyte.get(query)
+
+def get_html_with_zapi(client_zyte: "ZyteAPI", url: str, browser=False) -> Union[str, None]:
     """Retrieve HTML content of a page using ZyteAPI."""
     if browser:
-        web_page = client_zyte.get({"url": url, "browserHtml": True})
+        web_page = zyte_get(client_zyte, {"url": url, "browserHtml": True})
         return web_page.get('browserHtml')
     else:
-        web_page = client_zyte.get({"url": url, "httpResponseBody": True, "httpResponseHeaders": True})
+        web_page = zyte_get(client_zyte, {"url": url, "httpResponseBody": True, "httpResponseHeaders": True})
         return extract_html(web_page)
 
 
@@ -85,113 +150,256 @@ def extract_data_with_gpt(client_openai, text: str, schema: dict, model: str = "
     If a value is missing, set it to null.
     """.strip()
 
-    completion = client_openai.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": instruction},
-        ],
-        temperature=temperature,
-    )
+    with instrumentation.external_call("openai"):
+        completion = client_openai.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": instruction},
+            ],
+            temperature=temperature,
+        )
+    instrumentation.add_token_usage(getattr(completion, 'usage', None))
     return completion
 
+def parse_gpt_json(content: str) -> dict:
+    """Parse the JSON object returned by GPT, removing markdown fences."""
+    clean_json = content.replace('`', '').replace("\n", "").replace('json', '')
+    return json.loads(clean_json)
+
+
+# ================== Cache Helpers ==================
+
+def response_validators(web_page: dict) -> dict:
+    """Read the ETag/Last-Modified validators of a Zyte HTTP response."""
+    headers = CIMultiDict([(h["name"], h["value"]) for h in web_page.get("httpResponseHeaders", [])])
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+def get_html_cached(client_zyte: "ZyteAPI", url: str, cache: DiskCache, max_age: float = HTML_MAX_AGE_SECONDS) -> str:
+    """Retrieve HTML through the cache, keyed by URL + ETag/Last-Modified.
+
+    Pages fetched less than `max_age` seconds ago are served without any request.
+    Older pages are revalidated with a conditional request and a 304 answer
+    reuses the cached HTML.
+    """
+    validators_key = content_key("validators", url)
+    validators = cache.get_json(validators_key)
+    query = {"url": url, "httpResponseBody": True, "httpResponseHeaders": True}
+
+    if validators is not None:
+        html_key = content_key("html", url, validators["etag"], validators["last_modified"])
+        if time() - validators["fetched_at"] < max_age:
+            cached = cache.get(html_key)
+            if cached is not None:
+                return cached.decode('utf-8')
+
+        conditional_headers = []
+        if validators["etag"]:
+            conditional_headers.append({"name": "If-None-Match", "value": validators["etag"]})
+        if validators["last_modified"]:
+            conditional_headers.append({"name": "If-Modified-Since", "value": validators["last_modified"]})
+        if conditional_headers:
+            web_page = zyte_get(client_zyte, {**query, "customHttpRequestHeaders": conditional_headers})
+            cached = cache.get(html_key) if web_page.get("statusCode") == 304 else None
+            if cached is not None:
+                cache.set_json(validators_key, {**validators, "fetched_at": time()})
+                return cached.decode('utf-8')
+            if web_page.get("statusCode") != 304:
+                return store_html(cache, url, web_page)
+
+    return store_html(cache, url, zyte_get(client_zyte, query))
+
+def store_html(cache: DiskCache, url: str, web_page: dict) -> str:
+    """Decode a Zyte response and cache its HTML together with its validators."""
+    html = extract_html(web_page)
+    validators = response_validators(web_page)
+    cache.set(content_key("html", url, validators["etag"], validators["last_modified"]), html.encode('utf-8'))
+    cache.set_json(content_key("validators", url), {**validators, "fetched_at": time()})
+    return html
 
-# ================== Main Scraping Process ==================
+def extract_data_with_gpt_cached(client_openai, text: str, schema: dict, cache: DiskCache,
+                                 model: str = "gpt-3.5-turbo", temperature: float = 0) -> str:
+    """Return GPT's JSON answer for `text`, reusing it when text, schema, model and temperature match."""
+    key = content_key("extraction", text, schema, model, temperature)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached.decode('utf-8')
+
+    completion = extract_data_with_gpt(client_openai, text, schema, model=model, temperature=temperature)
+    content = completion.choices[0].message.content.strip()
+    parse_gpt_json(content)  # Never cache an answer that isn't valid JSON
+    cache.set(key, content.encode('utf-8'))
+    return content
+
+
+# ================== Pipeline Helpers ==================
+
+class ScrapingJournal:
+    """Append-only JSONL checkpoint of extracted listings, keyed by URL.
+
+    Every finished listing is appended as one line and flushed immediately, so a
+    crashed run loses at most the listings that were in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """Return {url: record} of every listing already in the journal."""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line from a crash
+                records[entry['url']] = entry['data']
+        return records
+
+    def append(self, url: str, data: dict):
+        line = json.dumps({"url": url, "scraped_at": time(), "data": data}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def process_listing(relative_url: str, client_zyte, client_openai, schema: dict = SCHEMA, cache: DiskCache = None) -> dict:
+    """Fetch one listing, extract its text and let GPT turn it into a record."""
+    url = f"{BASE_URL}{relative_url}"
+    if cache is None:
+        html = get_html_with_zapi(client_zyte, url, browser=False)
+        text = html_text.extract_text(html, guess_layout=True)
+        content = extract_data_with_gpt(client_openai, text, schema).choices[0].message.content.strip()
+    else:
+        html = get_html_cached(client_zyte, url, cache)
+        text = html_text.extract_text(html, guess_layout=True)
+        content = extract_data_with_gpt_cached(client_openai, text, schema, cache)
+    return parse_gpt_json(content)
+
+def run_extraction_pipeline(urls, client_zyte, client_openai, journal: ScrapingJournal, max_workers: int = 8,
+                            cache: DiskCache = None) -> int:
+    """Process `urls` with at most `max_workers` listings in flight.
+
+    Fetching, text extraction and the GPT call of different listings overlap
+    because each worker handles one listing end to end while the others wait on
+    the network. Returns the number of listings written to the journal.
+    """
+    processed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(process_listing, url, client_zyte, client_openai, SCHEMA, cache): url
+            for url in urls
+        }
+        for idx, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            try:
+                journal.append(url, future.result())
+                processed += 1
+                print(f"Processed {idx}/{len(futures)}: {url}")
+            except Exception as e:
+                instrumentation.add("extraction_errors")
+                print(f"Error at {url}: {e}")
+    return processed
+
+def merge_into_csv(records: dict, output_file: str):
+    """Upsert extracted records into the scraping CSV, keyed by URL."""
+    df_new = pd.DataFrame(
+        [{"url": url, **data} for url, data in records.items()],
+        columns=["url"] + list(SCHEMA)
+    )
+    if os.path.exists(output_file):
+        df_old = pd.read_csv(output_file)
+        df_new = pd.concat([df_old, df_new], ignore_index=True)
+    df_new = df_new.drop_duplicates(subset='url', keep='last')
+    df_new.to_csv(output_file, index=False)
+    return len(df_new)
 
-def ScrapingData():
-    """Main scraping data process."""
-    # Load environment variables
-    dotenv_path = os.path.join(os.path.dirname(__file__), "/opt/airflow/data/.env")
-    zyte_api_key, openai_api_key = load_env(dotenv_path)
 
-    # Initialize clients
-    client_zyte, client_openai = initialize_clients(zyte_api_key, openai_api_key)
+# ================== Main Scraping Process ==================
+
+@instrumentation.stage("scraping_data")
+def ScrapingData(limit=None, max_workers=8, client_zyte=None, client_openai=None,
+                 links_file=LINKS_FILE, output_file=OUTPUT_FILE, journal_file=JOURNAL_FILE,
+                 cache_dir=CACHE_DIR, cache_max_bytes=CACHE_MAX_BYTES,
+                 incremental=True, max_age_days=MAX_AGE_DAYS, index_file=SCRAPE_INDEX_FILE,
+                 conn_string=CONN_STRING):
+    """Main scraping data process.
+
+    Listings already in the journal (from a crashed previous run) are skipped.
+    Fetched HTML and GPT extractions are cached in `cache_dir` (None disables
+    the cache), so unchanged listings cost no tokens on the next run.
+
+    In `incremental` mode only listings that are new (not in the scrape index nor
+    in `house_prediction_table`) or whose last scrape is older than
+    `max_age_days` are extracted, so the run scales with churn, not catalog size.
+    Pass `client_zyte`/`client_openai` to replace the real API clients, e.g.
+    with local fakes for offline throughput tests.
+    """
+    if client_zyte is None or client_openai is None:
+        # Load environment variables
+        dotenv_path = os.path.join(os.path.dirname(__file__), "/opt/airflow/data/.env")
+        zyte_api_key, openai_api_key = load_env(dotenv_path)
+
+        # Initialize clients
+        default_zyte, default_openai = initialize_clients(zyte_api_key, openai_api_key)
+        client_zyte = client_zyte or default_zyte
+        client_openai = client_openai or default_openai
 
     # Load property links
-    link123 = pd.read_csv('/opt/airflow/data/link_properties.csv')
-
-    # Define JSON schema
-    schema = {
-        "title": {"type": "string", "description": "The title of the house"},
-        "description": {"type": "string", "description": "The description of the house"},
-        "price": {"type": "number", "description": "The price of the house"},
-        "address": {"type": "string", "description": "The address of the house"},
-        "city": {"type": "string", "description": "The city of the house"},
-        "land_size_m2": {"type": "number", "description": "The landsize (LT) without m2 of the house, if there is NaN fill 0"},
-        "building_size_m2": {"type": "number", "description": "The buildingsize (LB) without m2 of the house, if there is NaN fill 0"},
-        "bedroom": {"type": "number", "description": "The number of bedroom in the house, if there is NaN fill 0"},
-        "bathroom": {"type": "number", "description": "The number of bathroom in the house, if there is NaN fill 0"},
-        "garage": {"type": "number", "description": "The number of garage in the house, only the number and string that means number, if there is NaN fill 0"},
-        "carport": {"type": "number", "description": "The number of carport in the house if there is NaN fill 0"},
-        "property_type": {"type": "string", "description": "The type of the property, only if property_type = house"},
-        "certificate": {"type": "string", "description": "The certificate of the house, if there is Null fill Not Specified"},
-        "voltage_watt": {"type": "number", "description": "The voltage without watt of the house, if there is Null fill Not Specified"},
-        "maid_bedroom": {"type": "number", "description": "The number of maid bedroom in the house, if there is NaN fill 0"},
-        "maid_bathroom": {"type": "number", "description": "The number of maid bathroom in the house, if there is NaN fill 0"},
-        "kitchen": {"type": "number", "description": "The number of kitchen in the house, if there is NaN fill 0"},
-        "dining_room": {"type": "number", "description": "The number of dining room in the house, if there is NaN fill 0"},
-        "living_room": {"type": "number", "description": "The number of living room in the house, if there is NaN fill 0"},
-        "furniture": {"type": "string", "description": "The number of furniture in the house", "enum": ["Semi Furnished", "Furnished", "Unfurnished"]},
-        "building_material": {"type": "string", "description": "The number of building material in the house"},
-        "floor_material": {"type": "string", "description": "The number of building material in the house"},
-        "floor_level": {"type": "number", "description": "The number of floor level in the house, if there is NaN fill 0"},
-        "house_facing": {"type": "string", "description": "The number of face of the house", "enum": ["North", "South", "East", "West", "Southeast", "Southwest", "Northeast", "Northwest"]},
-        "concept_and_style": {"type": "string", "description": "The concept and style of the house"},
-        "view": {"type": "string", "description": "The view from the house"},
-        "internet_access": {"type": "string", "description": "Whether the house has internet access"},
-        "road_width": {"type": "string", "description": "The road width in front of the house"},
-        "year_built": {"type": "number", "description": "The year the house was built"},
-        "year_renovated": {"type": "number", "description": "The year the house was last renovated"},
-        "water_source": {"type": "string", "description": "The water source for the house"},
-        "corner_property": {"type": "boolean", "description": "Whether the house is a corner property (hook)"},
-        "property_condition": {"type": "string", "description": "The condition of the property"},
-        "ad_type": {"type": "string", "description": "The type of advertisement for the property"},
-        "ad_id": {"type": "string", "description": "The ID of the advertisement"}
-    }
-
-    # Container for extracted data
-    extracted_data = []
-
-    # #! Uncomment to process the URLs
-    # for idx, relative_url in enumerate(link123['property_url'][0:3]):
-    #     url = f"https://www.rumah123.com{relative_url}"
-    #     print(f"Processing {idx + 1}/{len(link123)}: {url}")
-    #     try:
-    #         # Fetch page HTML
-    #         html = get_html_with_zapi(client_zyte, url, browser=False)
-    #         text = html_text.extract_text(html, guess_layout=True)
-
-    #         # Extract data using GPT
-    #         completion = extract_data_with_gpt(client_openai, text, schema)
-    #         extracted_data.append(completion.choices[0].message.content.strip())
-
-    #         # Save progress periodically
-    #         if idx % 2 == 0:
-    #             with open("temp_data.json", "w") as f:
-    #                 json.dump(extracted_data, f)
-    #             print(f"Progress saved at index-{idx}")
-
-    #     except Exception as e:
-    #         print(f"Error at index-{idx}: {e}")
-
-    #     sleep(1)
-
-    # # Convert the list of strings to valid JSON and load them into a list
-    # valid_json = []
-    # for json_str in extracted_data:
-    #     try:
-    #         # Ensure proper JSON format (removing unwanted characters and handling malformed input)
-    #         clean_json = json_str.replace('`', '').replace("\n", "").replace('json', '')
-    #         valid_json.append(json.loads(clean_json))
-    #     except json.JSONDecodeError:
-    #         print(f"Error decoding JSON: {json_str}")
-
-    # # Convert the list of valid JSON into a DataFrame
-    # df = pd.DataFrame(valid_json)
-
-    # # Final save to CSV
-    # df.to_csv('/opt/airflow/data/Property_Scraping_tes.csv', index=False)
-    print("Data has been saved to Property_Scraping.csv.")
+    link123 = pd.read_csv(links_file)
+    urls = link123['property_url'].dropna().drop_duplicates().tolist()
+    if incremental:
+        index = load_scrape_index(index_file)
+        known_urls = set()
+        if conn_string:
+            try:
+                known_urls = fetch_known_urls(conn_string)
+            except Exception as e:
+                print(f"Could not read known URLs from PostgreSQL, using the local index only: {e}")
+        new, stale, fresh = select_links_to_process(urls, index, known_urls, max_age_days=max_age_days)
+        # URLs only known from the database start ageing from now
+        update_scrape_index([url for url in fresh if url not in index], index_file)
+        print(f"Incremental mode: {len(new)} new, {len(stale)} stale, {len(fresh)} unchanged listings.")
+        urls = new + stale
+    if limit is not None:
+        urls = urls[:limit]
+
+    # Resume from the journal of an interrupted run
+    journal = ScrapingJournal(journal_file)
+    done = journal.load()
+    pending = [url for url in urls if url not in done]
+    print(f"{len(urls)} listings, {len(done)} already in journal, {len(pending)} to process.")
+
+    cache = DiskCache(cache_dir, cache_max_bytes) if cache_dir else None
+    start = perf_counter()
+    processed = run_extraction_pipeline(pending, client_zyte, client_openai, journal,
+                                        max_workers=max_workers, cache=cache)
+    elapsed = perf_counter() - start
+    print(f"Extracted {processed} listings in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.2f} listings/s).")
+    instrumentation.add("rows_in", len(pending))
+    instrumentation.add("rows_out", processed)
+    if cache is not None:
+        print(f"Cache: {cache.stats()}")
+        instrumentation.add("cache_hits", cache.hits)
+        instrumentation.add("cache_misses", cache.misses)
+
+    # Merge the journal into the scraping CSV and start the next run fresh
+    records = journal.load()
+    if records:
+        total_rows = merge_into_csv(records, output_file)
+        instrumentation.add_file_size("bytes_written", output_file)
+        update_scrape_index(records, index_file)
+        journal.remove()
+        print(f"Data has been saved to {os.path.basename(output_file)} ({total_rows} rows).")
+    else:
+        print("No property data was extracted.")
 
 
 # ================== Entry Point ==================
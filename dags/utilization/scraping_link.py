@@ -1,7 +1,12 @@
-import pandas as pd
+import csv
+import threading
 import requests
 from bs4 import BeautifulSoup
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from time import monotonic, sleep
+from urllib3.util.retry import Retry
+from utilization import instrumentation
 
 # ================== Constants ==================
 BASE_URL = "https://www.rumah123.com/jual/cari/?q=rumah+jabodetabek&page={}"
@@ -9,15 +14,72 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 OUTPUT_FILE = '/opt/airflow/data/link_properties.csv'
+OUTPUT_COLUMNS = ['property_title', 'property_url']
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# ================== Rate Limiting ==================
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`.
+
+    The bucket starts with `tokens` tokens (default: full).
+    """
+
+    def __init__(self, rate, capacity=1, tokens=None):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity if tokens is None else tokens
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            sleep(wait)
 
 # ================== Helper Functions ==================
 
-def fetch_page_html(url):
+def create_session(pool_size=8, max_retries=3, backoff_factor=1):
+    """Create a keep-alive session that retries 429/5xx responses with exponential backoff."""
+    retry = Retry(
+        total=max_retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_page_html(url, session=None, timeout=30):
     """Fetch the HTML content of a given page URL."""
-    response = requests.get(url, headers=HEADERS)
+    try:
+        with instrumentation.external_call("rumah123"):
+            if session is None:
+                response = requests.get(url, headers=HEADERS, timeout=timeout)
+            else:
+                response = session.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"Failed to fetch {url}. Error: {e}")
+        return None
     if response.status_code == 200:
+        instrumentation.add("bytes_read", len(response.content))
         return response.text
     else:
+        instrumentation.add("http_errors")
         print(f"Failed to fetch {url}. Status code: {response.status_code}")
         return None
 
@@ -38,44 +100,86 @@ def parse_property_links(page_html):
 
     return property_links
 
-def save_to_csv(data, output_file):
-    """Save the list of property links to a CSV file."""
-    df = pd.DataFrame(data)
-    df.to_csv(output_file, index=False)
-    print(f"Data successfully saved to {output_file}")
+class LinkWriter:
+    """Append parsed links to a CSV file as soon as each page is done."""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        self._file = open(output_file, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, property_links):
+        with self._lock:
+            self._writer.writerows(property_links)
+            self._file.flush()
+            self.rows_written += len(property_links)
+
+    def close(self):
+        self._file.close()
 
 # ================== Main Scraping Function ==================
 
-def ScrapingLink(start_page=1, end_page=2, sleep_time=2):
-    """Main function to scrape property links from multiple pages."""
+def scrape_page(current_page, session, rate_limiter, base_url=BASE_URL):
+    """Fetch and parse one search page, waiting for the rate limiter first."""
+    rate_limiter.acquire()
+    page_html = fetch_page_html(base_url.format(current_page), session=session)
+    if page_html is None:
+        return None
+    return parse_property_links(page_html)
+
+@instrumentation.stage("scraping_link")
+def ScrapingLink(start_page=1, end_page=2, max_workers=4, requests_per_second=0.5,
+                 output_file=OUTPUT_FILE, base_url=BASE_URL):
+    """Main function to scrape property links from multiple pages.
+
+    Pages are fetched concurrently over one pooled keep-alive session. An
+    initially empty token bucket of capacity 1 spaces requests 1 /
+    `requests_per_second` apart (the default of 0.5 is the old 2 s sleep), so
+    the workers only overlap the waiting on responses, never send a burst.
+    Links are streamed to `output_file` as each page finishes.
+    """
     print("Scraping process started...")
-    all_property_links = []
-
-    # Loop through pages
-    for current_page in range(start_page, end_page + 1):
-        page_url = BASE_URL.format(current_page)
-        print(f"Processing page {current_page}...")
-
-        # Fetch page HTML
-        page_html = fetch_page_html(page_url)
-        if page_html:
-            # Parse property links from page
-            property_links = parse_property_links(page_html)
-            all_property_links.extend(property_links)
-            print(f"Page {current_page}: {len(property_links)} properties found.")
-        else:
-            print(f"Skipping page {current_page} due to fetch failure.")
-
-        # Sleep to avoid overloading the server
-        sleep(sleep_time)
-
-    # Save to CSV
-    if all_property_links:
-        save_to_csv(all_property_links, OUTPUT_FILE)
+    start = monotonic()
+    session = create_session(pool_size=max_workers)
+    rate_limiter = TokenBucket(rate=requests_per_second, capacity=1, tokens=0)
+    writer = LinkWriter(output_file)
+    pages_ok = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(scrape_page, current_page, session, rate_limiter, base_url): current_page
+                for current_page in range(start_page, end_page + 1)
+            }
+            for future in as_completed(futures):
+                current_page = futures[future]
+                property_links = future.result()
+                if property_links is None:
+                    print(f"Skipping page {current_page} due to fetch failure.")
+                    continue
+                writer.write(property_links)
+                pages_ok += 1
+                print(f"Page {current_page}: {len(property_links)} properties found.")
+    finally:
+        writer.close()
+        session.close()
+
+    elapsed = monotonic() - start
+    instrumentation.add("pages", pages_ok)
+    instrumentation.add("pages_failed", end_page - start_page + 1 - pages_ok)
+    instrumentation.add("rows_out", writer.rows_written)
+    instrumentation.add_file_size("bytes_written", output_file)
+    if writer.rows_written:
+        print(f"Data successfully saved to {output_file}")
     else:
         print("No property data was collected.")
 
-    print("Scraping process completed successfully.")
+    print(f"Scraping process completed: {pages_ok} pages, {writer.rows_written} links "
+          f"in {elapsed:.1f}s ({pages_ok / max(elapsed, 1e-9):.2f} pages/s).")
+    return writer.rows_written
 
 # ================== Run as Script ==================
 
@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ================== Helper Functions ==================
+
+def _normalize_field(field: pa.Field) -> pa.Field:
+    """Widen types that depend on a single chunk's content to a stable type."""
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    if pa.types.is_dictionary(field.type):
+        return field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+    return field
+
+def write_table(df: pd.DataFrame, path: str):
+    """Write a DataFrame to Parquet atomically, keeping dtypes (incl. categoricals)."""
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False, engine='pyarrow')
+    os.replace(tmp_path, path)
+
+def read_table(path: str, columns: list = None) -> pd.DataFrame:
+    """Read a Parquet file, loading only `columns` if given."""
+    return pd.read_parquet(path, columns=columns, engine='pyarrow')
+
+# ================== Chunked Writer ==================
+
+class TableWriter:
+    """Append DataFrame chunks to a single Parquet file, one row group per chunk.
+
+    The schema is fixed by the first chunk (all-null columns become strings,
+    categoricals use int32 dictionary indices) and later chunks are converted to
+    it. The file only replaces `path` when `close()` is called.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written = 0
+        self._tmp_path = f"{path}.tmp"
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            self._schema = pa.schema([_normalize_field(field) for field in schema], metadata=schema.metadata)
+            self._writer = pq.ParquetWriter(self._tmp_path, self._schema)
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        self.rows_written += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            os.remove(self._tmp_path)
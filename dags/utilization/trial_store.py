@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+from utilization.cache import content_key
+
+# ================== Constants ==================
+TRIALS_FILE = '/opt/airflow/data/search_trials.jsonl'
+
+# ================== Trial Store ==================
+
+class TrialStore:
+    """JSONL log of finished CV fits, keyed by what determines their score.
+
+    A record is written (and fsync'ed) as soon as a fit finishes, so a search
+    killed by a timeout can be restarted and skip everything already scored.
+    The key covers the candidate parameters, the budget, the fold and a
+    fingerprint of the data and search setup, so stale results are never
+    reused after the training data changes. Every record also carries the
+    fingerprint of the training data alone; `start` drops the records of
+    other datasets, so the file only grows within one dataset.
+    """
+
+    def __init__(self, path: str = TRIALS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._trials = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Truncated last line of a killed run
+                    self._trials[record['key']] = record
+
+    @staticmethod
+    def make_key(params: dict, resource: int, fold: int, fingerprint: str) -> str:
+        return content_key(params, resource, fold, fingerprint)
+
+    def start(self, data_fingerprint: str):
+        """Begin a search on the data with `data_fingerprint`, dropping the trials of any other data."""
+        with self._lock:
+            stale = [key for key, record in self._trials.items() if record.get('data') != data_fingerprint]
+            if not stale:
+                return
+            for key in stale:
+                del self._trials[key]
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                for record in self._trials.values():
+                    f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        print(f"Dropped {len(stale)} trials of earlier training data from {os.path.basename(self.path)}.")
+
+    def get(self, key: str):
+        return self._trials.get(key)
+
+    def add(self, key: str, data: str, **record):
+        """Persist the trial `key` of the training data with fingerprint `data`."""
+        record = {'key': key, 'data': data, **record}
+        with self._lock:
+            self._trials[key] = record
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def __len__(self):
+        return len(self._trials)
@@ -1,10 +1,29 @@
 import streamlit as st
-import pandas as pd
-import pickle
+from time import perf_counter
+
+from model_registry import METRICS_FILE, PROFILE_DIR, PROMETHEUS_FILE, available_models, get_registry
+from utilization import instrumentation
+
+# Prediction latency, cache hits and model loads go to data/metrics (JSONL and Prometheus text file);
+# predictions are aggregated in memory and flushed to the Prometheus file every few seconds
+instrumentation.configure(METRICS_FILE, PROMETHEUS_FILE, PROFILE_DIR)
+instrumentation.buffer_stages("app_predict")
 
 # Application Configuration
 st.set_page_config(page_title="Real Estate Price Prediction App", page_icon="🏡", layout="centered")
 
+# Model selection; the chosen model is loaded and warmed up once per process,
+# so the first Predict click doesn't pay for loading (or TensorFlow start-up)
+model_choices = available_models()
+model_label = st.sidebar.selectbox("Model", list(model_choices)) if len(model_choices) > 1 else next(iter(model_choices))
+registry = get_registry(model_choices[model_label])
+try:
+    registry.get_model()
+except FileNotFoundError:
+    pass
+except Exception as e:
+    st.error(f"Could not load the {model_label} model: {e}")
+
 # Application Header
 st.title("🏡 Real Estate Price Prediction App")
 st.write("Enter property details below to predict the price.")
@@ -75,20 +94,36 @@ if st.button("Predict"):
         "voltage_watt": voltage_watt
     }
 
-    # Load the trained model
+    # Make prediction with the cached model (reloaded when the file changes). Inputs
+    # seen before with the same model are answered from the prediction cache, and
+    # the bundle builds the DataFrame itself, so the app doesn't import pandas
     try:
-        model_path = "data/best_model_ever.pkl"  # Update the path to your model
-        with open(model_path, 'rb') as file:
-            model = pickle.load(file)
-
-        # Prepare data for prediction
-        input_df = pd.DataFrame([input_data])
-
-        # Make prediction
-        prediction = model.predict(input_df)
+        start = perf_counter()
+        with instrumentation.stage("app_predict", model=model_label):
+            prediction = registry.predict(input_data)
+        elapsed_ms = (perf_counter() - start) * 1000
         st.subheader("Prediction Result:")
-        st.success(f"Predicted Price: **Rp {prediction[0]:,.2f} Million**")
+        st.success(f"Predicted Price: **Rp {prediction:,.2f} Million**")
+        st.caption(f"Computed in {elapsed_ms:.2f} ms")
     except FileNotFoundError:
         st.error("Model file not found. Please ensure the model file exists.")
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
+
+# Cached model information
+model_stats = registry.stats()
+if model_stats:
+    with st.sidebar:
+        st.subheader("🧠 Model Info")
+        st.caption(f"Version: {model_stats['bundle_version']} (sha256 {model_stats['sha256'][:12]})")
+        if model_stats['trained_at']:
+            st.caption(f"Trained at: {model_stats['trained_at']}")
+        st.caption(f"File size: {model_stats['file_size_mb']:.1f} MB")
+        st.caption(f"Load time: {model_stats['load_seconds']:.2f} s")
+        if model_stats['warmup_seconds'] is not None:
+            st.caption(f"Warm-up: {model_stats['warmup_seconds']:.2f} s")
+        if model_stats['rss_delta_mb'] is not None:
+            st.caption(f"Memory: +{model_stats['rss_delta_mb']:.1f} MB (process RSS {model_stats['rss_mb']:.1f} MB)")
+        cache_stats = registry.cache_stats()
+        st.caption(f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['entries']}/{cache_stats['max_entries']} entries)")
@@ -0,0 +1,231 @@
+import hashlib
+import importlib.util
+import numbers
+import os
+import sys
+import threading
+from time import perf_counter
+
+# ================== Constants ==================
+MODEL_PATH = "data/best_model_ever.pkl"
+COMPACT_SUFFIX = ".compact"
+# ANN bundles written by `ChooseBestModel` (see utilization.ann_model)
+ANN_LITE_MODEL_PATH = "data/model_ann_lite.pkl"
+ANN_MODEL_PATH = "data/model_ann.pkl"
+ANN_PREPROCESSING_PATH = "data/model_ann_preprocessing.pkl"
+MODEL_CHOICES = {
+    "Best model": MODEL_PATH,
+    "ANN (TFLite)": ANN_LITE_MODEL_PATH,
+    "ANN (Keras)": ANN_MODEL_PATH,
+}
+# Packages that can run a model (any one of them), see utilization.ann_model
+MODEL_RUNTIMES = {
+    ANN_LITE_MODEL_PATH: ['ai_edge_litert', 'tflite_runtime', 'tensorflow'],
+    ANN_MODEL_PATH: ['tf_keras', 'tensorflow'],
+}
+# Files a model must have been built from (and not be older than), see utilization.ann_model:
+# an ANN bundle without the notebook's preprocessing gets wrongly scaled inputs
+MODEL_SOURCES = {
+    ANN_LITE_MODEL_PATH: [ANN_PREPROCESSING_PATH],
+    ANN_MODEL_PATH: [ANN_PREPROCESSING_PATH],
+}
+# Predictions kept per model for repeated inputs (a few hundred bytes each)
+PREDICTION_CACHE_SIZE = 4096
+# Metrics of the app (prediction latency, cache hits, model loads), see utilization.instrumentation
+METRICS_FILE = "data/metrics/app_metrics.jsonl"
+PROMETHEUS_FILE = "data/metrics/app.prom"
+PROFILE_DIR = "data/metrics/profiles"
+
+# Pipelines pickled by the DAG reference classes from `utilization`
+# (e.g. the KNN imputer), so unpickling needs the dags folder importable
+DAGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dags')
+if DAGS_DIR not in sys.path:
+    sys.path.append(DAGS_DIR)
+
+from utilization import instrumentation  # noqa: E402
+from utilization.cache import MemoryCache  # noqa: E402
+
+# ================== Helper Functions ==================
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Compute the SHA-256 hash of a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def resolve_model_path(model_path):
+    """Prefer the compact export written next to a pickle (`best_model_ever.compact`) when it exists."""
+    compact_path = os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+    return compact_path if model_path.endswith('.pkl') and os.path.isdir(compact_path) else model_path
+
+def runtime_available(model_path):
+    """Whether a package that runs the model is installed (checked without importing it)."""
+    packages = MODEL_RUNTIMES.get(model_path)
+    return packages is None or any(importlib.util.find_spec(package) is not None for package in packages)
+
+def built_from_sources(model_path):
+    """Whether the model exists and is not older than any of the files it is built from."""
+    if not os.path.exists(model_path):
+        return False
+    mtime = os.path.getmtime(model_path)
+    return all(os.path.exists(source) and os.path.getmtime(source) <= mtime
+               for source in MODEL_SOURCES.get(model_path, []))
+
+def available_models():
+    """Label -> path of the MODEL_CHOICES entries built from current sources whose runtime is installed.
+
+    The best model is always listed.
+    """
+    return {label: path for label, path in MODEL_CHOICES.items()
+            if path == MODEL_PATH or (built_from_sources(path) and runtime_available(path))}
+
+def watched_file(model_path):
+    """File whose changes mean a new model: the pickle itself, or a compact export's manifest."""
+    if os.path.isdir(model_path):
+        from utilization.compact_forest import MANIFEST_FILE
+        return os.path.join(model_path, MANIFEST_FILE)
+    return model_path
+
+def canonical_record(record: dict) -> tuple:
+    """Hashable form of an input record: sorted by column, numbers as floats, NaN as None.
+
+    `{"bedroom": 3}` and `{"bedroom": 3.0}` give the same key, as they give
+    the same prediction. Strings are kept as they are: " Jakarta" is an
+    unknown category to the model, not "Jakarta".
+    """
+    items = []
+    for column, value in sorted(record.items()):
+        if isinstance(value, numbers.Number) and not isinstance(value, bool):
+            value = None if value != value else float(value)
+        items.append((column, value))
+    return tuple(items)
+
+def model_size_mb(model_path):
+    if os.path.isdir(model_path):
+        return sum(entry.stat().st_size for entry in os.scandir(model_path)) / (1024 * 1024)
+    return os.path.getsize(model_path) / (1024 * 1024)
+
+def current_rss_mb():
+    """Return the resident set size of this process in MB (None if unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+# ================== Model Registry ==================
+
+class ModelRegistry:
+    """Keep a single loaded copy of a model bundle per process.
+
+    The file is only re-read when its mtime/size changes *and* its content hash
+    differs from the loaded one, so a new `best_model_ever.pkl` written by
+    `ChooseBestModel` is picked up without restarting the app. With
+    `prefer_compact`, a compact export next to the pickle is served instead
+    while it exists; for it the manifest is watched, which holds the hashes
+    of the memory-mapped arrays. It loads faster and predicts single rows
+    faster, but large batches only with a tree subset, so batch serving
+    keeps the pickle.
+
+    `predict` memoizes single-record predictions in an LRU cache keyed on the
+    canonical record and the model's content hash; the cache is emptied
+    whenever another model is loaded.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, cache_size=PREDICTION_CACHE_SIZE, prefer_compact=True):
+        self.model_path = model_path
+        self.prefer_compact = prefer_compact
+        self._lock = threading.Lock()
+        self._model = None
+        self._signature = None
+        self._sha256 = None
+        self._stats = {}
+        self._cache = MemoryCache(cache_size)
+
+    @instrumentation.stage("model_load")
+    def _load(self, path, file_hash):
+        rss_before = current_rss_mb()
+        start = perf_counter()
+        from utilization.model_bundle import load_bundle  # pandas/sklearn are imported with the first model
+        model = load_bundle(path)
+        load_seconds = perf_counter() - start
+        warmup_seconds = model.warm_up()
+        rss_after = current_rss_mb()
+
+        self._model = model
+        self._sha256 = file_hash
+        self._cache.clear()
+        self._stats = {
+            "model_path": path,
+            "sha256": file_hash,
+            "bundle_version": model.version,
+            "trained_at": model.metadata.get("trained_at"),
+            "file_size_mb": model_size_mb(path),
+            "load_seconds": load_seconds,
+            "warmup_seconds": warmup_seconds,
+            "rss_delta_mb": None if rss_before is None else rss_after - rss_before,
+            "rss_mb": rss_after,
+            "loads": self._stats.get("loads", 0) + 1,
+        }
+        print(f"Model loaded from {path} in {load_seconds:.2f}s, warmed up in {warmup_seconds or 0:.2f}s "
+              f"(sha256 {file_hash[:12]}).")
+
+    def _current(self):
+        """(model, content hash), reloading the model if the file on disk has changed."""
+        with self._lock:
+            path = resolve_model_path(self.model_path) if self.prefer_compact else self.model_path
+            watched = watched_file(path)
+            stat = os.stat(watched)  # Raises FileNotFoundError if missing
+            signature = (watched, stat.st_mtime_ns, stat.st_size)
+            if self._model is None or signature != self._signature:
+                file_hash = file_sha256(watched)
+                if self._model is None or file_hash != self._sha256:
+                    self._load(path, file_hash)
+                self._signature = signature
+            return self._model, self._sha256
+
+    def get_model(self):
+        """Return the cached model, reloading it if the file on disk has changed."""
+        return self._current()[0]
+
+    def predict(self, record: dict) -> float:
+        """Predict one input record, from the cache if the current model has already seen it."""
+        model, version = self._current()
+        key = (version, canonical_record(record))
+        prediction = self._cache.get(key)
+        if prediction is None:
+            instrumentation.add("cache_misses")
+            prediction = float(model.predict([record])[0])
+            self._cache.set(key, prediction)
+        else:
+            instrumentation.add("cache_hits")
+        return prediction
+
+    @property
+    def version(self):
+        """Content hash of the currently loaded model (None before the first load)."""
+        return self._sha256
+
+    def stats(self):
+        """Return load latency and memory figures of the cached model."""
+        with self._lock:
+            return dict(self._stats)
+
+    def cache_stats(self):
+        """Entries, hits and misses of the prediction cache."""
+        return self._cache.stats()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_registry(model_path=MODEL_PATH, prefer_compact=True):
+    """Return the process-wide registry for `model_path`."""
+    with _registries_lock:
+        key = (model_path, prefer_compact)
+        if key not in _registries:
+            _registries[key] = ModelRegistry(model_path, prefer_compact=prefer_compact)
+        return _registries[key]
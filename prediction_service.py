@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from time import perf_counter
+
+import pandas as pd
+
+from model_registry import METRICS_FILE, MODEL_PATH, PROFILE_DIR, PROMETHEUS_FILE, get_registry
+from utilization import instrumentation
+
+# ================== Constants ==================
+FEATURE_COLUMNS = [
+    'land_size_m2', 'building_size_m2', 'road_width', 'bedroom', 'bathroom', 'carport',
+    'kitchen', 'city', 'property_type', 'certificate', 'water_source', 'furniture',
+    'house_facing', 'maid_bedroom', 'property_condition', 'floor_level', 'garage',
+    'maid_bathroom', 'voltage_watt'
+]
+MAX_BATCH_ROWS = 50_000
+BATCH_WINDOW_SECONDS = 0.01
+
+# Batch sizes, latency and model loads are recorded like the app's, and served on GET /metrics.
+# Batches are aggregated in memory, so predicting never waits on a metrics file
+instrumentation.configure(METRICS_FILE, PROMETHEUS_FILE, PROFILE_DIR)
+instrumentation.buffer_stages("service_predict")
+
+# ================== Prediction Helpers ==================
+
+def service_registry(model_path=MODEL_PATH):
+    """Registry of the served model. The pickle is served even when a compact export exists next to it:
+    scikit-learn's traversal predicts large batches faster unless the export dropped most trees. Pass a
+    compact directory as `model_path` to serve it anyway."""
+    return get_registry(model_path, prefer_compact=False)
+
+def records_to_frame(records):
+    """Build a single feature DataFrame from a list of property records."""
+    return pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS)
+
+def predict_records(records, model_path=MODEL_PATH):
+    """Predict prices for many records with one vectorized `model.predict` call."""
+    if not records:
+        return []
+    with instrumentation.stage("service_predict"):
+        instrumentation.add("rows_in", len(records))
+        model = service_registry(model_path).get_model()
+        predictions = model.predict(records_to_frame(records))
+    return [float(value) for value in predictions]
+
+def read_jsonl(file, batch_size):
+    """Yield lists of at most `batch_size` records from a JSONL file object.
+
+    Every line must hold a JSON object, like the records of `POST /predict`.
+    """
+    batch = []
+    for line_number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_number}: every record must be a JSON object.")
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ================== Micro-Batching ==================
+
+class MicroBatcher:
+    """Coalesce concurrent prediction requests into one `model.predict` call.
+
+    Requests arriving within `window` seconds of the first pending one (or until
+    `max_rows` records are queued) are concatenated into a single frame, predicted
+    together in a worker thread, and the results are split back per request.
+    If the combined call fails, the requests are predicted on their own, in
+    parallel on the event loop's default executor (which bounds the threads),
+    so only the request with bad records gets the error.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, window=BATCH_WINDOW_SECONDS, max_rows=MAX_BATCH_ROWS):
+        self.model_path = model_path
+        self.window = window
+        self.max_rows = max_rows
+        self._pending = []
+        self._pending_rows = 0
+        self._flush_handle = None
+
+    async def predict(self, records):
+        """Queue `records` for the next batch and wait for their predictions."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((records, future))
+        self._pending_rows += len(records)
+
+        if self._pending_rows >= self.max_rows:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        records = [record for request_records, _ in batch for record in request_records]
+        loop = asyncio.get_running_loop()
+        try:
+            predictions = await loop.run_in_executor(None, predict_records, records, self.model_path)
+        except Exception as e:
+            if len(batch) > 1:
+                await asyncio.gather(*(self._run_batch([request]) for request in batch))
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for request_records, future in batch:
+            end = start + len(request_records)
+            if not future.done():
+                future.set_result(predictions[start:end])
+            start = end
+
+# ================== ASGI Application ==================
+
+async def _read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _send_metrics(send):
+    """Send the Prometheus text file written by `utilization.instrumentation` (empty before any prediction)."""
+    instrumentation.flush()
+    body = b''
+    if os.path.exists(instrumentation.PROMETHEUS_FILE):
+        with open(instrumentation.PROMETHEUS_FILE, 'rb') as f:
+            body = f.read()
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/plain; version=0.0.4'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+def create_app(model_path=MODEL_PATH, window=BATCH_WINDOW_SECONDS, max_rows=MAX_BATCH_ROWS):
+    """Create a dependency-free ASGI app exposing `POST /predict`, `GET /health` and `GET /metrics`.
+
+    `POST /predict` accepts either a JSON list of records or `{"records": [...]}`
+    and answers with `{"predictions": [...]}` in the same order. `GET /metrics`
+    serves the Prometheus metrics of the predictions and model loads.
+    """
+    batcher = MicroBatcher(model_path, window=window, max_rows=max_rows)
+    # Why the model failed to load at startup, reported by /health until a load succeeds
+    startup_error = {}
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    # Load the model before accepting traffic
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, service_registry(model_path).get_model)
+                    except FileNotFoundError:
+                        startup_error['error'] = f"Model file {model_path} not found."
+                        print(f"Model file {model_path} not found, predictions will fail until it exists.")
+                    except Exception as e:
+                        startup_error['error'] = f"Loading {model_path} failed: {type(e).__name__}: {e}"
+                        print(f"{startup_error['error']}, predictions will fail until it loads.")
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'] == '/health' and scope['method'] == 'GET':
+            registry = service_registry(model_path)
+            if registry.version is None and startup_error:
+                await _send_json(send, 503, {"status": "error", **startup_error, "model": registry.stats()})
+            else:
+                await _send_json(send, 200, {"status": "ok", "model": registry.stats()})
+            return
+        if scope['path'] == '/metrics' and scope['method'] == 'GET':
+            await _send_metrics(send)
+            return
+        if scope['path'] != '/predict' or scope['method'] != 'POST':
+            await _send_json(send, 404, {"error": "Not found"})
+            return
+
+        try:
+            payload = json.loads(await _read_body(receive))
+            records = payload['records'] if isinstance(payload, dict) else payload
+            if not isinstance(records, list):
+                raise ValueError("Expected a list of records.")
+            if not all(isinstance(record, dict) for record in records):
+                raise ValueError("Every record must be a JSON object.")
+        except (ValueError, KeyError) as e:
+            await _send_json(send, 400, {"error": f"Invalid request body: {e}"})
+            return
+
+        try:
+            predictions = await batcher.predict(records)
+        except FileNotFoundError:
+            await _send_json(send, 503, {"error": "Model file not found."})
+            return
+        except Exception as e:
+            await _send_json(send, 500, {"error": str(e)})
+            return
+        await _send_json(send, 200, {"predictions": predictions})
+
+    return app
+
+app = create_app()
+
+# ================== Command Line Interface ==================
+
+def predict_jsonl(input_path, output_path, model_path=MODEL_PATH, batch_size=MAX_BATCH_ROWS):
+    """Predict every record of a JSONL file, one `model.predict` call per batch."""
+    total_rows = 0
+    start = perf_counter()
+    target = open(output_path, 'w') if output_path != '-' else sys.stdout
+    try:
+        with open(input_path) as source:
+            for records in read_jsonl(source, batch_size):
+                for record, prediction in zip(records, predict_records(records, model_path)):
+                    target.write(json.dumps({**record, "price_mio_predicted": prediction}) + '\n')
+                total_rows += len(records)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    elapsed = perf_counter() - start
+    print(f"Predicted {total_rows} rows in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s).",
+          file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch property price prediction.")
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to the pickled model or a compact export directory.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    predict_parser = subparsers.add_parser('predict', help="Predict records from a JSONL file.")
+    predict_parser.add_argument('input', help="JSONL file with one property record per line.")
+    predict_parser.add_argument('-o', '--output', default='-', help="Output JSONL file (default: stdout).")
+    predict_parser.add_argument('--batch-size', type=int, default=MAX_BATCH_ROWS)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve the ASGI app with uvicorn.")
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--window', type=float, default=BATCH_WINDOW_SECONDS,
+                              help="Micro-batching window in seconds.")
+
+    args = parser.parse_args(argv)
+    if args.command == 'predict':
+        predict_jsonl(args.input, args.output, model_path=args.model, batch_size=args.batch_size)
+    else:
+        import uvicorn
+        uvicorn.run(create_app(args.model, window=args.window), host=args.host, port=args.port)
+
+# ================== Run as Script ==================
+
+if __name__ == "__main__":
+    main()